@@ -0,0 +1,362 @@
+"""
+Alcançabilidade de todos os pares (origem, destino) de uma vez, com NumPy.
+
+Em vez de chamar xping N² vezes, o espaço de endereços é dividido em
+classes de equivalência (faixas entre as fronteiras de todos os prefixos
+das FIBs): dentro de uma classe, todo roteador toma a mesma decisão. Para
+as classes que contêm destinos é montada uma matriz roteador x classe com o
+próximo nó, e todos os pares avançam juntos, um salto por iteração, com
+operações vetorizadas. A semântica é a mesma do xping (TTL de 30 saltos,
+entrega direta em sub-redes conectadas, checagem de link físico).
+Em grupos ECMP o salto de cada par é escolhido pelo mesmo hash de fluxo do
+xping (fib.select_next_hop sobre flow_key(origem, destino)); como o caminho
+passa a depender da origem, cada origem é percorrida separadamente.
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from fib import CONNECTED, flow_key, ip_to_int, select_next_hop
+from resultados import LINK_FAILURE, NO_ROUTE, TTL, TTL_EXPIRED, UNKNOWN_NEXT_HOP
+
+# Códigos de próximo nó (valores >= 0 são índices de nós)
+HOP_DELIVER = -1 # Destino em sub-rede conectada: o próximo nó é o próprio destino
+HOP_NO_ROUTE = -2
+HOP_UNKNOWN_NEXT_HOP = -3
+HOP_MULTIPATH = -4 # Grupo ECMP: o próximo nó depende do fluxo (ver ReachabilityEngine.groups)
+
+# Situação de cada par (int8); as falhas são descritas pelas situações de resultados.py
+PENDING, REACHED, FAILED_NO_ROUTE, FAILED_UNKNOWN_NEXT_HOP, FAILED_LINK, FAILED_TTL = range(6)
+FAILURE_REASONS = {
+    FAILED_NO_ROUTE: NO_ROUTE,
+    FAILED_UNKNOWN_NEXT_HOP: UNKNOWN_NEXT_HOP,
+    FAILED_LINK: LINK_FAILURE,
+    FAILED_TTL: TTL_EXPIRED,
+}
+
+# Quantidade máxima de pares processados por lote (limita a memória dos arrays temporários)
+BATCH_PAIRS = 1 << 22
+
+
+class ReachabilityResult:
+    """Matrizes origem x destino produzidas por ReachabilityEngine.all_pairs."""
+
+    def __init__(self, sources, destinations, status, hops):
+        self.sources = sources # IPs de origem (linhas)
+        self.destinations = destinations # IPs de destino (colunas)
+        self.status = status # int8: REACHED ou um dos códigos FAILED_*
+        self.hops = hops # int16: saltos até o destino, -1 se inalcançável
+
+    @property
+    def reachable(self):
+        """Matriz booleana de alcançabilidade."""
+        return self.status == REACHED
+
+    def failing_pairs(self):
+        """Gera (ip_origem, ip_destino, motivo) para cada par inalcançável."""
+        rows, columns = np.nonzero(self.status != REACHED)
+        for row, column in zip(rows.tolist(), columns.tolist()):
+            yield (self.sources[row], self.destinations[column], FAILURE_REASONS[int(self.status[row, column])])
+
+    def summary(self):
+        reached = int(np.count_nonzero(self.status == REACHED))
+        total = self.status.size
+        counts = {reason: int(np.count_nonzero(self.status == code)) for code, reason in FAILURE_REASONS.items()}
+        mean_hops = float(self.hops[self.status == REACHED].mean()) if reached else 0.0
+        return {'pairs': total, 'reachable': reached, 'mean_hops': mean_hops, 'failures': counts}
+
+
+class ReachabilityEngine:
+    """Pré-computa as matrizes de próximo salto de um simulador já carregado."""
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.nodes = list(simulator.graph.nodes)
+        self.node_index = {node_name: i for i, node_name in enumerate(self.nodes)}
+        node_types = simulator.graph.nodes
+        self.is_host = np.array([node_types[n].get('type') == 'host' for n in self.nodes], dtype=bool)
+        self.routers = [n for n in self.nodes if node_types[n].get('type') != 'host']
+        self.router_row = np.full(len(self.nodes), -1, dtype=np.int64)
+        for row, node_name in enumerate(self.routers):
+            self.router_row[self.node_index[node_name]] = row
+
+        self.groups = [] # Grupos ECMP: (roteador, saltos do grupo, {ip do salto: (nó, link_existe)})
+        self._group_ids = {}
+        self._forwarding_entries = {n: self._entries(n) for n in self.routers}
+        self.boundaries = self._class_boundaries()
+        self._build_gateways()
+
+    def _entries(self, router):
+        """
+        Entradas da FIB do roteador como (início, fim, tamanho, tipo, próximo_salto);
+        próximo_salto é a tupla do grupo em rotas ECMP com mais de um salto distinto.
+        """
+        forwarding_table = self.simulator.get_forwarding_table(router)
+        if forwarding_table is None:
+            return []
+        entries = list(forwarding_table.items(multipath=True))
+        default_group = next((group for start, length, kind, group in entries if length == 0 and kind != CONNECTED),
+                             (None,))
+        result = []
+        for start, length, kind, next_hop in entries:
+            if kind != CONNECTED:
+                if not next_hop[0]:
+                    next_hop = default_group # Mesmo fallback da FIB para rotas sem próximo salto
+                next_hop = next_hop if len(set(next_hop)) > 1 else next_hop[0]
+            result.append((start, start | ((1 << (32 - length)) - 1), length, kind, next_hop))
+        return result
+
+    def _class_boundaries(self):
+        """Inícios das classes de equivalência: toda fronteira de prefixo de qualquer FIB."""
+        boundaries = {0}
+        for entries in self._forwarding_entries.values():
+            for start, end, _, _, _ in entries:
+                boundaries.add(start)
+                if end < 0xFFFFFFFF:
+                    boundaries.add(end + 1)
+        return np.array(sorted(boundaries), dtype=np.int64)
+
+    def class_of(self, ip_ints):
+        """Índice da classe de equivalência de cada endereço."""
+        return np.searchsorted(self.boundaries, ip_ints, side='right') - 1
+
+    def _resolve(self, router, next_hop_ip):
+        """Converte o IP de próximo salto em (nó, link_existe), como no xping."""
+        next_node = self.simulator.get_node_by_ip(next_hop_ip)
+        if next_node is None:
+            return HOP_UNKNOWN_NEXT_HOP, True
+        return self.node_index[next_node], self.simulator.graph.has_edge(router, next_node)
+
+    def _build_gateways(self):
+        """Primeiro salto dos hosts (o gateway padrão independe do destino)."""
+        self.gateway = np.full(len(self.nodes), HOP_NO_ROUTE, dtype=np.int64)
+        self.gateway_link = np.ones(len(self.nodes), dtype=bool)
+        for i in np.nonzero(self.is_host)[0].tolist():
+            host = self.nodes[i]
+            gateway_ip = self.simulator.host_gateways.get(host)
+            if gateway_ip:
+                self.gateway[i], self.gateway_link[i] = self._resolve(host, gateway_ip)
+
+    def _group_id(self, router, group):
+        """Índice do grupo ECMP do roteador em self.groups (criado no primeiro uso)."""
+        key = (router, group)
+        group_id = self._group_ids.get(key)
+        if group_id is None:
+            resolved = {hop: self._resolve(router, hop) if hop else (HOP_NO_ROUTE, True) for hop in group}
+            group_id = self._group_ids[key] = len(self.groups)
+            self.groups.append((router, group, resolved))
+        return group_id
+
+    def next_hop_matrix(self, classes):
+        """
+        Matriz roteador x classe com o próximo nó (ou HOP_DELIVER/HOP_NO_ROUTE/HOP_UNKNOWN_NEXT_HOP/HOP_MULTIPATH),
+        matriz booleana indicando se o link até esse nó existe no grafo e, se
+        houver grupos ECMP, matriz com o índice do grupo em self.groups (senão None).
+        """
+        representatives = self.boundaries[classes]
+        next_node = np.full((len(self.routers), len(classes)), HOP_NO_ROUTE, dtype=np.int64)
+        link_ok = np.ones((len(self.routers), len(classes)), dtype=bool)
+        group_of = None
+        for row, router in enumerate(self.routers):
+            entries = self._forwarding_entries[router]
+            # Rotas do prefixo mais curto para o mais longo (o mais longo sobrescreve);
+            # depois as conectadas, que têm prioridade sobre qualquer rota
+            routes = sorted((e for e in entries if e[3] != CONNECTED), key=lambda e: e[2])
+            connected = [e for e in entries if e[3] == CONNECTED]
+            resolved = {}
+            for start, end, _, _, next_hop in routes:
+                lo = np.searchsorted(representatives, start, side='left')
+                hi = np.searchsorted(representatives, end, side='right')
+                if lo == hi:
+                    continue
+                if next_hop is None:
+                    next_node[row, lo:hi] = HOP_NO_ROUTE
+                    link_ok[row, lo:hi] = True
+                    continue
+                if isinstance(next_hop, tuple):
+                    if group_of is None:
+                        group_of = np.full((len(self.routers), len(classes)), -1, dtype=np.int32)
+                    next_node[row, lo:hi] = HOP_MULTIPATH
+                    link_ok[row, lo:hi] = True
+                    group_of[row, lo:hi] = self._group_id(router, next_hop)
+                    continue
+                if next_hop not in resolved:
+                    resolved[next_hop] = self._resolve(router, next_hop)
+                next_node[row, lo:hi], link_ok[row, lo:hi] = resolved[next_hop]
+            for start, end, _, _, _ in connected:
+                lo = np.searchsorted(representatives, start, side='left')
+                hi = np.searchsorted(representatives, end, side='right')
+                next_node[row, lo:hi] = HOP_DELIVER
+                link_ok[row, lo:hi] = True
+        return next_node, link_ok, group_of
+
+    def host_addresses(self):
+        """IPs de todos os hosts, na ordem de ip_to_node_map."""
+        return [ip for ip, node_name in self.simulator.ip_to_node_map.items()
+                if node_name in self.node_index and self.is_host[self.node_index[node_name]]]
+
+    def _check_addresses(self, sources, destinations):
+        """Levanta ValueError para IPs sem nó correspondente ou destinos que não são IPv4."""
+        ip_map = self.simulator.ip_to_node_map
+        for label, addresses in (('origem', sources), ('destino', destinations)):
+            for ip in addresses:
+                if ip_map.get(ip) not in self.node_index:
+                    raise ValueError(f"IP de {label} '{ip}' não encontrado na configuração da rede")
+        for ip in destinations:
+            if ip_to_int(ip) is None:
+                raise ValueError(f"IP de destino '{ip}' não é IPv4")
+
+    def all_pairs(self, sources=None, destinations=None, ttl=TTL):
+        """
+        Resolve todos os pares origem x destino (por padrão, todos os hosts).
+        O primeiro salto de um host (o gateway) não depende do destino, então
+        os caminhos são calculados uma vez por nó de partida distinto (os
+        gateways) e replicados para as origens que o compartilham; com grupos
+        ECMP, uma vez por origem.
+        Retorna um ReachabilityResult; ValueError se algum IP não pertence a
+        um nó da rede (ou, no caso dos destinos, não é IPv4).
+        """
+        sources = self.host_addresses() if sources is None else list(sources)
+        destinations = list(sources) if destinations is None else list(destinations)
+        self._check_addresses(sources, destinations)
+
+        ip_map = self.simulator.ip_to_node_map
+        source_nodes = np.array([self.node_index[ip_map[ip]] for ip in sources], dtype=np.int64)
+        destination_nodes = np.array([self.node_index[ip_map[ip]] for ip in destinations], dtype=np.int64)
+        destination_ints = np.array([ip_to_int(ip) for ip in destinations], dtype=np.int64)
+        classes, destination_class = np.unique(self.class_of(destination_ints), return_inverse=True)
+        next_node, link_ok, group_of = self.next_hop_matrix(classes)
+
+        # Hosts com gateway válido começam no gateway, com um salto já dado
+        via_gateway = self.is_host[source_nodes] & (self.gateway[source_nodes] >= 0) & self.gateway_link[source_nodes]
+        start_nodes = np.where(via_gateway, self.gateway[source_nodes], source_nodes)
+        if group_of is None:
+            unique_starts, start_row = np.unique(start_nodes, return_inverse=True)
+        else:
+            # O hash ECMP inclui a origem: origens com o mesmo gateway podem seguir caminhos diferentes
+            unique_starts, start_row = start_nodes, np.arange(len(sources))
+
+        start_status = np.empty((len(unique_starts), len(destinations)), dtype=np.int8)
+        start_steps = np.empty((len(unique_starts), len(destinations)), dtype=np.int16)
+        columns_per_batch = max(1, BATCH_PAIRS // len(unique_starts)) if len(unique_starts) else 1
+        for first in range(0, len(destinations), columns_per_batch):
+            last = min(first + columns_per_batch, len(destinations))
+            flows = None
+            if group_of is not None:
+                flows = (group_of, sources, destinations, np.repeat(np.arange(len(unique_starts)), last - first),
+                         np.tile(np.arange(first, last), len(unique_starts)))
+            batch_status, batch_steps = self._walk(
+                np.repeat(unique_starts, last - first),
+                np.tile(destination_nodes[first:last], len(unique_starts)),
+                np.tile(destination_class[first:last], len(unique_starts)),
+                next_node, link_ok, ttl, flows
+            )
+            start_status[:, first:last] = batch_status.reshape(len(unique_starts), last - first)
+            start_steps[:, first:last] = batch_steps.reshape(len(unique_starts), last - first)
+
+        status = start_status[start_row]
+        steps = start_steps[start_row]
+        # Soma o salto até o gateway; o que passar do TTL vira TTL expirado
+        rows = np.nonzero(via_gateway)[0]
+        gateway_steps = steps[rows] + 1
+        expired = (status[rows] != FAILED_TTL) & (gateway_steps > ttl)
+        gateway_status = status[rows]
+        gateway_status[expired] = FAILED_TTL
+        status[rows] = gateway_status
+        steps[rows] = gateway_steps
+        # Origem igual ao destino: zero saltos
+        same = source_nodes[:, None] == destination_nodes[None, :]
+        status[same] = REACHED
+        steps[same] = 0
+
+        hops = np.where(status == REACHED, steps, -1).astype(np.int16)
+        return ReachabilityResult(sources, destinations, status, hops)
+
+    def _select(self, flows, pairs, group_ids):
+        """
+        Próximo nó (e se o link existe) de cada par em um grupo ECMP, pelo hash do fluxo, como no xping.
+        flows = (group_of, ips de origem, ips de destino, origem de cada par, destino de cada par).
+        """
+        _, sources, destinations, pair_source, pair_destination = flows
+        step = np.empty(len(pairs), dtype=np.int64)
+        has_link = np.empty(len(pairs), dtype=bool)
+        for k, (pair, group_id) in enumerate(zip(pairs.tolist(), group_ids.tolist())):
+            router, group, resolved = self.groups[group_id]
+            key = flow_key(sources[pair_source[pair]], destinations[pair_destination[pair]])
+            step[k], has_link[k] = resolved[select_next_hop(group, key, router)]
+        return step, has_link
+
+    def _walk(self, current, destination, destination_class, next_node, link_ok, ttl, flows=None):
+        """
+        Avança todos os pares salto a salto, no máximo ttl vezes.
+        Retorna (situação, passos): os saltos dados, para pares que chegaram,
+        ou a iteração em que o par falhou. flows (ver _select) é necessário
+        se next_node tiver grupos ECMP.
+        """
+        status = np.where(current == destination, REACHED, PENDING).astype(np.int8)
+        steps = np.zeros(len(current), dtype=np.int16)
+        active = np.nonzero(status == PENDING)[0]
+        for iteration in range(1, ttl + 1):
+            if len(active) == 0:
+                break
+            node = current[active]
+            target = destination[active]
+            from_host = self.is_host[node]
+            rows = np.maximum(self.router_row[node], 0)
+            columns = destination_class[active]
+
+            step = np.where(from_host, self.gateway[node], next_node[rows, columns])
+            has_link = np.where(from_host, self.gateway_link[node], link_ok[rows, columns])
+            multipath = np.nonzero(step == HOP_MULTIPATH)[0]
+            if len(multipath):
+                step[multipath], has_link[multipath] = self._select(
+                    flows, active[multipath], flows[0][rows[multipath], columns[multipath]])
+            step = np.where(step == HOP_DELIVER, target, step)
+
+            failure = np.zeros(len(active), dtype=np.int8)
+            failure[step == HOP_NO_ROUTE] = FAILED_NO_ROUTE
+            failure[step == HOP_UNKNOWN_NEXT_HOP] = FAILED_UNKNOWN_NEXT_HOP
+            failure[(step >= 0) & ~has_link & (step != target)] = FAILED_LINK
+            failed = failure != 0
+            status[active[failed]] = failure[failed]
+            steps[active[failed]] = iteration
+
+            moved = active[~failed]
+            current[moved] = step[~failed]
+            steps[moved] = iteration
+            arrived = current[moved] == destination[moved]
+            status[moved[arrived]] = REACHED
+            active = moved[~arrived]
+
+        status[active] = FAILED_TTL
+        return status, steps
+
+
+def main(argv=None):
+    from simulador_rede import NetworkSimulator
+
+    parser = argparse.ArgumentParser(description="Alcançabilidade de todos os pares de hosts.")
+    parser.add_argument('topologia', nargs='?', help="arquivo de topologia (padrão: rede de exemplo)")
+    parser.add_argument('--falhas', type=int, default=20, help="quantidade de pares com falha a listar")
+    args = parser.parse_args(argv)
+
+    simulator = NetworkSimulator()
+    simulator.load_network_configuration(args.topologia)
+    result = simulator.all_pairs_reachability()
+    summary = result.summary()
+    print(f"Pares: {summary['pairs']}  Alcançáveis: {summary['reachable']}  Saltos médios: {summary['mean_hops']:.2f}")
+    for reason, count in summary['failures'].items():
+        if count:
+            print(f"  {reason}: {count}")
+    for i, (source_ip, destination_ip, reason) in enumerate(result.failing_pairs()):
+        if i >= args.falhas:
+            print("  ...")
+            break
+        print(f"  {source_ip} -> {destination_ip}: {reason}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Caminhos reutilizáveis entre consultas.
+
+Todos os destinos de uma mesma classe de equivalência (faixa de endereços
+entre fronteiras de prefixos das tabelas) recebem as mesmas decisões de
+encaminhamento em todos os nós, então o caminho a partir de um nó só
+depende dessa classe até o último salto. walk_segment percorre esse
+segmento uma vez; PathCache guarda os segmentos por (nó de origem, classe)
+e monta o PathResult de cada consulta copiando o trecho necessário. Hosts
+partem do gateway, então os hosts de uma mesma borda dividem os segmentos.
+Um segmento termina no primeiro roteador com grupo ECMP (MULTIPATH): ali a
+consulta escolhe o salto pelo hash do fluxo, como o percurso salto a salto,
+e continua pelo segmento (também em cache) que parte do nó escolhido.
+"""
+
+from bisect import bisect_right
+from collections import OrderedDict
+
+from fib import CONNECTED, ip_to_int, parse_network
+from resultados import LINK_FAILURE, NO_ROUTE, OK, TTL, TTL_EXPIRED, UNKNOWN_NEXT_HOP, PathResult
+
+DELIVER = 'deliver' # Fim de segmento: destino em sub-rede conectada
+MULTIPATH = 'multipath' # Fim de segmento: grupo ECMP (o próximo salto depende do fluxo)
+
+# Quantidade padrão de segmentos guardados no cache
+CACHE_SIZE = 65536
+
+
+def walk_segment(simulator, start, ip_int, ttl=TTL, stop_at_multipath=False):
+    """
+    Segue as decisões de encaminhamento a partir de start para um endereço
+    da classe, sem parar em nenhum destino específico.
+    Retorna (nós percorridos, fim), onde fim é (DELIVER,), (NO_ROUTE,),
+    (UNKNOWN_NEXT_HOP, ip), (LINK_FAILURE, ip, nó) ou (TTL_EXPIRED,).
+    Em grupos ECMP segue o primeiro salto; com stop_at_multipath, para no
+    roteador do grupo com fim (MULTIPATH,).
+    """
+    graph = simulator.graph
+    ip_map = simulator.ip_to_node_map
+    nodes = [start]
+    current = start
+    for _ in range(ttl):
+        if graph.nodes[current].get('type') == 'host':
+            next_hop = simulator.host_gateways.get(current)
+        else:
+            forwarding_table = simulator.get_forwarding_table(current)
+            match = forwarding_table.lookup(ip_int, multipath=True) if forwarding_table is not None else None
+            if match is not None and match[0] == CONNECTED:
+                return tuple(nodes), (DELIVER,)
+            if match is not None and stop_at_multipath and len(match[1]) > 1:
+                return tuple(nodes), (MULTIPATH,)
+            next_hop = match[1][0] if match is not None else None
+        if not next_hop:
+            return tuple(nodes), (NO_ROUTE,)
+        next_node = ip_map.get(next_hop)
+        if next_node is None:
+            return tuple(nodes), (UNKNOWN_NEXT_HOP, next_hop)
+        if not graph.has_edge(current, next_node):
+            return tuple(nodes), (LINK_FAILURE, next_hop, next_node)
+        nodes.append(next_node)
+        current = next_node
+    return tuple(nodes), (TTL_EXPIRED,)
+
+
+def pair_outcome(prefix, nodes, end, destination_node, ttl=TTL):
+    """
+    Situação de um par a partir do acesso (prefix) e do segmento (nodes, end).
+    Retorna (situação, saltos), com saltos = -1 se o destino não foi alcançado.
+    """
+    path = prefix + nodes
+    if destination_node in path:
+        hops = path.index(destination_node)
+        return (OK, hops) if hops <= ttl else (TTL_EXPIRED, -1)
+    moves = len(path) - 1
+    kind = end[0]
+    if kind == DELIVER or (kind == LINK_FAILURE and end[2] == destination_node):
+        # O último salto até o destino não exige link no grafo
+        return (OK, moves + 1) if moves < ttl else (TTL_EXPIRED, -1)
+    if kind == TTL_EXPIRED or moves >= ttl:
+        return (TTL_EXPIRED, -1)
+    return (kind, -1)
+
+
+def has_multipath(simulator):
+    """True se alguma rota tem um grupo ECMP com mais de um próximo salto."""
+    return any(isinstance(entry['next_hop'], (list, tuple)) and len(entry['next_hop']) > 1
+               for table in simulator.routing_tables.values() for entry in table)
+
+
+def class_boundaries(simulator):
+    """Inícios das classes de equivalência: fronteiras das rotas e das sub-redes conectadas."""
+    boundaries = {0}
+    networks = [subnet for interfaces in simulator.node_interfaces_and_subnets.values() for subnet in interfaces.values()]
+    networks += [parse_network(entry['destination_network'])
+                 for table in simulator.routing_tables.values() for entry in table]
+    for network in networks:
+        if network.version != 4:
+            continue
+        start = int(network.network_address)
+        boundaries.add(start)
+        end = int(network.broadcast_address)
+        if end < 0xFFFFFFFF:
+            boundaries.add(end + 1)
+    return sorted(boundaries)
+
+
+class PathCache:
+    """
+    Cache LRU de segmentos por (nó de origem, classe do destino).
+    Todo o conteúdo é descartado quando simulator.topology_version muda, o que
+    acontece sozinho ao alterar o grafo ou trocar/remover chaves das estruturas
+    da rede; alterações dentro de uma tabela (ex.: routing_tables[r].append(...))
+    exigem simulator.invalidate_forwarding_tables(r).
+    """
+
+    def __init__(self, simulator, maxsize=CACHE_SIZE):
+        self.simulator = simulator
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.multipath_hops = 0 # Saltos escolhidos em grupos ECMP durante as consultas
+        self._segments = OrderedDict()
+        self._version = None
+        self._boundaries = None
+
+    def __getstate__(self):
+        # Segmentos não viajam com o simulador (ex.: para processos de varredura)
+        state = self.__dict__.copy()
+        state['_segments'] = OrderedDict()
+        state['_version'] = None
+        state['_boundaries'] = None
+        return state
+
+    def clear(self):
+        self._segments.clear()
+        self._version = None
+        self._boundaries = None
+
+    def _refresh(self):
+        version = self.simulator.topology_version
+        if version != self._version:
+            if self._version is not None:
+                self.invalidations += 1
+            self._segments.clear()
+            self._boundaries = class_boundaries(self.simulator)
+            self._version = version
+
+    def segment(self, source_node, destination_ip):
+        """Segmento (nós, fim) de source_node para a classe de destination_ip (fim (MULTIPATH,) em grupos ECMP)."""
+        self._refresh()
+        return self._segment(source_node, destination_ip)
+
+    def _segment(self, source_node, destination_ip):
+        ip_int = ip_to_int(destination_ip)
+        key = (source_node, bisect_right(self._boundaries, ip_int) - 1)
+        segment = self._segments.get(key)
+        if segment is not None:
+            self.hits += 1
+            self._segments.move_to_end(key)
+            return segment
+        self.misses += 1
+        segment = self._segments[key] = walk_segment(self.simulator, source_node, ip_int, stop_at_multipath=True)
+        if len(self._segments) > self.maxsize:
+            self._segments.popitem(last=False)
+        return segment
+
+    def _start(self, source_node):
+        """
+        Nó de partida do segmento e prefixo do caminho. Hosts com gateway
+        válido partem do gateway, compartilhando os segmentos entre si.
+        """
+        simulator = self.simulator
+        if simulator.graph.nodes[source_node].get('type') == 'host':
+            gateway_node = simulator.ip_to_node_map.get(simulator.host_gateways.get(source_node) or '')
+            if gateway_node is not None and simulator.graph.has_edge(source_node, gateway_node):
+                return gateway_node, (source_node,)
+        return source_node, ()
+
+    def resolve(self, command, source_ip, destination_ip, source_node, destination_node, flow):
+        """
+        PathResult equivalente ao percurso salto a salto de resolve_path.
+        flow é o 5-tupla (ou o seu início) que escolhe os saltos ECMP.
+        """
+        self._refresh()
+        simulator = self.simulator
+        start, path = self._start(source_node)
+        while True:
+            nodes, end = self._segment(start, destination_ip)
+            path = path + nodes if path else nodes
+            if destination_node in path:
+                hops = path.index(destination_node)
+                if hops <= TTL:
+                    return PathResult(command, source_ip, destination_ip, OK, list(path[:hops + 1]), ttl_used=hops)
+
+            moves = len(path) - 1
+            if moves >= TTL:
+                return PathResult(command, source_ip, destination_ip, TTL_EXPIRED, list(path[:TTL + 1]), "TTL expirado", TTL)
+            if end[0] != MULTIPATH:
+                break
+            # Grupo ECMP: o salto depende do fluxo; a partir do nó escolhido, volta ao cache
+            self.multipath_hops += 1
+            next_hop = simulator._get_next_hop(path[-1], destination_ip, flow)
+            start = simulator.ip_to_node_map.get(next_hop)
+            if start is None:
+                end = (UNKNOWN_NEXT_HOP, next_hop) if next_hop else (NO_ROUTE,)
+                break
+            if start != destination_node and not simulator.graph.has_edge(path[-1], start):
+                end = (LINK_FAILURE, next_hop, start)
+                break
+
+        kind = end[0]
+        if kind == DELIVER or (kind == LINK_FAILURE and end[2] == destination_node):
+            return PathResult(command, source_ip, destination_ip, OK, list(path) + [destination_node],
+                              ttl_used=moves + 1)
+        if kind == NO_ROUTE:
+            return PathResult(command, source_ip, destination_ip, NO_ROUTE, list(path),
+                              "Destino Inalcançável (Nenhuma rota)", moves)
+        if kind == UNKNOWN_NEXT_HOP:
+            return PathResult(command, source_ip, destination_ip, UNKNOWN_NEXT_HOP, list(path),
+                              f"Próximo Salto Desconhecido ({end[1]})", moves, end[1])
+        return PathResult(command, source_ip, destination_ip, LINK_FAILURE, list(path),
+                          f"Falha de Link para {end[2]} (IP: {end[1]})", moves, end[1], end[2])
+
+    def stats(self):
+        """Estatísticas de uso do cache."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self._segments),
+            'maxsize': self.maxsize,
+            'invalidations': self.invalidations,
+            'multipath_hops': self.multipath_hops,
+            'multipath_segments': sum(end[0] == MULTIPATH for _, end in self._segments.values()),
+        }
@@ -0,0 +1,932 @@
+"""
+Armazenamento compacto da rede, para topologias muito grandes.
+
+Os nós viram ids inteiros densos e os IPv4, inteiros de 32 bits guardados em
+arrays (módulo array): os nomes ficam concatenados em um único bytes, a
+adjacência em formato CSR (offsets por nó + vizinhos ordenados) e as
+interfaces, rotas e gateways em arrays paralelos agrupados por nó. Valores
+que não são IPv4 canônicos (ex.: próximos saltos inválidos) ficam em uma
+pequena lista à parte.
+
+install substitui as estruturas do simulador (graph, ip_to_node_map,
+host_gateways, node_interfaces_and_subnets, routing_tables) por visões com a
+mesma interface de dicionário/networkx, que decodificam os valores a cada
+acesso; por isso xping, xtraceroute e _get_next_hop funcionam sem alterações.
+Alterações feitas depois da carga (ex.: falhas.py removendo links ou trocando
+tabelas) ficam em camadas pequenas por cima dos arrays. Nas tabelas de rotas
+e de interfaces só a troca da tabela inteira é suportada
+(routing_tables[r] = [...]): os valores lidos dos arrays são uma tupla de
+RouteEntry e um MappingProxyType, então alterações no lugar (append, del,
+atribuição de item) levantam erro em vez de se perderem. Os campos de cada
+RouteEntry podem ser alterados e são gravados de volta.
+"""
+
+import argparse
+import ipaddress
+import socket
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping
+from types import MappingProxyType
+
+import networkx as nx
+
+from topologia import LINK_ATTRIBUTES, TopologyError, parse_next_hop, read_topology
+
+# Códigos reservados em node_types (os demais indexam type_names)
+_NOT_IN_GRAPH = 0 # Nome citado em algum registro, mas que não é nó do grafo
+_UNTYPED = 1 # Nó do grafo sem atributo 'type' (criado por um link)
+
+# Prefixo que indica destino de rota guardado como texto em values
+_TEXT_DESTINATION = 255
+
+# Valor ausente nos arrays de valores codificados ('q'): >= 0 é um IPv4, <= -2 indexa values
+_ABSENT = -1
+
+# Campos de uma entrada de rota (mesmas chaves dos dicionários de routing_tables)
+ROUTE_FIELDS = ('destination_network', 'next_hop')
+
+# Arrays de CompactNetwork e seus typecodes
+ARRAY_FIELDS = (
+    ('name_offsets', 'I'), # Nó i: names[name_offsets[i]:name_offsets[i + 1]]
+    ('name_index', 'i'), # Tabela hash (endereçamento aberto) nome -> id, -1 = vazio
+    ('node_types', 'B'),
+    ('adjacency_offsets', 'I'), # CSR: vizinhos do nó i em adjacency[offsets[i]:offsets[i + 1]]
+    ('adjacency', 'I'),
+    ('adjacency_attributes', 'I'), # Índice em edge_attributes de cada posição de adjacency
+    ('addresses', 'I'), # IPs de ip_to_node_map, ordenados
+    ('address_nodes', 'I'),
+    ('interface_offsets', 'I'),
+    ('interface_addresses', 'I'),
+    ('interface_networks', 'I'),
+    ('interface_prefixlens', 'B'),
+    ('route_offsets', 'I'),
+    ('route_destinations', 'I'),
+    ('route_prefixlens', 'B'),
+    ('route_next_hops', 'q'),
+    ('gateways', 'q'), # Por nó; _ABSENT se o nó não tem gateway
+)
+
+# Objetos Python pequenos que acompanham os arrays
+OBJECT_FIELDS = ('names', 'type_names', 'edge_attributes', 'extra_addresses', 'values')
+
+_MISSING = object()
+
+
+def _ipv4(text):
+    """Inteiro do IPv4 em texto (inet_pton só aceita a forma canônica), ou None."""
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, text), 'big')
+    except (OSError, TypeError):
+        return None
+
+
+def _ip_str(value):
+    return socket.inet_ntoa(value.to_bytes(4, 'big'))
+
+
+def _parse_destination(text):
+    """(início, tamanho do prefixo) de uma rede IPv4 canônica em texto, ou None."""
+    if not isinstance(text, str):
+        return None
+    address, _, length = text.partition('/')
+    start = _ipv4(address)
+    if start is None or not length.isdigit() or str(int(length)) != length or int(length) > 32:
+        return None
+    length = int(length)
+    if start & ((1 << (32 - length)) - 1):
+        return None # Bits de host ligados: parse_network rejeitaria, então guarda o texto
+    return start, length
+
+
+def _hash(name_bytes):
+    return zlib.crc32(name_bytes)
+
+
+class CompactNetwork:
+    """
+    Arrays de uma rede carregada (ver ARRAY_FIELDS); construída por CompactBuilder
+    ou por snapshot.py, caso em que os arrays são memoryviews sobre o arquivo mapeado.
+    """
+
+    def __init__(self, snapshot=None, **fields):
+        for name, _ in ARRAY_FIELDS:
+            setattr(self, name, fields[name])
+        for name in OBJECT_FIELDS:
+            setattr(self, name, fields[name])
+        self._index_mask = len(self.name_index) - 1
+        self.snapshot = snapshot # snapshot.Snapshot de origem, se houver
+        self._modified = False # Alguma linha foi regravada depois da carga
+
+    def __getstate__(self):
+        if self.snapshot is not None and not self._modified:
+            # Reabre o mesmo arquivo no destino (ex.: processos de varredura), compartilhando as páginas
+            return {'snapshot': self.snapshot}
+        state = self.__dict__.copy()
+        for name, typecode in ARRAY_FIELDS:
+            if isinstance(state[name], memoryview):
+                state[name] = array(typecode, state[name])
+        state['names'] = bytes(state['names'])
+        state['snapshot'] = None
+        return state
+
+    def __setstate__(self, state):
+        if 'names' not in state:
+            state = state['snapshot'].network().__dict__
+        self.__dict__.update(state)
+
+    @property
+    def node_count(self):
+        return len(self.node_types)
+
+    def node_id(self, name):
+        """Id do nó com esse nome, ou -1."""
+        try:
+            name_bytes = name.encode()
+        except AttributeError:
+            return -1
+        names, offsets, index, mask = self.names, self.name_offsets, self.name_index, self._index_mask
+        slot = _hash(name_bytes) & mask
+        while True:
+            node_id = index[slot]
+            if node_id < 0:
+                return -1
+            if names[offsets[node_id]:offsets[node_id + 1]] == name_bytes:
+                return node_id
+            slot = (slot + 1) & mask
+
+    def node_name(self, node_id):
+        return str(self.names[self.name_offsets[node_id]:self.name_offsets[node_id + 1]], 'utf-8')
+
+    def decode_value(self, value):
+        """Valor original de um campo codificado (IPv4 em texto ou o objeto guardado em values)."""
+        return _ip_str(value) if value >= 0 else self.values[-2 - value]
+
+    def _encode(self, value):
+        ip_int = _ipv4(value)
+        if ip_int is not None:
+            return ip_int
+        self.values.append(value)
+        return -1 - len(self.values)
+
+    def set_route(self, row, destination, next_hop):
+        """Regrava a rota da linha row (as FIBs precisam ser invalidadas, como nos dicionários)."""
+        parsed = _parse_destination(destination)
+        if parsed is None:
+            self.values.append(destination)
+            parsed = (len(self.values) - 1, _TEXT_DESTINATION)
+        self.route_destinations[row], self.route_prefixlens[row] = parsed
+        self.route_next_hops[row] = self._encode(next_hop)
+        self._modified = True
+
+    def nbytes(self):
+        """Bytes ocupados pelos arrays e pelos nomes (sem os objetos auxiliares)."""
+        total = len(self.names)
+        for name, _ in ARRAY_FIELDS:
+            buffer = getattr(self, name)
+            total += len(buffer) * buffer.itemsize
+        return total
+
+
+class CompactBuilder:
+    """
+    Monta uma CompactNetwork a partir de registros de topologia (mesma
+    semântica de topologia.apply_records) ou das estruturas de um simulador.
+    """
+
+    def __init__(self):
+        self._ids = {} # Nome -> id (só durante a construção)
+        self._names = []
+        self._types = array('B')
+        self._type_codes = {}
+        self._edges = {} # (menor id, maior id) -> índice em _attributes
+        self._attribute_codes = {}
+        self._attributes = []
+        self._address_keys = array('I')
+        self._address_nodes = array('I')
+        self._extra_addresses = {}
+        self._interfaces = (array('I'), array('I'), array('I'), array('B')) # nó, ip, rede, prefixo
+        self._routes = (array('I'), array('I'), array('B'), array('q')) # nó, destino, prefixo, próximo salto
+        self._gateways = array('q')
+        self._value_codes = {}
+        self._values = []
+
+    def _node(self, name):
+        node_id = self._ids.get(name)
+        if node_id is None:
+            if not isinstance(name, str):
+                raise ValueError(f"nomes de nós devem ser texto no armazenamento compacto (recebido {name!r})")
+            node_id = self._ids[name] = len(self._names)
+            self._names.append(name)
+            self._types.append(_NOT_IN_GRAPH)
+            self._gateways.append(_ABSENT)
+        return node_id
+
+    def _graph_node(self, name):
+        node_id = self._node(name)
+        if self._types[node_id] == _NOT_IN_GRAPH:
+            self._types[node_id] = _UNTYPED
+        return node_id
+
+    def _text_value(self, value):
+        code = self._value_codes.get(value)
+        if code is None:
+            code = self._value_codes[value] = -2 - len(self._values)
+            self._values.append(value)
+        return code
+
+    def _encode(self, value):
+        ip_int = _ipv4(value)
+        return ip_int if ip_int is not None else self._text_value(value)
+
+    def _attribute_code(self, attributes):
+        key = tuple(sorted(attributes.items()))
+        code = self._attribute_codes.get(key)
+        if code is None:
+            code = self._attribute_codes[key] = len(self._attributes)
+            self._attributes.append(dict(attributes))
+        return code
+
+    def add_node(self, name, node_type=None):
+        node_id = self._graph_node(name)
+        if node_type is not None:
+            code = self._type_codes.get(node_type)
+            if code is None:
+                code = self._type_codes[node_type] = len(self._type_codes) + 2
+                if code > 255:
+                    raise ValueError("mais de 254 tipos de nó distintos")
+            self._types[node_id] = code
+
+    def add_edge(self, source, target, attributes):
+        u, v = self._graph_node(source), self._graph_node(target)
+        key = (u, v) if u <= v else (v, u)
+        previous = self._edges.get(key)
+        if previous is not None:
+            # Como no networkx, repetir um link atualiza os atributos
+            attributes = dict(self._attributes[previous], **attributes)
+        self._edges[key] = self._attribute_code(attributes)
+
+    def add_address(self, ip, name):
+        node_id = self._node(name)
+        ip_int = _ipv4(ip)
+        if ip_int is None:
+            self._extra_addresses[ip] = node_id
+        else:
+            self._address_keys.append(ip_int)
+            self._address_nodes.append(node_id)
+
+    def add_interface(self, name, ip, network):
+        """ip e network: objetos do ipaddress (só IPv4)."""
+        if ip.version != 4 or network.version != 4:
+            raise ValueError(f"o armazenamento compacto aceita apenas interfaces IPv4 ({ip})")
+        nodes, addresses, networks, prefixlens = self._interfaces
+        nodes.append(self._node(name))
+        addresses.append(int(ip))
+        networks.append(int(network.network_address))
+        prefixlens.append(network.prefixlen)
+
+    def add_route(self, name, destination, next_hop):
+        nodes, destinations, prefixlens, next_hops = self._routes
+        nodes.append(self._node(name))
+        parsed = _parse_destination(destination)
+        if parsed is None:
+            destinations.append(-2 - self._text_value(destination))
+            prefixlens.append(_TEXT_DESTINATION)
+        else:
+            destinations.append(parsed[0])
+            prefixlens.append(parsed[1])
+        if isinstance(next_hop, list):
+            next_hop = tuple(next_hop) # Grupo ECMP, compartilhado entre as rotas iguais
+        next_hops.append(self._encode(next_hop))
+
+    def add_gateway(self, name, gateway):
+        self._gateways[self._node(name)] = self._encode(gateway)
+
+    def add_records(self, records):
+        """Aplica registros de topologia (ver topologia.py), com os mesmos erros de apply_records."""
+        for count, record in enumerate(records, 1):
+            kind = record.get('kind')
+            try:
+                if kind == 'node':
+                    self.add_node(record['name'], record.get('type', 'router'))
+                elif kind == 'link':
+                    self.add_edge(record['source'], record['target'],
+                                  {key: record[key] for key in LINK_ATTRIBUTES if key in record})
+                elif kind == 'interface':
+                    ip_str = record['ip']
+                    network_str = record.get('network')
+                    if network_str is None:
+                        interface = ipaddress.ip_interface(ip_str)
+                        ip, network, ip_str = interface.ip, interface.network, str(interface.ip)
+                    else:
+                        ip, network = ipaddress.ip_address(ip_str), ipaddress.ip_network(network_str)
+                    self.add_address(ip_str, record['node'])
+                    self.add_interface(record['node'], ip, network)
+                elif kind == 'address':
+                    self.add_address(record['ip'], record['node'])
+                elif kind == 'route':
+                    self.add_route(record['node'], record['destination'], parse_next_hop(record['next_hop']))
+                elif kind == 'gateway':
+                    self.add_gateway(record['host'], record['gateway'])
+                else:
+                    raise TopologyError(f"registro {count}: tipo desconhecido '{kind}'")
+            except KeyError as e:
+                raise TopologyError(f"registro {count} ({kind}): campo obrigatório ausente {e}") from e
+            except ValueError as e:
+                if isinstance(e, TopologyError):
+                    raise
+                raise TopologyError(f"registro {count} ({kind}): {e}") from e
+        return self
+
+    def add_simulator(self, simulator):
+        """Copia as estruturas (em dicionários) de um simulador já carregado."""
+        for name, data in simulator.graph.nodes(data=True):
+            self.add_node(name, data.get('type'))
+        for u, v, data in simulator.graph.edges(data=True):
+            self.add_edge(u, v, data)
+        for ip, name in simulator.ip_to_node_map.items():
+            self.add_address(ip, name)
+        for name, interfaces in simulator.node_interfaces_and_subnets.items():
+            for ip, network in interfaces.items():
+                self.add_interface(name, ip, network)
+        for name, table in simulator.routing_tables.items():
+            for entry in table:
+                self.add_route(name, entry['destination_network'], entry['next_hop'])
+        for name, gateway in simulator.host_gateways.items():
+            self.add_gateway(name, gateway)
+        return self
+
+    def _grouped(self, node_column):
+        """Offsets CSR por nó e a ordem estável das linhas agrupadas por nó."""
+        counts = [0] * (len(self._names) + 1)
+        for node_id in node_column:
+            counts[node_id + 1] += 1
+        offsets = array('I', counts)
+        for i in range(1, len(offsets)):
+            offsets[i] += offsets[i - 1]
+        return offsets, sorted(range(len(node_column)), key=node_column.__getitem__)
+
+    def build(self):
+        n = len(self._names)
+
+        encoded = [name.encode() for name in self._names]
+        names = b''.join(encoded)
+        name_offsets = array('I', [0]) * (n + 1)
+        for i, name_bytes in enumerate(encoded):
+            name_offsets[i + 1] = name_offsets[i] + len(name_bytes)
+        size = 1 << max(3, (2 * n).bit_length())
+        name_index = array('i', [-1]) * size
+        for i, name_bytes in enumerate(encoded):
+            slot = _hash(name_bytes) & (size - 1)
+            while name_index[slot] >= 0:
+                slot = (slot + 1) & (size - 1)
+            name_index[slot] = i
+        del encoded
+
+        # CSR: percorrendo as arestas (u <= v) em ordem, cada linha já sai ordenada
+        degree = [0] * (n + 1)
+        for u, v in self._edges:
+            degree[u + 1] += 1
+            if u != v:
+                degree[v + 1] += 1
+        adjacency_offsets = array('I', degree)
+        for i in range(1, n + 1):
+            adjacency_offsets[i] += adjacency_offsets[i - 1]
+        cursor = array('I', adjacency_offsets)
+        adjacency = array('I', [0]) * adjacency_offsets[n]
+        adjacency_attributes = array('I', [0]) * adjacency_offsets[n]
+        for (u, v), code in sorted(self._edges.items()):
+            for a, b in ((u, v), (v, u)) if u != v else ((u, v),):
+                adjacency[cursor[a]] = b
+                adjacency_attributes[cursor[a]] = code
+                cursor[a] += 1
+        del cursor
+        self._edges = {}
+
+        # ip_to_node_map: ordenado por IP; em IPs repetidos vale o último registro
+        addresses, address_nodes = array('I'), array('I')
+        for i in sorted(range(len(self._address_keys)), key=self._address_keys.__getitem__):
+            ip_int = self._address_keys[i]
+            if addresses and addresses[-1] == ip_int:
+                address_nodes[-1] = self._address_nodes[i]
+            else:
+                addresses.append(ip_int)
+                address_nodes.append(self._address_nodes[i])
+
+        # Interfaces: o mesmo IP repetido em um nó mantém a posição e fica com a última sub-rede
+        interface_nodes, interface_ips, interface_nets, interface_lens = self._interfaces
+        interface_offsets, order = self._grouped(interface_nodes)
+        interface_addresses, interface_networks, interface_prefixlens = array('I'), array('I'), array('B')
+        for node_id in range(n):
+            rows = {}
+            for i in order[interface_offsets[node_id]:interface_offsets[node_id + 1]]:
+                rows[interface_ips[i]] = (interface_nets[i], interface_lens[i])
+            interface_offsets[node_id] = len(interface_addresses)
+            for ip_int, (network, prefixlen) in rows.items():
+                interface_addresses.append(ip_int)
+                interface_networks.append(network)
+                interface_prefixlens.append(prefixlen)
+        interface_offsets[n] = len(interface_addresses)
+
+        route_nodes, destinations, prefixlens, next_hops = self._routes
+        route_offsets, order = self._grouped(route_nodes)
+        route_destinations = array('I', (destinations[i] for i in order))
+        route_prefixlens = array('B', (prefixlens[i] for i in order))
+        route_next_hops = array('q', (next_hops[i] for i in order))
+
+        type_names = [None, None] + list(self._type_codes)
+        return CompactNetwork(
+            names=names, name_offsets=name_offsets, name_index=name_index,
+            node_types=array('B', self._types), type_names=type_names,
+            adjacency_offsets=adjacency_offsets, adjacency=adjacency,
+            adjacency_attributes=adjacency_attributes, edge_attributes=self._attributes,
+            addresses=addresses, address_nodes=address_nodes, extra_addresses=self._extra_addresses,
+            interface_offsets=interface_offsets, interface_addresses=interface_addresses,
+            interface_networks=interface_networks, interface_prefixlens=interface_prefixlens,
+            route_offsets=route_offsets, route_destinations=route_destinations,
+            route_prefixlens=route_prefixlens, route_next_hops=route_next_hops,
+            gateways=array('q', self._gateways), values=self._values,
+        )
+
+
+# --- Visões com a interface do networkx e dos dicionários do simulador ---
+
+class CompactGraph:
+    """
+    Grafo sobre CompactNetwork com a parte da interface do networkx usada
+    pelo simulador (nodes, edges, has_edge, neighbors). Links entre nós
+    existentes podem ser removidos e incluídos; as alterações ficam em
+    _removed/_added e incrementam version, como em VersionedGraph.
+    """
+
+    def __init__(self, network):
+        self.network = network
+        self.version = 0
+        self._removed = set() # Arestas do CSR ocultadas, como (menor id, maior id)
+        self._added = {} # Arestas fora do CSR (ou com atributos alterados) -> atributos
+        self._node_count = sum(1 for code in network.node_types if code != _NOT_IN_GRAPH)
+        self.nodes = _NodeView(self)
+        self.edges = _EdgeView(self)
+
+    def _node_id(self, name):
+        node_id = self.network.node_id(name)
+        if node_id >= 0 and self.network.node_types[node_id] != _NOT_IN_GRAPH:
+            return node_id
+        return -1
+
+    def _base_has_edge(self, u, v):
+        network = self.network
+        hi = network.adjacency_offsets[u + 1]
+        i = bisect_left(network.adjacency, v, network.adjacency_offsets[u], hi)
+        return i < hi and network.adjacency[i] == v
+
+    def _has_edge_ids(self, u, v):
+        key = (u, v) if u <= v else (v, u)
+        if self._added and key in self._added:
+            return True
+        if self._removed and key in self._removed:
+            return False
+        return self._base_has_edge(u, v)
+
+    def has_edge(self, u, v):
+        u, v = self._node_id(u), self._node_id(v)
+        return u >= 0 and v >= 0 and self._has_edge_ids(u, v)
+
+    def has_node(self, n):
+        return self._node_id(n) >= 0
+
+    def __contains__(self, n):
+        return self._node_id(n) >= 0
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __len__(self):
+        return self._node_count
+
+    def number_of_nodes(self):
+        return self._node_count
+
+    def number_of_edges(self):
+        return sum(1 for _ in self._edge_ids())
+
+    def neighbors(self, n):
+        node_id = self._node_id(n)
+        if node_id < 0:
+            raise nx.NetworkXError(f"The node {n} is not in the graph.")
+        network = self.network
+        name = network.node_name
+        for slot in range(network.adjacency_offsets[node_id], network.adjacency_offsets[node_id + 1]):
+            neighbor = network.adjacency[slot]
+            key = (node_id, neighbor) if node_id <= neighbor else (neighbor, node_id)
+            if key not in self._removed:
+                yield name(neighbor)
+        for u, v in self._added:
+            if u == node_id or v == node_id:
+                yield name(v if u == node_id else u)
+
+    def _edge_ids(self, data=False):
+        """(u, v[, atributos]) de cada aresta, com u <= v."""
+        network = self.network
+        offsets, adjacency, attribute_ids = network.adjacency_offsets, network.adjacency, network.adjacency_attributes
+        removed = self._removed
+        for u in range(network.node_count):
+            hi = offsets[u + 1]
+            for slot in range(bisect_left(adjacency, u, offsets[u], hi), hi):
+                v = adjacency[slot]
+                if removed and (u, v) in removed:
+                    continue
+                yield (u, v, network.edge_attributes[attribute_ids[slot]]) if data else (u, v)
+        for (u, v), attributes in self._added.items():
+            yield (u, v, attributes) if data else (u, v)
+
+    def _edge_attributes(self, u, v):
+        key = (u, v) if u <= v else (v, u)
+        attributes = self._added.get(key)
+        if attributes is not None:
+            return attributes
+        if key in self._removed or not self._base_has_edge(u, v):
+            return None
+        network = self.network
+        slot = bisect_left(network.adjacency, v, network.adjacency_offsets[u], network.adjacency_offsets[u + 1])
+        return network.edge_attributes[network.adjacency_attributes[slot]]
+
+    def add_edge(self, u_of_edge, v_of_edge, **attr):
+        u, v = self._node_id(u_of_edge), self._node_id(v_of_edge)
+        if u < 0 or v < 0:
+            missing = u_of_edge if u < 0 else v_of_edge
+            raise ValueError(f"o armazenamento compacto não permite incluir nós ({missing!r})")
+        key = (u, v) if u <= v else (v, u)
+        attributes = dict(self._edge_attributes(u, v) or {}, **attr)
+        self._added.pop(key, None)
+        self._removed.discard(key)
+        if self._base_has_edge(u, v):
+            if self._edge_attributes(u, v) == attributes:
+                self.version += 1
+                return # Link do CSR restaurado com os mesmos atributos: nada fica na camada
+            self._removed.add(key)
+        self._added[key] = attributes
+        self.version += 1
+
+    def add_edges_from(self, ebunch_to_add, **attr):
+        for edge in ebunch_to_add:
+            self.add_edge(edge[0], edge[1], **(edge[2] if len(edge) == 3 else {}), **attr)
+
+    def remove_edge(self, u, v):
+        u_id, v_id = self._node_id(u), self._node_id(v)
+        if u_id < 0 or v_id < 0 or not self._has_edge_ids(u_id, v_id):
+            raise nx.NetworkXError(f"The edge {u}-{v} is not in the graph")
+        key = (u_id, v_id) if u_id <= v_id else (v_id, u_id)
+        self._added.pop(key, None)
+        if self._base_has_edge(u_id, v_id):
+            self._removed.add(key)
+        self.version += 1
+
+    def remove_edges_from(self, ebunch):
+        for edge in ebunch:
+            if self.has_edge(edge[0], edge[1]):
+                self.remove_edge(edge[0], edge[1])
+
+    def add_node(self, node_for_adding, **attr):
+        raise ValueError("o armazenamento compacto não permite incluir nós depois da carga")
+
+
+class _NodeView:
+    """graph.nodes: iteração, pertinência, atributos (graph.nodes[n]) e nodes(data=True)."""
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def _attributes(self, node_id):
+        network = self._graph.network
+        code = network.node_types[node_id]
+        return {} if code == _UNTYPED else {'type': network.type_names[code]}
+
+    def __call__(self, data=False):
+        if not data:
+            return self
+        network = self._graph.network
+        return ((network.node_name(i), self._attributes(i))
+                for i in range(network.node_count) if network.node_types[i] != _NOT_IN_GRAPH)
+
+    def __iter__(self):
+        network = self._graph.network
+        return (network.node_name(i) for i in range(network.node_count) if network.node_types[i] != _NOT_IN_GRAPH)
+
+    def __len__(self):
+        return len(self._graph)
+
+    def __contains__(self, n):
+        return n in self._graph
+
+    def __getitem__(self, n):
+        node_id = self._graph._node_id(n)
+        if node_id < 0:
+            raise KeyError(n)
+        return self._attributes(node_id)
+
+
+class _EdgeView:
+    """graph.edges: iteração, edges(data=True) e atributos (graph.edges[u, v])."""
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __call__(self, data=False):
+        if not data:
+            return self
+        name = self._graph.network.node_name
+        return ((name(u), name(v), attributes) for u, v, attributes in self._graph._edge_ids(data=True))
+
+    def __iter__(self):
+        name = self._graph.network.node_name
+        return ((name(u), name(v)) for u, v in self._graph._edge_ids())
+
+    def __len__(self):
+        return self._graph.number_of_edges()
+
+    def __contains__(self, edge):
+        return self._graph.has_edge(*edge)
+
+    def __getitem__(self, edge):
+        u, v = self._graph._node_id(edge[0]), self._graph._node_id(edge[1])
+        attributes = self._graph._edge_attributes(u, v) if u >= 0 and v >= 0 else None
+        if attributes is None:
+            raise KeyError(f"The edge {edge} is not in the graph.")
+        return attributes
+
+
+class _CompactMapping(MutableMapping):
+    """
+    Dicionário sobre os arrays de CompactNetwork: os valores são decodificados
+    a cada acesso; atribuições e remoções ficam em _overlay/_deleted.
+    Subclasses implementam _lookup (valor ou _MISSING), _keys e _count.
+    on_change(chave), se definido pelo simulador, é chamado a cada alteração.
+    """
+
+    on_change = None
+
+    def __init__(self, network):
+        self.network = network
+        self._overlay = {}
+        self._deleted = set()
+
+    def _has(self, key):
+        return self._lookup(key) is not _MISSING
+
+    def get(self, key, default=None):
+        if self._overlay or self._deleted:
+            if key in self._overlay:
+                return self._overlay[key]
+            if key in self._deleted:
+                return default
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        if key in self._overlay:
+            return True
+        return key not in self._deleted and self._has(key)
+
+    def _changed(self, key):
+        if self.on_change is not None:
+            self.on_change(key)
+
+    def __setitem__(self, key, value):
+        self._overlay[key] = value
+        self._deleted.discard(key)
+        self._changed(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._overlay.pop(key, None)
+        if self._has(key):
+            self._deleted.add(key)
+        self._changed(key)
+
+    def __iter__(self):
+        for key in self._keys():
+            if key not in self._overlay and key not in self._deleted:
+                yield key
+        yield from self._overlay
+
+    def __len__(self):
+        return self._count() - len(self._deleted) + sum(1 for key in self._overlay if not self._has(key))
+
+
+class AddressMap(_CompactMapping):
+    """ip_to_node_map: IP em texto -> nome do nó (iteração em ordem de IP)."""
+
+    def _lookup(self, ip):
+        network = self.network
+        ip_int = _ipv4(ip)
+        if ip_int is None:
+            node_id = network.extra_addresses.get(ip) if isinstance(ip, str) else None
+            return _MISSING if node_id is None else network.node_name(node_id)
+        addresses = network.addresses
+        i = bisect_left(addresses, ip_int)
+        if i < len(addresses) and addresses[i] == ip_int:
+            return network.node_name(network.address_nodes[i])
+        return _MISSING
+
+    def _keys(self):
+        for ip_int in self.network.addresses:
+            yield _ip_str(ip_int)
+        yield from self.network.extra_addresses
+
+    def _count(self):
+        return len(self.network.addresses) + len(self.network.extra_addresses)
+
+
+class _NodeMapping(_CompactMapping):
+    """Dicionário indexado por nome de nó; subclasses implementam _value(id) e _present(id)."""
+
+    def _lookup(self, name):
+        node_id = self.network.node_id(name)
+        return self._value(node_id) if node_id >= 0 and self._present(node_id) else _MISSING
+
+    def _has(self, name):
+        node_id = self.network.node_id(name)
+        return node_id >= 0 and self._present(node_id)
+
+    def _keys(self):
+        network = self.network
+        return (network.node_name(i) for i in range(network.node_count) if self._present(i))
+
+    def _count(self):
+        return sum(1 for i in range(self.network.node_count) if self._present(i))
+
+
+class GatewayMap(_NodeMapping):
+    """host_gateways: host -> IP do gateway."""
+
+    def _present(self, node_id):
+        return self.network.gateways[node_id] != _ABSENT
+
+    def _value(self, node_id):
+        return self.network.decode_value(self.network.gateways[node_id])
+
+
+class InterfaceMap(_NodeMapping):
+    """node_interfaces_and_subnets: nó -> {IPv4Address: IPv4Network} somente leitura, montado a cada acesso."""
+
+    def _present(self, node_id):
+        offsets = self.network.interface_offsets
+        return offsets[node_id] != offsets[node_id + 1]
+
+    def _value(self, node_id):
+        network = self.network
+        return MappingProxyType({
+            ipaddress.IPv4Address(network.interface_addresses[i]):
+                ipaddress.IPv4Network((network.interface_networks[i], network.interface_prefixlens[i]))
+            for i in range(network.interface_offsets[node_id], network.interface_offsets[node_id + 1])
+        })
+
+
+class RouteEntry:
+    """
+    Entrada de rota; acessível como os dicionários originais (entry['next_hop']).
+    Alterações feitas na entrada são gravadas de volta nos arrays da rede.
+    """
+
+    __slots__ = ROUTE_FIELDS + ('_network', '_row')
+
+    def __init__(self, destination_network, next_hop, network=None, row=None):
+        self.destination_network = destination_network
+        self.next_hop = next_hop
+        self._network = network
+        self._row = row
+
+    def __getitem__(self, key):
+        if key not in ROUTE_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in ROUTE_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+        if self._network is not None:
+            self._network.set_route(self._row, self.destination_network, self.next_hop)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in ROUTE_FIELDS else default
+
+    def keys(self):
+        return ROUTE_FIELDS
+
+    def __eq__(self, other):
+        if isinstance(other, (RouteEntry, dict)):
+            return all(self[key] == other.get(key, _MISSING) for key in ROUTE_FIELDS) and len(other.keys()) == 2
+        return NotImplemented
+
+    def __repr__(self):
+        return f"{{'destination_network': {self.destination_network!r}, 'next_hop': {self.next_hop!r}}}"
+
+
+class RouteMap(_NodeMapping):
+    """routing_tables: roteador -> tupla de RouteEntry, montada a cada acesso (troque a tabela inteira para alterá-la)."""
+
+    def _present(self, node_id):
+        offsets = self.network.route_offsets
+        return offsets[node_id] != offsets[node_id + 1]
+
+    def __setitem__(self, name, table):
+        # Devolver a lista original (ex.: falhas.py restaurando as tabelas) não precisa da camada
+        node_id = self.network.node_id(name)
+        if (node_id >= 0 and isinstance(table, (list, tuple)) and table
+                and [entry._row if getattr(entry, '_network', None) is self.network else None for entry in table]
+                == list(range(self.network.route_offsets[node_id], self.network.route_offsets[node_id + 1]))):
+            self._overlay.pop(name, None)
+            self._deleted.discard(name)
+            self._changed(name)
+            return
+        super().__setitem__(name, table)
+
+    def _value(self, node_id):
+        network = self.network
+        entries = []
+        for i in range(network.route_offsets[node_id], network.route_offsets[node_id + 1]):
+            prefixlen = network.route_prefixlens[i]
+            if prefixlen == _TEXT_DESTINATION:
+                destination = network.values[network.route_destinations[i]]
+            else:
+                destination = f"{_ip_str(network.route_destinations[i])}/{prefixlen}"
+            entries.append(RouteEntry(destination, network.decode_value(network.route_next_hops[i]), network, i))
+        return tuple(entries)
+
+
+def current_network(simulator):
+    """
+    CompactNetwork com o estado atual do simulador: a própria rede instalada,
+    se nada foi alterado em camadas depois da carga, ou uma nova, montada a partir das estruturas.
+    """
+    graph = simulator.graph
+    views = (simulator.ip_to_node_map, simulator.host_gateways,
+             simulator.node_interfaces_and_subnets, simulator.routing_tables)
+    if (isinstance(graph, CompactGraph) and not graph._removed and not graph._added
+            and all(isinstance(view, _CompactMapping) and view.network is graph.network
+                    and not view._overlay and not view._deleted for view in views)):
+        return graph.network
+    return CompactBuilder().add_simulator(simulator).build()
+
+
+def install(simulator, network):
+    """Passa o simulador a usar as visões sobre network no lugar dos dicionários."""
+    simulator.graph = CompactGraph(network)
+    simulator.ip_to_node_map = AddressMap(network)
+    simulator.host_gateways = GatewayMap(network)
+    simulator.node_interfaces_and_subnets = InterfaceMap(network)
+    simulator.routing_tables = RouteMap(network)
+    simulator.invalidate_forwarding_tables()
+    return network
+
+
+def load_compact_topology(simulator, path):
+    """Carrega um arquivo de topologia direto no armazenamento compacto."""
+    return install(simulator, CompactBuilder().add_records(read_topology(path)).build())
+
+
+def compact(simulator):
+    """Converte um simulador já carregado (em dicionários) para o armazenamento compacto."""
+    return install(simulator, CompactBuilder().add_simulator(simulator).build())
+
+
+def main(argv=None):
+    import gc
+    import tracemalloc
+    from simulador_rede import NetworkSimulator
+
+    parser = argparse.ArgumentParser(description="Compara a memória da rede em dicionários e no armazenamento compacto.")
+    parser.add_argument('topologia', help="arquivo de topologia")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for compact_mode in (False, True):
+        gc.collect()
+        tracemalloc.start()
+        simulator = NetworkSimulator()
+        simulator.load_network_configuration(args.topologia, compact=compact_mode)
+        gc.collect()
+        results[compact_mode] = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del simulator
+
+    for compact_mode, label in ((False, 'dicionários'), (True, 'compacto')):
+        current, peak = results[compact_mode]
+        print(f"{label:<12} {current / 1e6:10.1f} MB (pico na carga: {peak / 1e6:.1f} MB)")
+    print(f"Redução: {results[False][0] / max(results[True][0], 1):.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Benchmarks do simulador em topologias sintéticas de vários tamanhos.
+
+Para cada escala (da rede de exemplo, com 15 nós, até 100 mil hosts) mede:
+  load_seconds            -> carga da topologia (load_network_configuration) e compilação das FIBs
+  peak_memory_bytes       -> pico de memória da carga (tracemalloc)
+  lookup_ns               -> uma decisão de encaminhamento (_get_next_hop)
+  path_queries_per_second -> consultas resolve_path por segundo (com e sem o cache de caminhos)
+  sweep_seconds           -> alcançabilidade em lote (all_pairs_reachability) de uma amostra de origens
+  traceroute_seconds      -> varredura de xtraceroute em um processo (varredura.py) de uma amostra menor
+
+Tudo roda localmente, com sementes fixas. Os resultados são gravados em JSON
+(-o) e podem servir de referência: --comparar aponta as métricas que pioraram
+mais que --limite em relação a um resultado anterior.
+    python desempenho.py --escalas exemplo,arvore -o base.json
+    python desempenho.py --escalas exemplo,arvore --comparar base.json
+"""
+
+import argparse
+import gc
+import importlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from simulador_rede import NetworkSimulator
+from topologia import generate_fat_tree, generate_tree_topology, write_topology
+from varredura import host_addresses, sweep_traceroutes
+
+FORMAT_VERSION = 1
+
+# Escala -> (descrição, gerador dos registros; None = rede de exemplo)
+SCALES = {
+    'exemplo': ("rede de exemplo (15 nós)", None),
+    'arvore': ("árvore 4x4x16 (256 hosts)", lambda: generate_tree_topology(4, 4, 16)),
+    'fat-tree': ("fat-tree k=16 (1024 hosts)", lambda: generate_fat_tree(16)),
+    'fat-tree-ecmp': ("fat-tree k=8 com ECMP (128 hosts)", lambda: generate_fat_tree(8, ecmp=True)),
+    '10k': ("árvore 10x20x50 (10 mil hosts)", lambda: generate_tree_topology(10, 20, 50)),
+    '100k': ("árvore 20x20x250 (100 mil hosts)", lambda: generate_tree_topology(20, 20, 250)),
+}
+DEFAULT_SCALES = ('exemplo', 'arvore', 'fat-tree', 'fat-tree-ecmp', '10k')
+
+# Métrica -> True se valores maiores são melhores
+METRICS = {
+    'load_seconds': False,
+    'peak_memory_bytes': False,
+    'lookup_ns': False,
+    'path_queries_per_second': True,
+    'path_queries_per_second_uncached': True,
+    'sweep_seconds': False,
+    'traceroute_seconds': False,
+}
+
+LOOKUPS = 20000 # Decisões de encaminhamento por repetição
+PATH_QUERIES = 20000 # Consultas resolve_path por repetição
+SWEEP_SOURCES = 256 # Origens da alcançabilidade em lote (destinos: todos os hosts)
+TRACEROUTE_SOURCES = 16 # Origens da varredura de xtraceroute (destinos: até 1024 hosts)
+TRACEROUTE_DESTINATIONS = 1024
+SEED = 42
+
+
+def _best(function, repeats):
+    """Menor tempo (em segundos) entre as repetições, e o último resultado de function."""
+    best = None
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def topology_path(scale, directory):
+    """Arquivo da topologia da escala em directory (gerado se ainda não existir); None para a rede de exemplo."""
+    generator = SCALES[scale][1]
+    if generator is None:
+        return None
+    path = os.path.join(directory, f'{scale}.jsonl')
+    if not os.path.exists(path):
+        write_topology(generator(), path)
+    return path
+
+
+def _load(path, compact):
+    simulator = NetworkSimulator()
+    simulator.load_network_configuration(path, compact=compact)
+    simulator.compile_forwarding_tables() # Senão a compilação cairia na primeira repetição de lookup_ns
+    return simulator
+
+
+def run_scale(scale, directory, repeats=3, compact=False):
+    """Mede uma escala; retorna {métrica: valor} mais o tamanho da rede."""
+    path = topology_path(scale, directory)
+    results = {}
+
+    results['load_seconds'], simulator = _best(lambda: _load(path, compact), repeats)
+    gc.collect()
+    tracemalloc.start()
+    _load(path, compact)
+    results['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    rng = random.Random(SEED)
+    hosts = host_addresses(simulator)
+    addresses = sorted(simulator.ip_to_node_map)
+    routers = sorted(name for name in simulator.graph.nodes
+                     if simulator.graph.nodes[name].get('type') != 'host' and simulator.get_forwarding_table(name))
+    results['hosts'] = len(hosts)
+    results['nodes'] = simulator.graph.number_of_nodes()
+
+    lookups = [(rng.choice(routers), rng.choice(addresses)) for _ in range(LOOKUPS)]
+    get_next_hop = simulator._get_next_hop
+    elapsed, _ = _best(lambda: [get_next_hop(router, ip) for router, ip in lookups], repeats)
+    results['lookup_ns'] = elapsed / LOOKUPS * 1e9
+
+    pairs = [(rng.choice(hosts), rng.choice(hosts)) for _ in range(PATH_QUERIES)]
+    resolve_path = simulator.resolve_path
+    elapsed, _ = _best(lambda: [resolve_path(source, destination) for source, destination in pairs], repeats)
+    results['path_queries_per_second'] = PATH_QUERIES / elapsed
+    cache, simulator.path_cache = simulator.path_cache, None
+    elapsed, _ = _best(lambda: [resolve_path(source, destination) for source, destination in pairs], repeats)
+    results['path_queries_per_second_uncached'] = PATH_QUERIES / elapsed
+    simulator.path_cache = cache
+
+    sources = rng.sample(hosts, min(SWEEP_SOURCES, len(hosts)))
+    try:
+        results['sweep_seconds'], _ = _best(lambda: simulator.all_pairs_reachability(sources, hosts), repeats)
+        results['sweep_pairs'] = len(sources) * len(hosts)
+    except ImportError: # all_pairs_reachability requer NumPy
+        results['sweep_seconds'] = None
+
+    sources = sources[:TRACEROUTE_SOURCES]
+    destinations = rng.sample(hosts, min(TRACEROUTE_DESTINATIONS, len(hosts)))
+    results['traceroute_seconds'], _ = _best(
+        lambda: sweep_traceroutes(simulator, io.StringIO(), sources, destinations, workers=1), repeats)
+    results['traceroute_pairs'] = len(sources) * len(destinations)
+    return results
+
+
+def run(scales, directory, repeats=3, compact=False, output=sys.stderr):
+    """Executa as escalas e retorna o documento de resultados (ver compare)."""
+    document = {
+        'format': FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': 'compacto' if compact else 'dicionarios',
+        'repeats': repeats,
+        'scales': {},
+    }
+    try:
+        importlib.import_module('alcancabilidade') # Importa o NumPy antes das medidas
+    except ImportError:
+        pass
+    for scale in scales:
+        print(f"Medindo {scale}: {SCALES[scale][0]}...", file=output)
+        document['scales'][scale] = run_scale(scale, directory, repeats, compact)
+    return document
+
+
+def compare(baseline, current, threshold=0.10):
+    """
+    Compara dois documentos de resultados. Retorna uma lista de
+    (escala, métrica, referência, atual, variação, regressão), onde variação é
+    relativa (positiva = pior) e regressão indica piora acima de threshold.
+    """
+    rows = []
+    for scale, results in current['scales'].items():
+        reference = baseline['scales'].get(scale)
+        if reference is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = reference.get(metric), results.get(metric)
+            if not before or after is None:
+                continue
+            change = (before - after) / before if higher_is_better else (after - before) / before
+            rows.append((scale, metric, before, after, change, change > threshold))
+    return rows
+
+
+def _format(value):
+    return f"{value:.4g}" if isinstance(value, float) else str(value)
+
+
+def print_results(document, output=sys.stdout):
+    for scale, results in document['scales'].items():
+        print(f"{scale} ({results['nodes']} nós, {results['hosts']} hosts):", file=output)
+        for metric in METRICS:
+            if results.get(metric) is not None:
+                print(f"  {metric:<34} {_format(results[metric])}", file=output)
+
+
+def print_comparison(rows, threshold, output=sys.stdout):
+    print(f"{'escala':<14} {'métrica':<34} {'referência':>12} {'atual':>12} {'variação':>9}", file=output)
+    for scale, metric, before, after, change, regression in rows:
+        mark = "  REGRESSÃO" if regression else ""
+        print(f"{scale:<14} {metric:<34} {_format(before):>12} {_format(after):>12} {change:>+8.1%}{mark}", file=output)
+    regressions = sum(row[5] for row in rows)
+    print(f"{regressions} regressão(ões) acima de {threshold:.0%}", file=output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do simulador em topologias sintéticas.")
+    parser.add_argument('--escalas', default=','.join(DEFAULT_SCALES),
+                        help=f"escalas separadas por vírgula (disponíveis: {', '.join(SCALES)}; padrão: sem 100k)")
+    parser.add_argument('-n', '--repeticoes', type=int, default=5, help="repetições de cada medida (vale a melhor)")
+    parser.add_argument('--compacto', action='store_true', help="mede o armazenamento compacto (compacto.py)")
+    parser.add_argument('--dados', metavar='DIR', help="pasta onde as topologias geradas são guardadas e reaproveitadas")
+    parser.add_argument('-o', '--saida', metavar='ARQUIVO', help="grava os resultados em JSON")
+    parser.add_argument('--comparar', metavar='REFERENCIA', help="compara com um resultado gravado anteriormente")
+    parser.add_argument('--atual', metavar='ARQUIVO',
+                        help="com --comparar, usa este resultado gravado em vez de medir de novo")
+    parser.add_argument('--limite', type=float, default=0.10,
+                        help="piora relativa considerada regressão (padrão: 0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    if args.atual:
+        if not args.comparar:
+            parser.error("--atual requer --comparar")
+        with open(args.atual, encoding='utf-8') as f:
+            document = json.load(f)
+    else:
+        scales = [scale.strip() for scale in args.escalas.split(',') if scale.strip()]
+        unknown = [scale for scale in scales if scale not in SCALES]
+        if unknown:
+            parser.error(f"escala desconhecida: {', '.join(unknown)} (disponíveis: {', '.join(SCALES)})")
+        if args.dados:
+            os.makedirs(args.dados, exist_ok=True)
+            document = run(scales, args.dados, args.repeticoes, args.compacto)
+        else:
+            with tempfile.TemporaryDirectory() as directory:
+                document = run(scales, directory, args.repeticoes, args.compacto)
+        print_results(document)
+        if args.saida:
+            with open(args.saida, 'w', encoding='utf-8') as f:
+                json.dump(document, f, indent=2)
+                f.write('\n')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('backend') != document.get('backend'):
+            print(f"Aviso: referência medida com '{baseline.get('backend')}', atual com '{document.get('backend')}'",
+                  file=sys.stderr)
+        rows = compare(baseline, document, args.limite)
+        print_comparison(rows, args.limite)
+        return 1 if any(row[5] for row in rows) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+Caminhos ECMP (equal-cost multipath).
+
+Uma rota pode ter vários próximos saltos (lista em 'next_hop'). xping e
+xtraceroute seguem um deles por fluxo (hash do 5-tupla, fib.select_next_hop);
+aqui são considerados todos os saltos de cada grupo.
+
+count_paths conta os caminhos de um par por situação final com programação
+dinâmica sobre (nó, TTL restante): as decisões de encaminhamento só dependem
+do nó e do destino, então cada estado é resolvido uma vez e o tempo é
+polinomial mesmo quando há um número exponencial de caminhos (fat-trees).
+enumerate_paths gera os caminhos um a um, no formato de resolve_path.
+Nas análises em lote, alcancabilidade e trafego escolhem o salto de cada
+par pelo mesmo hash de fluxo do xping, verificacao considera todos os
+saltos de cada grupo (basta um ramo com loop ou buraco negro) e falhas
+recusa redes com ECMP.
+"""
+
+import argparse
+import sys
+from itertools import islice
+
+from fib import CONNECTED, ip_to_int
+from resultados import (
+    LINK_FAILURE, NO_ROUTE, OK, TTL, TTL_EXPIRED, UNKNOWN_DESTINATION, UNKNOWN_NEXT_HOP, UNKNOWN_SOURCE, PathResult
+)
+
+# Situações contadas por count_paths, na ordem das tuplas internas
+OUTCOMES = (OK, NO_ROUTE, UNKNOWN_NEXT_HOP, LINK_FAILURE, TTL_EXPIRED)
+_INDEX = {status: i for i, status in enumerate(OUTCOMES)}
+
+
+class _ForwardingGraph:
+    """Saltos possíveis de cada nó em direção a um destino (o grafo de encaminhamento)."""
+
+    def __init__(self, simulator, destination_ip, destination_node):
+        self.simulator = simulator
+        self.destination_ip = destination_ip
+        self.destination_node = destination_node
+        self.ip_int = ip_to_int(destination_ip)
+        self._branches = {}
+
+    def _next_hops(self, node):
+        simulator = self.simulator
+        if simulator.graph.nodes[node].get('type') == 'host':
+            return (simulator.host_gateways.get(node),)
+        forwarding_table = simulator.get_forwarding_table(node)
+        if forwarding_table is None or self.ip_int is None:
+            return (None,)
+        match = forwarding_table.lookup(self.ip_int, multipath=True)
+        if match is None:
+            return (None,)
+        if match[0] == CONNECTED:
+            return (self.destination_ip,)
+        return match[1]
+
+    def branches(self, node):
+        """
+        Saltos distintos a partir de node, como em resolve_path: (próximo_nó, None)
+        para um salto possível ou (None, (situação, próximo_salto, próximo_nó)) para uma falha.
+        """
+        branches = self._branches.get(node)
+        if branches is not None:
+            return branches
+        simulator = self.simulator
+        branches = []
+        for next_hop in dict.fromkeys(self._next_hops(node)): # Saltos repetidos no grupo levam ao mesmo caminho
+            if not next_hop:
+                branches.append((None, (NO_ROUTE, None, None)))
+                continue
+            next_node = simulator.ip_to_node_map.get(next_hop)
+            if next_node is None:
+                if next_hop != self.destination_ip:
+                    branches.append((None, (UNKNOWN_NEXT_HOP, next_hop, None)))
+                    continue
+                next_node = self.destination_node
+            if next_node != self.destination_node and not simulator.graph.has_edge(node, next_node):
+                branches.append((None, (LINK_FAILURE, next_hop, next_node)))
+                continue
+            branches.append((next_node, None))
+        self._branches[node] = branches
+        return branches
+
+
+def _endpoints(simulator, source_ip, destination_ip, command):
+    """(nó de origem, nó de destino, None) ou (None, None, PathResult de host desconhecido)."""
+    source_node = simulator.get_node_by_ip(source_ip)
+    destination_node = simulator.get_node_by_ip(destination_ip)
+    if not source_node:
+        return None, None, PathResult(command, source_ip, destination_ip, UNKNOWN_SOURCE,
+                                      reason=f"Host de origem '{source_ip}' não encontrado na configuração da rede.")
+    if not destination_node:
+        return None, None, PathResult(command, source_ip, destination_ip, UNKNOWN_DESTINATION,
+                                      reason=f"Host de destino '{destination_ip}' não encontrado na configuração da rede.")
+    return source_node, destination_node, None
+
+
+def count_paths(simulator, source_ip, destination_ip, ttl=TTL):
+    """
+    Número de caminhos ECMP de source_ip a destination_ip por situação final
+    ({situação: quantidade}, com todas as situações de OUTCOMES).
+    Hosts desconhecidos contam como um único caminho com a situação correspondente.
+    """
+    source_node, destination_node, unknown = _endpoints(simulator, source_ip, destination_ip, 'xping')
+    if unknown is not None:
+        return dict.fromkeys(OUTCOMES, 0) | {unknown.status: 1}
+
+    forwarding = _ForwardingGraph(simulator, destination_ip, destination_node)
+    zero = (0,) * len(OUTCOMES)
+    terminal = {status: tuple(int(i == index) for i in range(len(OUTCOMES))) for status, index in _INDEX.items()}
+    memo = {}
+
+    def paths_from(node, remaining):
+        if node == destination_node:
+            return terminal[OK]
+        if remaining == 0:
+            return terminal[TTL_EXPIRED]
+        key = (node, remaining)
+        counts = memo.get(key)
+        if counts is None:
+            counts = zero
+            for next_node, failure in forwarding.branches(node):
+                branch = terminal[failure[0]] if failure is not None else paths_from(next_node, remaining - 1)
+                counts = tuple(a + b for a, b in zip(counts, branch))
+            memo[key] = counts
+        return counts
+
+    return dict(zip(OUTCOMES, paths_from(source_node, ttl)))
+
+
+def enumerate_paths(simulator, source_ip, destination_ip, command='xtraceroute', ttl=TTL):
+    """
+    Gera um PathResult por caminho ECMP de source_ip a destination_ip (busca
+    em profundidade, na ordem dos grupos); cada um é o resultado de resolve_path
+    para os fluxos que seguem esse caminho.
+    """
+    source_node, destination_node, unknown = _endpoints(simulator, source_ip, destination_ip, command)
+    if unknown is not None:
+        yield unknown
+        return
+
+    forwarding = _ForwardingGraph(simulator, destination_ip, destination_node)
+    path = [source_node]
+    # Pilha de iteradores sobre os saltos de cada nó do caminho atual
+    stack = [None]
+    while stack:
+        node = path[-1]
+        moves = len(path) - 1
+        if stack[-1] is None:
+            if node == destination_node:
+                yield PathResult(command, source_ip, destination_ip, OK, list(path), ttl_used=moves)
+            elif moves >= ttl:
+                yield PathResult(command, source_ip, destination_ip, TTL_EXPIRED, list(path), "TTL expirado", moves)
+            else:
+                stack[-1] = iter(forwarding.branches(node))
+        branch = next(stack[-1], None) if stack[-1] is not None else None
+        if branch is None:
+            stack.pop()
+            path.pop()
+            continue
+        next_node, failure = branch
+        if failure is None:
+            path.append(next_node)
+            stack.append(None)
+            continue
+        status, next_hop, failed_node = failure
+        if status == NO_ROUTE:
+            yield PathResult(command, source_ip, destination_ip, NO_ROUTE, list(path),
+                             "Destino Inalcançável (Nenhuma rota)", moves)
+        elif status == UNKNOWN_NEXT_HOP:
+            yield PathResult(command, source_ip, destination_ip, UNKNOWN_NEXT_HOP, list(path),
+                             f"Próximo Salto Desconhecido ({next_hop})", moves, next_hop)
+        else:
+            yield PathResult(command, source_ip, destination_ip, LINK_FAILURE, list(path),
+                             f"Falha de Link para {failed_node} (IP: {next_hop})", moves, next_hop, failed_node)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conta e lista os caminhos ECMP entre dois IPs.")
+    parser.add_argument('topologia', nargs='?', help="arquivo de topologia (padrão: rede de exemplo)")
+    parser.add_argument('origem', help="IP de origem")
+    parser.add_argument('destino', help="IP de destino")
+    parser.add_argument('--listar', type=int, default=10, metavar='N', help="caminhos listados (padrão: 10)")
+    parser.add_argument('--fluxo', metavar='PROTO:PORTA_ORIGEM:PORTA_DESTINO',
+                        help="mostra também o caminho escolhido pelo hash desse fluxo")
+    args = parser.parse_args(argv)
+
+    from simulador_rede import NetworkSimulator
+    simulator = NetworkSimulator()
+    simulator.load_network_configuration(args.topologia)
+
+    counts = count_paths(simulator, args.origem, args.destino)
+    print(f"Caminhos de {args.origem} para {args.destino}: {sum(counts.values())}")
+    for status, count in counts.items():
+        if count:
+            print(f"  {status}: {count}")
+    for i, result in enumerate(islice(enumerate_paths(simulator, args.origem, args.destino), args.listar), 1):
+        print(f"  {i}. {' -> '.join(result.traceroute_hops())}")
+    if args.fluxo:
+        try:
+            flow = tuple(int(part) for part in args.fluxo.split(':'))
+        except ValueError:
+            parser.error(f"fluxo inválido '{args.fluxo}' (use PROTO:PORTA_ORIGEM:PORTA_DESTINO)")
+        result = simulator.resolve_path(args.origem, args.destino, 'xtraceroute', flow)
+        print(f"Fluxo {args.fluxo}: {' -> '.join(result.traceroute_hops())}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""
+Análise "e se" de falhas de links e nós, com recálculo incremental.
+
+O caminho de um par (origem, destino) é dividido em duas partes: o acesso
+(host -> gateway, que não depende do destino) e o segmento a partir do nó
+de partida, que só depende da classe de equivalência do destino (faixa de
+endereços em que todo roteador toma a mesma decisão). Os segmentos são
+calculados uma vez por (nó de partida, classe) e indexados ao contrário:
+para cada link e cada nó, quais segmentos passam por ele. Uma falha só
+refaz os segmentos atingidos e só reavalia os pares que dependem deles,
+então o custo é proporcional ao tráfego afetado, e não ao tamanho da rede.
+
+A semântica é a mesma do xping: TTL de 30 saltos, entrega direta em
+sub-redes conectadas e checagem de link físico (exceto no salto final).
+Redes com rotas ECMP não são aceitas: nelas o caminho também depende do
+fluxo, e um segmento por (nó de partida, classe) não representa todos os pares.
+"""
+
+import argparse
+import sys
+from array import array
+from bisect import bisect_right
+
+from caminhos import has_multipath, pair_outcome, walk_segment
+from fib import ip_to_int
+from resultados import OK, LINK_FAILURE
+
+NODE_FAILURE = 'node_failure' # Origem ou destino está em um nó que falhou
+
+
+def _link_key(u, v):
+    """Chave de um link não direcionado."""
+    return (u, v) if u <= v else (v, u)
+
+
+class FailureReport:
+    """Efeito de uma falha sobre os pares analisados."""
+
+    def __init__(self, links, nodes, recomputed_routers=()):
+        self.links = links # Links removidos (pares de nós)
+        self.nodes = nodes # Nós removidos
+        self.recomputed_routers = list(recomputed_routers)
+        self.pairs = 0 # Pares reavaliados (os que dependem do que falhou)
+        self.lost = 0 # Alcançáveis antes, inalcançáveis depois
+        self.recovered = 0 # Inalcançáveis antes, alcançáveis depois
+        self.rerouted = 0 # Alcançáveis antes e depois, por outro caminho
+        self.changes = [] # (ip_origem, ip_destino, situação_antes, situação_depois, saltos_depois)
+
+    def _record(self, source_ip, destination_ip, before, after, changed_path, collect):
+        self.pairs += 1
+        if before[0] == OK:
+            if after[0] != OK:
+                self.lost += 1
+            elif changed_path:
+                self.rerouted += 1
+            else:
+                return
+        elif after[0] == OK:
+            self.recovered += 1
+        elif before[0] == after[0]:
+            return
+        if collect:
+            self.changes.append((source_ip, destination_ip, before[0], after[0], after[1]))
+
+    def summary(self):
+        return {
+            'links': [list(link) for link in self.links],
+            'nodes': list(self.nodes),
+            'recomputed_routers': len(self.recomputed_routers),
+            'pairs': self.pairs,
+            'lost': self.lost,
+            'recovered': self.recovered,
+            'rerouted': self.rerouted,
+        }
+
+
+class FailureAnalyzer:
+    """
+    Pré-computa os caminhos de todos os pares (por padrão, todos os hosts)
+    e responde perguntas do tipo "e se este link/nó falhar?".
+    Com recompute_routes=True, as tabelas dos roteadores atingidos são
+    recalculadas (rotas.compute_routing_tables) antes de reavaliar os pares;
+    caso contrário, as tabelas ficam como estão (roteamento estático).
+    Levanta ValueError se a rede tem rotas ECMP.
+    """
+
+    def __init__(self, simulator, sources=None, destinations=None, recompute_routes=False,
+                 aggregate=True, default_route=False):
+        if has_multipath(simulator):
+            raise ValueError("a análise de falhas não suporta rotas ECMP (o caminho depende do fluxo)")
+        self.simulator = simulator
+        self.recompute_routes = recompute_routes
+        self.aggregate = aggregate
+        self.default_route = default_route
+
+        ip_map = simulator.ip_to_node_map
+        node_types = simulator.graph.nodes
+        if sources is None:
+            sources = [ip for ip, node_name in ip_map.items() if node_types[node_name].get('type') == 'host']
+        destinations = list(sources) if destinations is None else list(destinations)
+        self.boundaries = self._class_boundaries()
+
+        # Destinos agrupados por classe de equivalência: classe -> [(ip, nó, ip_int)]
+        self._destinations = {}
+        for ip in destinations:
+            ip_int = ip_to_int(ip)
+            self._destinations.setdefault(self._class_of(ip_int), []).append((ip, ip_map[ip], ip_int))
+        self._all_destinations = [d for group in self._destinations.values() for d in group]
+
+        # Origens agrupadas pelo nó de partida do segmento: nó -> [(ip, nó, prefixo)].
+        # Hosts com gateway válido partem do gateway, com o próprio host como prefixo.
+        self._sources = {}
+        self._source_start = {} # ip -> (nó, prefixo, nó de partida)
+        self._access = {} # link host-gateway -> origens que dependem dele
+        for ip in sources:
+            node_name = ip_map[ip]
+            start, prefix = node_name, ()
+            if node_types[node_name].get('type') == 'host':
+                gateway_node = ip_map.get(simulator.host_gateways.get(node_name) or '')
+                if gateway_node is not None and simulator.graph.has_edge(node_name, gateway_node):
+                    start, prefix = gateway_node, (node_name,)
+                    self._access.setdefault(_link_key(node_name, gateway_node), []).append(ip)
+            self._sources.setdefault(start, []).append((ip, node_name, prefix))
+            self._source_start[ip] = (node_name, prefix, start)
+
+        # Segmentos por (nó de partida, classe) e índices reversos link/nó -> segmentos
+        self._units = [] # segmento -> (nó de partida, classe)
+        self._unit_of = {} # (nó de partida, classe) -> segmento
+        self._segments = [] # segmento -> (nós, fim)
+        link_units = {}
+        node_units = {}
+        for start in self._sources:
+            for class_index, group in self._destinations.items():
+                unit = len(self._units)
+                nodes, end = walk_segment(self.simulator, start, group[0][2])
+                self._units.append((start, class_index))
+                self._unit_of[(start, class_index)] = unit
+                self._segments.append((nodes, end))
+                for node_name in set(nodes):
+                    node_units.setdefault(node_name, array('I')).append(unit)
+                for link in {_link_key(u, v) for u, v in zip(nodes, nodes[1:])}:
+                    link_units.setdefault(link, array('I')).append(unit)
+        self._link_units = link_units
+        self._node_units = node_units
+        # Primeiros saltos sem falha, para achar os roteadores cujas rotas mudam (só com recompute_routes)
+        self._baseline_first_hops = self._first_hops() if recompute_routes else None
+
+    def _class_boundaries(self, routers=None):
+        """Inícios das classes: fronteiras de todas as sub-redes conectadas e rotas."""
+        boundaries = {0}
+        simulator = self.simulator
+        for router in (simulator.graph.nodes if routers is None else routers):
+            forwarding_table = simulator.get_forwarding_table(router)
+            if forwarding_table is None:
+                continue
+            for start, length, _, _ in forwarding_table.items():
+                boundaries.add(start)
+                end = start | ((1 << (32 - length)) - 1)
+                if end < 0xFFFFFFFF:
+                    boundaries.add(end + 1)
+        return sorted(boundaries)
+
+    def _class_of(self, ip_int, boundaries=None):
+        return bisect_right(self.boundaries if boundaries is None else boundaries, ip_int) - 1
+
+    def baseline(self, source_ip, destination_ip):
+        """Situação (situação, saltos) de um par sem nenhuma falha."""
+        _, prefix, start = self._source_start[source_ip]
+        destination_node = self.simulator.ip_to_node_map[destination_ip]
+        nodes, end = self._segments[self._unit_of[(start, self._class_of(ip_to_int(destination_ip)))]]
+        return pair_outcome(prefix, nodes, end, destination_node)
+
+    def what_if(self, links=(), nodes=(), collect=True):
+        """
+        Simula a falha dos links (pares de nós) e nós informados e reavalia só
+        os pares afetados. O grafo e as tabelas são restaurados ao final.
+        Retorna um FailureReport.
+        """
+        simulator = self.simulator
+        graph = simulator.graph
+        failed_nodes = set(nodes)
+        failed_links = {_link_key(u, v) for u, v in links if graph.has_edge(u, v)}
+        for node_name in failed_nodes:
+            failed_links.update(_link_key(node_name, neighbor) for neighbor in graph.neighbors(node_name))
+
+        removed = [(u, v, dict(graph.edges[u, v])) for u, v in failed_links]
+        graph.remove_edges_from(failed_links)
+        saved_tables = {}
+        try:
+            affected = set()
+            for link in failed_links:
+                affected.update(self._link_units.get(link, ()))
+            for node_name in failed_nodes:
+                affected.update(self._node_units.get(node_name, ()))
+
+            boundaries = self.boundaries
+            recomputed = []
+            if self.recompute_routes and affected:
+                recomputed, boundaries = self._recompute(affected, failed_nodes, saved_tables)
+                for router in recomputed:
+                    affected.update(self._node_units.get(router, ()))
+
+            report = FailureReport(sorted(failed_links), sorted(failed_nodes), recomputed)
+            self._evaluate(report, affected, failed_links, failed_nodes, boundaries, collect)
+            return report
+        finally:
+            graph.add_edges_from(removed)
+            if saved_tables:
+                for router, table in saved_tables.items():
+                    if table is None:
+                        simulator.routing_tables.pop(router, None)
+                    else:
+                        simulator.routing_tables[router] = table
+                simulator.invalidate_forwarding_tables(list(saved_tables))
+
+    def _first_hops(self):
+        """Primeiro salto de cada roteador até cada outro no grafo atual: {roteador: {destino: ip}}."""
+        from rotas import build_router_adjacency, shortest_first_hops
+
+        adjacency = build_router_adjacency(self.simulator)
+        return {router: {target: hop for target, (_, hop) in shortest_first_hops(adjacency, router).items()}
+                for router in adjacency}
+
+    def _recompute(self, affected, failed_nodes, saved_tables):
+        """
+        Recalcula as tabelas dos roteadores presentes nos segmentos afetados
+        e as dos roteadores cujo primeiro salto até algum outro mudou com a
+        falha (os do desvio, que passam a receber o tráfego com tabelas antigas).
+        Retorna (roteadores recalculados, fronteiras de classe atualizadas).
+        """
+        from rotas import compute_routing_tables
+
+        simulator = self.simulator
+        node_types = simulator.graph.nodes
+        routers = set()
+        for unit in affected:
+            routers.update(n for n in self._segments[unit][0] if node_types[n].get('type') != 'host')
+        baseline = self._baseline_first_hops
+        routers.update(router for router, hops in self._first_hops().items() if hops != baseline.get(router))
+        routers -= failed_nodes
+        tables = compute_routing_tables(simulator, self.aggregate, self.default_route, routers=routers)
+        for router, table in tables.items():
+            saved_tables[router] = simulator.routing_tables.get(router)
+            simulator.routing_tables[router] = table
+        simulator.invalidate_forwarding_tables(list(tables))
+        # Rotas novas podem dividir classes: as fronteiras delas entram na partição
+        boundaries = sorted(set(self.boundaries) | set(self._class_boundaries(tables)))
+        return sorted(tables), boundaries
+
+    def _evaluate(self, report, affected, failed_links, failed_nodes, boundaries, collect):
+        """Compara antes e depois para cada par que depende do que falhou."""
+        ip_map = self.simulator.ip_to_node_map
+        gateway_of = self.simulator.host_gateways
+
+        # Origens cujo acesso ao gateway caiu: todos os destinos mudam
+        cut_sources = set()
+        for link in failed_links:
+            cut_sources.update(self._access.get(link, ()))
+        for source_ip in cut_sources:
+            source_node, prefix, _ = self._source_start[source_ip]
+            if source_node in failed_nodes:
+                continue
+            gateway_ip = gateway_of[source_node]
+            end = (LINK_FAILURE, gateway_ip, ip_map[gateway_ip])
+            for destination_ip, destination_node, _ in self._all_destinations:
+                if destination_node in failed_nodes:
+                    continue
+                before = self.baseline(source_ip, destination_ip)
+                after = pair_outcome(prefix, (), end, destination_node)
+                report._record(source_ip, destination_ip, before, after, False, collect)
+
+        # Pares com origem ou destino em um nó que falhou
+        if failed_nodes:
+            failed_destinations = [d for d in self._all_destinations if d[1] in failed_nodes]
+            for source_ip, (source_node, _, _) in self._source_start.items():
+                targets = self._all_destinations if source_node in failed_nodes else failed_destinations
+                for destination_ip, _, _ in targets:
+                    before = self.baseline(source_ip, destination_ip)
+                    report._record(source_ip, destination_ip, before, (NODE_FAILURE, -1), False, collect)
+
+        # Segmentos afetados: refaz o caminho e reavalia as origens e destinos que os usam
+        for unit in sorted(affected):
+            start, class_index = self._units[unit]
+            old_nodes, old_end = self._segments[unit]
+            subclasses = {}
+            for destination in self._destinations[class_index]:
+                if destination[1] not in failed_nodes:
+                    subclasses.setdefault(bisect_right(boundaries, destination[2]), []).append(destination)
+            for group in subclasses.values():
+                new_nodes, new_end = walk_segment(self.simulator, start, group[0][2])
+                changed = new_nodes != old_nodes
+                for source_ip, source_node, prefix in self._sources[start]:
+                    if source_node in failed_nodes or source_ip in cut_sources:
+                        continue
+                    for destination_ip, destination_node, _ in group:
+                        before = pair_outcome(prefix, old_nodes, old_end, destination_node)
+                        after = pair_outcome(prefix, new_nodes, new_end, destination_node)
+                        changed_path = changed and before[0] == OK and after[0] == OK and \
+                            (prefix + old_nodes)[:before[1] + 1] != (prefix + new_nodes)[:after[1] + 1]
+                        if before != after or changed_path:
+                            report._record(source_ip, destination_ip, before, after, changed_path, collect)
+
+    def sweep_single_link_failures(self, collect=False):
+        """Gera (link, FailureReport) para a falha isolada de cada link do grafo."""
+        for link in sorted(_link_key(u, v) for u, v in self.simulator.graph.edges):
+            yield link, self.what_if(links=[link], collect=collect)
+
+
+def main(argv=None):
+    from simulador_rede import NetworkSimulator
+
+    parser = argparse.ArgumentParser(description="Análise de falhas de links e nós (e se...?).")
+    parser.add_argument('topologia', nargs='?', help="arquivo de topologia (padrão: rede de exemplo)")
+    parser.add_argument('--link', nargs=2, action='append', default=[], metavar=('NO_A', 'NO_B'),
+                        help="link que falha (pode ser repetido)")
+    parser.add_argument('--no', action='append', default=[], help="nó que falha (pode ser repetido)")
+    parser.add_argument('--recalcular', action='store_true', help="recalcula as rotas dos roteadores afetados")
+    parser.add_argument('--varredura', action='store_true', help="avalia a falha isolada de cada link")
+    parser.add_argument('--mudancas', type=int, default=20, help="quantidade de pares alterados a listar")
+    args = parser.parse_args(argv)
+
+    simulator = NetworkSimulator()
+    simulator.load_network_configuration(args.topologia)
+    try:
+        analyzer = FailureAnalyzer(simulator, recompute_routes=args.recalcular)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.varredura:
+        print("link\tpares\tperdidos\trecuperados\tdesviados")
+        for (u, v), report in analyzer.sweep_single_link_failures():
+            print(f"{u}-{v}\t{report.pairs}\t{report.lost}\t{report.recovered}\t{report.rerouted}")
+        return 0
+
+    report = analyzer.what_if(links=args.link, nodes=args.no)
+    summary = report.summary()
+    print(f"Pares afetados: {summary['pairs']}  Perdidos: {summary['lost']}  "
+          f"Recuperados: {summary['recovered']}  Desviados: {summary['rerouted']}")
+    if report.recomputed_routers:
+        print(f"Roteadores com rotas recalculadas: {', '.join(report.recomputed_routers)}")
+    for i, (source_ip, destination_ip, before, after, hops) in enumerate(report.changes):
+        if i >= args.mudancas:
+            print("  ...")
+            break
+        print(f"  {source_ip} -> {destination_ip}: {before} -> {after}" + (f" ({hops} saltos)" if after == OK else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
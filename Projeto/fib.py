@@ -0,0 +1,276 @@
+import ipaddress
+import socket
+import zlib
+from functools import lru_cache
+
+# Tipos de decisão retornados por ForwardingTable.lookup
+CONNECTED = 'connected' # Destino em sub-rede diretamente conectada (entrega direta)
+ROUTE = 'route' # Destino resolvido por uma entrada da tabela de roteamento
+
+# Campos de cada nó da trie (listas são mais leves que objetos)
+_PREFIX, _LENGTH, _ZERO, _ONE, _CONNECTED, _ROUTE = 0, 1, 2, 3, 4, 5
+
+# Bits de flags nas tries achatadas (FlatForwardingTable)
+FLAG_CONNECTED, FLAG_ROUTE = 1, 2
+
+# Protocolo do fluxo padrão (xping/xtraceroute) no hash ECMP
+ICMP = 1
+
+# Colunas de uma trie achatada e seus typecodes do módulo array
+FLAT_COLUMNS = (('prefixes', 'I'), ('lengths', 'B'), ('zeros', 'i'), ('ones', 'i'), ('flags', 'B'), ('next_hops', 'q'))
+
+
+@lru_cache(maxsize=65536)
+def ip_to_int(ip_str):
+    """Converte um IPv4 em texto para inteiro (None se não for IPv4)."""
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, ip_str), 'big')
+    except OSError:
+        ipaddress.ip_address(ip_str) # Levanta ValueError se o texto não for um IP válido
+        return None
+
+
+@lru_cache(maxsize=65536)
+def parse_network(network_str):
+    """Converte uma rede em texto (ex.: '10.0.0.0/24') para ipaddress.IPv4Network, com cache."""
+    return ipaddress.ip_network(network_str)
+
+
+def next_hop_group(next_hop):
+    """Próximos saltos de uma rota como tupla: uma lista/tupla é um grupo ECMP, outro valor é um salto só."""
+    if isinstance(next_hop, (list, tuple)):
+        return tuple(next_hop) or (None,)
+    return (next_hop,)
+
+
+def flow_key(source_ip, destination_ip, protocol=ICMP, source_port=0, destination_port=0):
+    """Bytes do 5-tupla de um fluxo, usados no hash ECMP."""
+    return f"{source_ip}|{destination_ip}|{protocol}|{source_port}|{destination_port}".encode()
+
+
+def select_next_hop(group, key, router):
+    """
+    Salto do grupo ECMP para o fluxo (key = flow_key). O nome do roteador entra
+    no hash, senão roteadores em sequência escolheriam sempre o mesmo índice
+    (polarização) e parte dos caminhos nunca seria usada.
+    """
+    # CRC32 é linear; a mistura final (fmix32 do MurmurHash3) desfaz a correlação entre roteadores
+    h = zlib.crc32(key) ^ zlib.crc32(router.encode())
+    h = ((h ^ (h >> 16)) * 0x85EBCA6B) & 0xFFFFFFFF
+    h = ((h ^ (h >> 13)) * 0xC2B2AE35) & 0xFFFFFFFF
+    return group[(h ^ (h >> 16)) % len(group)]
+
+
+def _new_node(prefix, length):
+    return [prefix, length, None, None, None, None]
+
+
+class ForwardingTable:
+    """
+    Tabela de encaminhamento compilada de um roteador (FIB).
+    Trie binária com compressão de caminho sobre os bits do endereço IPv4:
+    cada nó guarda o prefixo completo que representa, então a busca visita
+    no máximo um nó por bit do prefixo (na prática, muito menos).
+    """
+
+    def __init__(self):
+        self._root = _new_node(0, 0)
+
+    def _node_for(self, network):
+        """Retorna (criando se preciso) o nó que representa exatamente a rede."""
+        value = int(network.network_address)
+        length = network.prefixlen
+        node = self._root
+        while node[_LENGTH] != length:
+            branch = _ZERO + ((value >> (31 - node[_LENGTH])) & 1)
+            child = node[branch]
+            if child is None:
+                child = node[branch] = _new_node(value, length)
+                return child
+
+            # Tamanho do prefixo em comum entre o filho e a nova rede
+            common = 32 - (child[_PREFIX] ^ value).bit_length()
+            if common > length:
+                common = length
+            if common >= child[_LENGTH]:
+                node = child
+                continue
+
+            # Divide a aresta comprimida: um nó intermediário passa a ser o pai do filho
+            middle = _new_node(value & ~((1 << (32 - common)) - 1) & 0xFFFFFFFF, common)
+            middle[_ZERO + ((child[_PREFIX] >> (31 - common)) & 1)] = child
+            node[branch] = middle
+            if common == length:
+                return middle
+            leaf = middle[_ZERO + ((value >> (31 - common)) & 1)] = _new_node(value, length)
+            return leaf
+        return node
+
+    def add_connected(self, network):
+        """Registra uma sub-rede diretamente conectada."""
+        self._node_for(network)[_CONNECTED] = True
+
+    def add_route(self, network, next_hop):
+        """
+        Registra uma rota (next_hop pode ser uma lista de saltos ECMP);
+        em prefixos repetidos vale a primeira entrada (como na tabela original).
+        """
+        node = self._node_for(network)
+        if node[_ROUTE] is None:
+            node[_ROUTE] = next_hop_group(next_hop)
+
+    def lookup(self, ip_int, multipath=False):
+        """
+        Busca pelo maior prefixo (longest prefix match).
+        Sub-redes conectadas têm prioridade sobre qualquer rota, como no
+        _get_next_hop original. Retorna (tipo, próximo_salto, tamanho_do_prefixo)
+        ou None se não houver correspondência. Em grupos ECMP, próximo_salto é o
+        primeiro do grupo; com multipath=True, é sempre a tupla do grupo inteiro.
+        """
+        node = self._root
+        connected_len = -1
+        route = None
+        route_len = -1
+        while node is not None:
+            length = node[_LENGTH]
+            if (ip_int ^ node[_PREFIX]) >> (32 - length):
+                break # O endereço diverge do prefixo comprimido deste nó
+            if node[_CONNECTED] is not None:
+                connected_len = length
+            if node[_ROUTE] is not None:
+                route = node[_ROUTE]
+                route_len = length
+            if length == 32:
+                break
+            node = node[_ZERO + ((ip_int >> (31 - length)) & 1)]
+
+        if connected_len >= 0:
+            return (CONNECTED, None, connected_len)
+        if route is None:
+            return None
+        if not route[0]:
+            # Mesmo comportamento da busca linear: sem próximo salto válido, usa a rota padrão
+            route = self._root[_ROUTE]
+            if route is None:
+                return (ROUTE, (None,) if multipath else None, route_len)
+            route_len = 0
+        return (ROUTE, route if multipath else route[0], route_len)
+
+    def items(self, multipath=False):
+        """
+        Percorre as entradas da tabela em ordem de endereço, gerando
+        (início, tamanho_do_prefixo, tipo, próximo_salto). Sub-redes conectadas
+        aparecem com tipo CONNECTED e próximo salto None; grupos ECMP, com o
+        primeiro salto ou, com multipath=True, com a tupla do grupo (como em lookup).
+        """
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node[_ROUTE] is not None:
+                yield (node[_PREFIX], node[_LENGTH], ROUTE, node[_ROUTE] if multipath else node[_ROUTE][0])
+            if node[_CONNECTED] is not None:
+                yield (node[_PREFIX], node[_LENGTH], CONNECTED, None)
+            if node[_ONE] is not None:
+                stack.append(node[_ONE])
+            if node[_ZERO] is not None:
+                stack.append(node[_ZERO])
+
+    def flatten(self, columns, encode):
+        """
+        Acrescenta os nós da trie às colunas (arrays na ordem de FLAT_COLUMNS),
+        com os filhos como índices (-1 = ausente) e o próximo salto de cada rota
+        codificado por encode (grupos ECMP como tupla). Retorna o índice da raiz, para FlatForwardingTable.
+        """
+        prefixes, lengths, zeros, ones, flags, next_hops = columns
+        base = len(prefixes)
+        order = [self._root]
+        for node in order: # Largura: os filhos entram no fim da lista enquanto ela é percorrida
+            order.extend(child for child in (node[_ZERO], node[_ONE]) if child is not None)
+        index = {id(node): base + i for i, node in enumerate(order)}
+        for node in order:
+            prefixes.append(node[_PREFIX])
+            lengths.append(node[_LENGTH])
+            zeros.append(-1 if node[_ZERO] is None else index[id(node[_ZERO])])
+            ones.append(-1 if node[_ONE] is None else index[id(node[_ONE])])
+            flags.append((FLAG_CONNECTED if node[_CONNECTED] is not None else 0)
+                         | (FLAG_ROUTE if node[_ROUTE] is not None else 0))
+            route = node[_ROUTE]
+            next_hops.append(0 if route is None else encode(route[0] if len(route) == 1 else route))
+        return base
+
+
+class FlatForwardingTable:
+    """
+    FIB de um roteador sobre colunas compartilhadas (ver ForwardingTable.flatten),
+    que podem estar em memória mapeada (snapshot.py). Mesmas respostas de ForwardingTable.
+    """
+
+    __slots__ = ('_columns', '_root', '_decode')
+
+    def __init__(self, columns, root, decode):
+        self._columns = columns
+        self._root = root
+        self._decode = decode # Código do próximo salto -> valor original
+
+    def _group(self, node):
+        return next_hop_group(self._decode(self._columns[5][node]))
+
+    def lookup(self, ip_int, multipath=False):
+        """Busca pelo maior prefixo, como ForwardingTable.lookup."""
+        prefixes, lengths, zeros, ones, flags, next_hops = self._columns
+        node = self._root
+        connected_len = -1
+        route = -1
+        route_len = -1
+        while node >= 0:
+            length = lengths[node]
+            if (ip_int ^ prefixes[node]) >> (32 - length):
+                break
+            node_flags = flags[node]
+            if node_flags & FLAG_CONNECTED:
+                connected_len = length
+            if node_flags & FLAG_ROUTE:
+                route = node
+                route_len = length
+            if length == 32:
+                break
+            node = ones[node] if (ip_int >> (31 - length)) & 1 else zeros[node]
+
+        if connected_len >= 0:
+            return (CONNECTED, None, connected_len)
+        if route < 0:
+            return None
+        group = self._group(route)
+        if not group[0]:
+            if not flags[self._root] & FLAG_ROUTE:
+                return (ROUTE, (None,) if multipath else None, route_len)
+            group = self._group(self._root)
+            route_len = 0
+        return (ROUTE, group if multipath else group[0], route_len)
+
+    def items(self, multipath=False):
+        """Entradas em ordem de endereço, como ForwardingTable.items."""
+        prefixes, lengths, zeros, ones, flags, next_hops = self._columns
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if flags[node] & FLAG_ROUTE:
+                group = self._group(node)
+                yield (prefixes[node], lengths[node], ROUTE, group if multipath else group[0])
+            if flags[node] & FLAG_CONNECTED:
+                yield (prefixes[node], lengths[node], CONNECTED, None)
+            if ones[node] >= 0:
+                stack.append(ones[node])
+            if zeros[node] >= 0:
+                stack.append(zeros[node])
+
+
+def build_forwarding_table(interfaces_and_subnets, routing_table):
+    """Compila as sub-redes conectadas e a tabela de roteamento de um roteador em uma FIB."""
+    table = ForwardingTable()
+    for connected_subnet in (interfaces_and_subnets or {}).values():
+        if connected_subnet.version == 4:
+            table.add_connected(connected_subnet)
+    for entry in routing_table or []:
+        table.add_route(parse_network(entry['destination_network']), entry['next_hop'])
+    return table
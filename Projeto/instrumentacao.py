@@ -0,0 +1,273 @@
+"""
+Instrumentação opcional do simulador.
+
+Metrics.attach(simulator) passa a contar, para o simulador:
+  - buscas na FIB por roteador, separando acertos em sub-redes conectadas,
+    acertos em rotas e buscas sem correspondência;
+  - o tamanho do prefixo casado em cada busca;
+  - a latência de cada salto (decisão na FIB) e de cada consulta (resolve_path).
+
+Desativada, a instrumentação não custa nada: attach envolve as FIBs do
+simulador e a sua resolve_path (atributo da instância), e detach as devolve.
+Os resultados saem em JSON (to_dict) ou no formato texto do Prometheus
+(to_prometheus). Consultas resolvidas em outros processos (varredura, pool
+do servidor) não entram nas contagens.
+
+profiled executa um bloco sob cProfile e/ou tracemalloc; na linha de comando,
+qualquer módulo do projeto pode ser executado assim:
+    python instrumentacao.py --cprofile saida.prof --tracemalloc 10 simulador_rede topo.jsonl --lote cmds.txt
+"""
+
+import argparse
+import cProfile
+import importlib
+import json
+import pstats
+import sys
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter_ns
+
+from fib import CONNECTED
+
+# Posições dos contadores de cada roteador
+_CONNECTED_HITS, _ROUTE_HITS, _MISSES = 0, 1, 2
+LOOKUP_RESULTS = ('connected', 'route', 'miss')
+
+# Baldes exportados para o Prometheus: 2**7 ns (128 ns) a 2**34 ns (~17 s)
+_EXPORTED_BUCKETS = range(7, 35)
+
+METRIC_PREFIX = 'simulador_rede'
+
+
+class Histogram:
+    """Histograma de durações em nanossegundos; o balde b conta valores menores que 2**b ns."""
+
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * 65
+        self.count = 0
+        self.total = 0
+
+    def observe(self, nanoseconds):
+        self.counts[nanoseconds.bit_length()] += 1
+        self.count += 1
+        self.total += nanoseconds
+
+    def quantile(self, q):
+        """Limite superior (em segundos) do balde que contém o quantil q, ou None se vazio."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return (1 << bucket) / 1e9
+        return (1 << (len(self.counts) - 1)) / 1e9
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum_seconds': self.total / 1e9,
+            'mean_seconds': self.total / self.count / 1e9 if self.count else None,
+            'p50_seconds': self.quantile(0.5),
+            'p99_seconds': self.quantile(0.99),
+            'buckets': {f'{(1 << bucket) / 1e9:.3g}': count for bucket, count in enumerate(self.counts) if count},
+        }
+
+    def prometheus(self, name):
+        """Linhas do histograma no formato do Prometheus (baldes cumulativos)."""
+        cumulative = sum(self.counts[:_EXPORTED_BUCKETS.start])
+        lines = []
+        for bucket in _EXPORTED_BUCKETS:
+            cumulative += self.counts[bucket]
+            lines.append(f'{name}_bucket{{le="{(1 << bucket) / 1e9:.6g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum {self.total / 1e9:.9g}')
+        lines.append(f'{name}_count {self.count}')
+        return lines
+
+
+class _CountingTable:
+    """FIB envolvida: mesma interface (lookup/items), contando cada busca."""
+
+    __slots__ = ('table', '_counts', '_metrics')
+
+    def __init__(self, table, counts, metrics):
+        self.table = table
+        self._counts = counts
+        self._metrics = metrics
+
+    def lookup(self, ip_int, multipath=False):
+        start = perf_counter_ns()
+        match = self.table.lookup(ip_int, multipath)
+        metrics = self._metrics
+        metrics.hop_latency.observe(perf_counter_ns() - start)
+        if match is None:
+            self._counts[_MISSES] += 1
+        else:
+            self._counts[_CONNECTED_HITS if match[0] == CONNECTED else _ROUTE_HITS] += 1
+            metrics.prefix_lengths[match[2]] += 1
+        return match
+
+    def items(self, multipath=False):
+        return self.table.items(multipath)
+
+
+class _TimedResolve:
+    """resolve_path do simulador, medindo a duração e contando a situação de cada consulta."""
+
+    __slots__ = ('resolve', '_metrics')
+
+    def __init__(self, resolve, metrics):
+        self.resolve = resolve
+        self._metrics = metrics
+
+    def __call__(self, *args, **kwargs):
+        start = perf_counter_ns()
+        result = self.resolve(*args, **kwargs)
+        self._metrics.query_latency.observe(perf_counter_ns() - start)
+        self._metrics.queries[result.status] += 1
+        return result
+
+
+class Metrics:
+    """Contadores e histogramas de um ou mais simuladores (ver attach)."""
+
+    def __init__(self):
+        self.routers = {} # roteador -> [acertos em conectadas, acertos em rotas, sem correspondência]
+        self.prefix_lengths = [0] * 33
+        self.hop_latency = Histogram()
+        self.query_latency = Histogram()
+        self.queries = Counter() # situação -> consultas
+
+    def wrap(self, router, table):
+        """FIB que conta as buscas do roteador (usada por NetworkSimulator.get_forwarding_table)."""
+        if isinstance(table, _CountingTable):
+            table = table.table
+        counts = self.routers.get(router)
+        if counts is None:
+            counts = self.routers[router] = [0, 0, 0]
+        return _CountingTable(table, counts, self)
+
+    def attach(self, simulator):
+        """Passa a instrumentar o simulador (as FIBs compiladas depois também são envolvidas)."""
+        simulator.metrics = self
+        tables = simulator.forwarding_tables
+        for router, table in list(tables.items()):
+            tables[router] = self.wrap(router, table)
+        simulator.resolve_path = _TimedResolve(type(simulator).resolve_path.__get__(simulator), self)
+        return self
+
+    @staticmethod
+    def detach(simulator):
+        """Remove a instrumentação do simulador; as contagens continuam disponíveis."""
+        simulator.metrics = None
+        tables = simulator.forwarding_tables
+        for router, table in list(tables.items()):
+            if isinstance(table, _CountingTable):
+                tables[router] = table.table
+        simulator.__dict__.pop('resolve_path', None)
+
+    def to_dict(self):
+        totals = [sum(counts[i] for counts in self.routers.values()) for i in range(len(LOOKUP_RESULTS))]
+        return {
+            'lookups': dict(zip(LOOKUP_RESULTS, totals)),
+            'routers': {router: dict(zip(LOOKUP_RESULTS, counts)) for router, counts in sorted(self.routers.items())},
+            'prefix_lengths': {length: count for length, count in enumerate(self.prefix_lengths) if count},
+            'hop_latency': self.hop_latency.to_dict(),
+            'queries': dict(self.queries),
+            'query_latency': self.query_latency.to_dict(),
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Métricas no formato texto de exposição do Prometheus."""
+        name = METRIC_PREFIX
+        lines = [f'# HELP {name}_lookups_total Buscas na FIB por roteador e resultado.',
+                 f'# TYPE {name}_lookups_total counter']
+        for router, counts in sorted(self.routers.items()):
+            for result, count in zip(LOOKUP_RESULTS, counts):
+                lines.append(f'{name}_lookups_total{{router="{_label(router)}",result="{result}"}} {count}')
+        lines += [f'# HELP {name}_prefix_length_matches_total Buscas por tamanho do prefixo casado.',
+                  f'# TYPE {name}_prefix_length_matches_total counter']
+        for length, count in enumerate(self.prefix_lengths):
+            if count:
+                lines.append(f'{name}_prefix_length_matches_total{{length="{length}"}} {count}')
+        lines += [f'# HELP {name}_queries_total Consultas (xping/xtraceroute) por situação.',
+                  f'# TYPE {name}_queries_total counter']
+        for status, count in sorted(self.queries.items()):
+            lines.append(f'{name}_queries_total{{status="{_label(status)}"}} {count}')
+        lines += [f'# HELP {name}_hop_duration_seconds Duração de cada decisão de encaminhamento na FIB.',
+                  f'# TYPE {name}_hop_duration_seconds histogram']
+        lines += self.hop_latency.prometheus(f'{name}_hop_duration_seconds')
+        lines += [f'# HELP {name}_query_duration_seconds Duração de cada consulta (resolve_path).',
+                  f'# TYPE {name}_query_duration_seconds histogram']
+        lines += self.query_latency.prometheus(f'{name}_query_duration_seconds')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Grava as métricas: formato Prometheus para .prom/.txt, JSON nos demais casos."""
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json() + '\n'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+@contextmanager
+def profiled(cprofile=None, tracemalloc_top=0, output=sys.stderr):
+    """
+    Executa o bloco sob cProfile (estatísticas gravadas no arquivo cprofile, ou
+    as 25 funções mais caras em output se cprofile for '-') e/ou tracemalloc
+    (pico de memória e os tracemalloc_top maiores pontos de alocação em output).
+    """
+    profiler = cProfile.Profile() if cprofile else None
+    if tracemalloc_top:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            if cprofile == '-':
+                pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(25)
+            else:
+                profiler.dump_stats(cprofile)
+        if tracemalloc_top:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"Pico de memória (tracemalloc): {peak / 2**20:.1f} MiB", file=output)
+            for statistic in snapshot.statistics('lineno')[:tracemalloc_top]:
+                print(f"  {statistic}", file=output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Executa um módulo do projeto sob cProfile e/ou tracemalloc.")
+    parser.add_argument('--cprofile', metavar='ARQUIVO',
+                        help="grava as estatísticas do cProfile ('-' imprime as funções mais caras)")
+    parser.add_argument('--tracemalloc', type=int, default=0, metavar='N',
+                        help="mostra o pico de memória e os N maiores pontos de alocação")
+    parser.add_argument('modulo', help="módulo com main(argv), ex.: simulador_rede, varredura, verificacao")
+    parser.add_argument('argumentos', nargs=argparse.REMAINDER, help="argumentos repassados ao módulo")
+    args = parser.parse_args(argv)
+    if not args.cprofile and not args.tracemalloc:
+        parser.error("informe --cprofile e/ou --tracemalloc")
+
+    module = importlib.import_module(args.modulo)
+    with profiled(args.cprofile, args.tracemalloc):
+        return module.main(args.argumentos)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Resultados estruturados de xping/xtraceroute."""
+
+from dataclasses import dataclass, field
+
+TTL = 30 # Time To Live (TTL) - limite de saltos para evitar loops infinitos
+
+# Situações possíveis de uma consulta
+OK = 'ok'
+NO_ROUTE = 'no_route'
+UNKNOWN_NEXT_HOP = 'unknown_next_hop'
+LINK_FAILURE = 'link_failure'
+TTL_EXPIRED = 'ttl_expired'
+UNKNOWN_SOURCE = 'unknown_source'
+UNKNOWN_DESTINATION = 'unknown_destination'
+
+
+@dataclass(slots=True)
+class PathResult:
+    """
+    Resultado de um xping/xtraceroute.
+    hops é a sequência de nós efetivamente percorridos (origem incluída);
+    em caso de falha, reason descreve o motivo e next_hop/next_node indicam
+    o salto que não pôde ser dado.
+    """
+    command: str
+    source: str
+    destination: str
+    status: str
+    hops: list = field(default_factory=list)
+    reason: str = None
+    ttl_used: int = 0
+    next_hop: str = None
+    next_node: str = None
+
+    @property
+    def reached(self):
+        return self.status == OK
+
+    def traceroute_hops(self):
+        """Saltos no formato impresso pelo xtraceroute (com a descrição da falha no fim)."""
+        if self.status == OK:
+            return list(self.hops)
+        if self.status == TTL_EXPIRED:
+            return self.hops[:-1] # O último nó alcançado não chegou a responder
+        if self.status in (UNKNOWN_SOURCE, UNKNOWN_DESTINATION):
+            return []
+        return self.hops + [self.reason]
+
+    def to_dict(self):
+        """Dicionário compacto para serialização (campos vazios são omitidos)."""
+        result = {
+            'command': self.command,
+            'source': self.source,
+            'destination': self.destination,
+            'status': self.status,
+            'hops': self.hops,
+            'ttl_used': self.ttl_used,
+        }
+        if self.reason is not None:
+            result['reason'] = self.reason
+        if self.next_hop is not None:
+            result['next_hop'] = self.next_hop
+        if self.next_node is not None:
+            result['next_node'] = self.next_node
+        return result
@@ -0,0 +1,316 @@
+"""
+Síntese automática das tabelas de roteamento a partir do grafo.
+
+Cada roteador roda um Dijkstra sobre o subgrafo de roteadores (hosts não
+fazem trânsito), ponderado pelo atributo 'cost' das arestas ou, na falta
+dele, pela 'capacity' (custo = banda de referência / capacidade, como no
+OSPF). O primeiro salto do caminho mínimo até o dono de cada sub-rede vira
+a entrada da tabela; em seguida as sub-redes com o mesmo próximo salto são
+agregadas em super-redes quando isso não muda o resultado do
+longest-prefix match.
+"""
+
+import bisect
+import heapq
+import ipaddress
+import re
+import sys
+from functools import lru_cache
+
+from fib import CONNECTED, build_forwarding_table, ip_to_int
+
+REFERENCE_BANDWIDTH = 100e9 # 100 Gbps: 10Gbps -> custo 10, 1Gbps -> custo 100
+
+_CAPACITY_UNITS = {'': 1, 'k': 1e3, 'm': 1e6, 'g': 1e9, 't': 1e12}
+_CAPACITY_PATTERN = re.compile(r'^\s*([0-9]*\.?[0-9]+)\s*([kmgt]?)(?:bps|b/s)?\s*$', re.IGNORECASE)
+
+DEFAULT_ROUTE = ipaddress.ip_network('0.0.0.0/0')
+
+
+def parse_capacity(capacity):
+    """Converte capacidades como '10Gbps', '100Mbps' ou 1e9 para bits por segundo."""
+    if isinstance(capacity, (int, float)):
+        return float(capacity)
+    match = _CAPACITY_PATTERN.match(str(capacity))
+    if not match:
+        raise ValueError(f"Capacidade inválida: '{capacity}'")
+    return float(match.group(1)) * _CAPACITY_UNITS[match.group(2).lower()]
+
+
+def link_cost(attributes, reference_bandwidth=REFERENCE_BANDWIDTH):
+    """Custo de uma aresta: 'cost' (ou 'weight') explícito, senão derivado da capacidade, senão 1."""
+    for key in ('cost', 'weight'):
+        if key in attributes:
+            return float(attributes[key])
+    if 'capacity' in attributes:
+        return max(reference_bandwidth / parse_capacity(attributes['capacity']), 1.0)
+    return 1.0
+
+
+def _routers(simulator):
+    return [node for node, data in simulator.graph.nodes(data=True) if data.get('type', 'router') == 'router']
+
+
+def build_router_adjacency(simulator, reference_bandwidth=REFERENCE_BANDWIDTH):
+    """
+    Adjacência entre roteadores: {roteador: [(vizinho, custo, ip_do_vizinho_no_link)]}.
+    Links sem sub-rede compartilhada entre as duas pontas são ignorados,
+    pois não há IP de próximo salto para usar na tabela.
+    """
+    routers = set(_routers(simulator))
+    members = {} # sub-rede -> [(roteador, ip)]
+    for node_name in routers:
+        for interface_ip, subnet in simulator.node_interfaces_and_subnets.get(node_name, {}).items():
+            members.setdefault(subnet, []).append((node_name, str(interface_ip)))
+
+    facing_ip = {} # (u, v) -> IP de v na sub-rede compartilhada com u
+    for subnet_members in members.values():
+        if len(subnet_members) < 2:
+            continue
+        for u, _ in subnet_members:
+            for v, v_ip in subnet_members:
+                if u != v:
+                    facing_ip.setdefault((u, v), v_ip)
+
+    adjacency = {node_name: [] for node_name in routers}
+    for u, v, attributes in simulator.graph.edges(data=True):
+        if u not in routers or v not in routers:
+            continue
+        cost = link_cost(attributes, reference_bandwidth)
+        if (u, v) in facing_ip:
+            adjacency[u].append((v, cost, facing_ip[(u, v)]))
+            adjacency[v].append((u, cost, facing_ip[(v, u)]))
+    for neighbors in adjacency.values():
+        neighbors.sort()
+    return adjacency
+
+
+def shortest_first_hops(adjacency, source):
+    """
+    Dijkstra a partir de source. Retorna {destino: (distância, ip_do_primeiro_salto)}
+    para todos os roteadores alcançáveis (a própria origem fica de fora).
+    """
+    distances = {source: 0.0}
+    first_hops = {}
+    heap = [(0.0, source, None)]
+    visited = set()
+    while heap:
+        distance, node, first_hop = heapq.heappop(heap)
+        if node in visited:
+            continue
+        visited.add(node)
+        if node != source:
+            first_hops[node] = (distance, first_hop)
+        for neighbor, cost, neighbor_ip in adjacency[node]:
+            candidate = distance + cost
+            if neighbor not in visited and candidate < distances.get(neighbor, float('inf')):
+                distances[neighbor] = candidate
+                heapq.heappush(heap, (candidate, neighbor, first_hop if node != source else neighbor_ip))
+    return first_hops
+
+
+def _mask(length):
+    return ~((1 << (32 - length)) - 1) & 0xFFFFFFFF
+
+
+def _last_address(start, length):
+    return start | ((1 << (32 - length)) - 1)
+
+
+def _nearest_cover(prefixes, lengths, start, length):
+    """
+    Prefixo do dicionário que contém estritamente (start, length) com o maior
+    tamanho, ou None. lengths são os tamanhos presentes no dicionário, em ordem decrescente.
+    """
+    for shorter in lengths:
+        if shorter < length:
+            candidate = (start & _mask(shorter), shorter)
+            if candidate in prefixes:
+                return candidate
+    return None
+
+
+def _lengths(prefixes):
+    return sorted({length for _, length in prefixes}, reverse=True)
+
+
+def aggregate_routes(routes, default_route=False):
+    """
+    Agrega {(início, tamanho): próximo_salto} mantendo as respostas do
+    longest-prefix match para todos os endereços:
+      - prefixos irmãos com o mesmo próximo salto viram o prefixo pai, desde que
+        nenhum prefixo de outro próximo salto esteja dentro dele;
+      - prefixos cujo prefixo envolvente mais próximo já tem o mesmo próximo salto
+        são removidos.
+    Com default_route=True, o próximo salto mais frequente vira 0.0.0.0/0.
+    Retorna uma lista [((início, tamanho), próximo_salto)] ordenada por endereço.
+    """
+    ordered = sorted(routes.items())
+    starts = [start for (start, _), _ in ordered]
+    groups = {}
+    for prefix, next_hop in ordered:
+        groups.setdefault(next_hop, []).append(prefix)
+
+    # run_end[i]: fim da sequência de prefixos consecutivos com o mesmo próximo salto de i
+    run_end = [0] * len(ordered)
+    for i in range(len(ordered) - 1, -1, -1):
+        if i + 1 < len(ordered) and ordered[i + 1][1] == ordered[i][1]:
+            run_end[i] = run_end[i + 1]
+        else:
+            run_end[i] = i + 1
+
+    def only_same_hop_inside(start, length, next_hop):
+        lo = bisect.bisect_left(starts, start)
+        hi = bisect.bisect_right(starts, _last_address(start, length))
+        return lo == hi or (ordered[lo][1] == next_hop and run_end[lo] >= hi)
+
+    merged_routes = {}
+    for next_hop, prefixes in groups.items():
+        stack = []
+        for prefix in prefixes:
+            stack.append(prefix)
+            # Une irmãos (ex.: 10.0.0.0/25 + 10.0.0.128/25 -> 10.0.0.0/24) enquanto possível
+            while len(stack) >= 2:
+                (a_start, a_length), (b_start, b_length) = stack[-2], stack[-1]
+                if a_length != b_length or a_length == 0:
+                    break
+                parent = (a_start, a_length - 1)
+                if a_start & _mask(a_length - 1) != a_start or b_start != a_start | (1 << (32 - a_length)):
+                    break
+                if not only_same_hop_inside(*parent, next_hop):
+                    break
+                stack[-2:] = [parent]
+        for prefix in stack:
+            merged_routes.setdefault(prefix, next_hop)
+
+    # Remove prefixos redundantes (o envolvente mais próximo já leva ao mesmo próximo salto)
+    lengths = _lengths(merged_routes)
+    table = {prefix: next_hop for prefix, next_hop in merged_routes.items()
+             if merged_routes.get(_nearest_cover(merged_routes, lengths, *prefix)) != next_hop}
+
+    default_hop = None
+    if default_route and table:
+        counts = {}
+        for next_hop in table.values():
+            counts[next_hop] = counts.get(next_hop, 0) + 1
+        default_hop = max(counts, key=lambda hop: (counts[hop], hop))
+        # Sem envolvente, o prefixo passa a ser atendido pela rota padrão
+        lengths = _lengths(table)
+        table = {prefix: next_hop for prefix, next_hop in table.items()
+                 if next_hop != default_hop or _nearest_cover(table, lengths, *prefix) is not None}
+
+    entries = sorted(table.items())
+    if default_hop is not None:
+        entries.append(((0, 0), default_hop))
+    return entries
+
+
+@lru_cache(maxsize=65536)
+def _prefix_str(prefix):
+    return f"{ipaddress.IPv4Address(prefix[0])}/{prefix[1]}"
+
+
+def compute_routing_tables(simulator, aggregate=True, default_route=False, reference_bandwidth=REFERENCE_BANDWIDTH,
+                           routers=None):
+    """
+    Calcula a tabela de roteamento de todos os roteadores (ou só dos
+    informados em routers) a partir de simulator.graph e
+    simulator.node_interfaces_and_subnets.
+    Executa um Dijkstra por roteador: O(V·E log V) no total, com memória
+    O(V + tamanho de uma tabela) além do resultado.
+    Retorna {roteador: [{'destination_network': ..., 'next_hop': ...}]}.
+    """
+    adjacency = build_router_adjacency(simulator, reference_bandwidth)
+    owned = {} # roteador -> prefixos (início, tamanho) conectados
+    owners = {} # prefixo -> quantidade de roteadores conectados a ele
+    for node_name in adjacency:
+        subnets = simulator.node_interfaces_and_subnets.get(node_name, {}).values()
+        prefixes = {(int(subnet.network_address), subnet.prefixlen) for subnet in subnets if subnet.version == 4}
+        owned[node_name] = list(prefixes)
+        for prefix in prefixes:
+            owners[prefix] = owners.get(prefix, 0) + 1
+
+    tables = {}
+    for router in adjacency:
+        if routers is not None and router not in routers:
+            continue
+        connected = set(owned[router])
+        routes = {} # prefixo -> próximo_salto
+        distances = {} # só para prefixos com mais de um dono (ex.: links ponto a ponto)
+        for owner, (distance, next_hop) in shortest_first_hops(adjacency, router).items():
+            for prefix in owned[owner]:
+                if prefix in connected:
+                    continue
+                if owners[prefix] > 1:
+                    # Vários roteadores conectados à mesma sub-rede: vale o mais próximo
+                    if prefix in distances and distances[prefix] <= distance:
+                        continue
+                    distances[prefix] = distance
+                routes[prefix] = next_hop
+        if aggregate:
+            entries = aggregate_routes(routes, default_route)
+        else:
+            entries = sorted(routes.items())
+        tables[router] = [{'destination_network': _prefix_str(prefix), 'next_hop': next_hop} for prefix, next_hop in entries]
+    return tables
+
+
+def compare_routing_tables(simulator, tables, addresses=None):
+    """
+    Compara as tabelas do simulador com outras tabelas (ex.: as calculadas),
+    consultando em cada roteador todos os IPs conhecidos (ou os informados).
+    Retorna [(roteador, ip, próximo_salto_atual, próximo_salto_novo)] para cada divergência.
+    """
+    if addresses is None:
+        addresses = list(simulator.ip_to_node_map)
+    differences = []
+    for router in sorted(set(tables) | set(simulator.routing_tables)):
+        interfaces = simulator.node_interfaces_and_subnets.get(router)
+        current = build_forwarding_table(interfaces, simulator.routing_tables.get(router))
+        computed = build_forwarding_table(interfaces, tables.get(router))
+        for ip in addresses:
+            ip_int = ip_to_int(ip)
+            if ip_int is None:
+                continue
+            before = _next_hop_of(current.lookup(ip_int), ip)
+            after = _next_hop_of(computed.lookup(ip_int), ip)
+            if before != after:
+                differences.append((router, ip, before, after))
+    return differences
+
+
+def _next_hop_of(match, ip):
+    if match is None:
+        return None
+    if match[0] == CONNECTED:
+        return ip
+    return match[1]
+
+
+def main(argv=None):
+    import argparse
+    from simulador_rede import NetworkSimulator
+
+    parser = argparse.ArgumentParser(description="Calcula as tabelas de roteamento a partir do grafo e compara com as atuais.")
+    parser.add_argument('topologia', nargs='?', help="arquivo de topologia (padrão: rede de exemplo)")
+    parser.add_argument('--sem-agregacao', action='store_true', help="não agrega sub-redes em super-redes")
+    parser.add_argument('--rota-padrao', action='store_true', help="usa 0.0.0.0/0 para o próximo salto mais frequente")
+    args = parser.parse_args(argv)
+
+    simulator = NetworkSimulator()
+    simulator.load_network_configuration(args.topologia)
+    tables = compute_routing_tables(simulator, aggregate=not args.sem_agregacao, default_route=args.rota_padrao)
+    for router in sorted(tables):
+        print(f"{router}:")
+        for entry in tables[router]:
+            print(f"  {entry['destination_network']:<20} via {entry['next_hop']}")
+
+    differences = compare_routing_tables(simulator, tables)
+    print(f"\n{len(differences)} divergências em relação às tabelas atuais")
+    for router, ip, before, after in differences:
+        print(f"  {router}: {ip} atual={before} calculado={after}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+"""
+Servidor de consultas (asyncio) para muitos clientes simultâneos.
+
+A rede é carregada uma única vez e as consultas chegam por TCP ou socket
+Unix, uma requisição JSON por linha; cada resposta também ocupa uma linha:
+    {"id": 1, "command": "xping", "source": "10.0.0.1", "destination": "10.0.0.9"}
+    {"id": 1, "ok": true, "result": {...PathResult.to_dict()...}}
+    {"id": 2, "ok": false, "error": "..."}
+
+Comandos:
+  xping, xtraceroute -> source, destination, flow opcional [protocolo, porta_origem, porta_destino]
+                        (respondidos no próprio laço de eventos)
+  alcancabilidade    -> sources, destinations (opcionais), limit (pares com falha listados)
+  verificacao        -> violações de verificacao.py
+  recarregar         -> topology (opcional; padrão: a topologia atual)
+  estatisticas       -> contadores do servidor e do cache de caminhos
+  metricas           -> instrumentação (com --metricas); format: "json" (padrão) ou "prometheus"
+
+As consultas de um mesmo cliente são atendidas em paralelo (a resposta traz o
+id da requisição). Alcançabilidade e verificação varrem a rede inteira e rodam
+em um pool de processos, para não atrasar as consultas curtas. Cada recarga
+monta um simulador novo em uma thread e o troca de uma vez (uma geração nova);
+requisições em andamento terminam sobre a geração em que começaram.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import stat
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from simulador_rede import BATCH_COMMANDS, NetworkSimulator
+
+DEFAULT_ADDRESS = '127.0.0.1:7654'
+LINE_LIMIT = 1 << 20 # Tamanho máximo de uma requisição
+MAX_PENDING_PER_CLIENT = 64 # Requisições de um cliente em andamento ao mesmo tempo
+DEFAULT_FAILURE_LIMIT = 100 # Pares com falha listados por alcancabilidade
+
+# Simulador de cada processo do pool, preenchido por _init_worker
+_worker_simulator = None
+
+
+def _init_worker(simulator):
+    global _worker_simulator
+    _worker_simulator = simulator
+
+
+def reachability_report(simulator, sources=None, destinations=None, limit=DEFAULT_FAILURE_LIMIT):
+    """Resumo da alcançabilidade de todos os pares e até limit pares com falha."""
+    unknown = [ip for ip in (sources or []) + (destinations or []) if ip not in simulator.ip_to_node_map]
+    if unknown:
+        raise ValueError(f"IP desconhecido '{unknown[0]}'")
+    result = simulator.all_pairs_reachability(sources, destinations)
+    failing = []
+    for source_ip, destination_ip, reason in result.failing_pairs():
+        if len(failing) >= limit:
+            break
+        failing.append({'source': source_ip, 'destination': destination_ip, 'reason': reason})
+    return {'summary': result.summary(), 'failing_pairs': failing}
+
+
+def verification_report(simulator):
+    return {'violations': [violation.to_dict() for violation in simulator.verify_forwarding()]}
+
+
+def _in_worker(function, *args):
+    return function(_worker_simulator, *args)
+
+
+def load_simulator(topology=None, snapshot=None, compact=False):
+    """
+    Simulador carregado da topologia (ou do snapshot, regenerado se desatualizado),
+    com todas as FIBs já compiladas: com workers=0, alcancabilidade e verificacao
+    rodam em threads sobre o mesmo simulador, e a compilação sob demanda alteraria
+    forwarding_tables enquanto as consultas do laço de eventos o leem.
+    """
+    simulator = NetworkSimulator()
+    if snapshot is not None:
+        from snapshot import load_cached
+        load_cached(simulator, snapshot, topology) # O snapshot já traz as FIBs de todos os roteadores
+    else:
+        simulator.load_network_configuration(topology, compact=compact)
+        simulator.compile_forwarding_tables()
+    return simulator
+
+
+def parse_address(address):
+    """'unix:/caminho' -> ('unix', caminho); 'host:porta' ou ':porta' -> ('tcp', host, porta)."""
+    if address.startswith('unix:'):
+        return ('unix', address[len('unix:'):])
+    host, separator, port = address.rpartition(':')
+    if not separator or not port.isdigit():
+        raise ValueError(f"endereço inválido '{address}' (use host:porta ou unix:/caminho)")
+    return ('tcp', host.strip('[]') or '127.0.0.1', int(port))
+
+
+def _field(request, name):
+    value = request.get(name)
+    if not isinstance(value, str):
+        raise ValueError(f"campo obrigatório ausente ou inválido '{name}'")
+    return value
+
+
+class _Generation:
+    """Uma versão carregada da rede, com o pool de processos que a atende."""
+
+    def __init__(self, number, simulator, topology, workers):
+        self.number = number
+        self.simulator = simulator
+        self.topology = topology
+        self.loaded_at = time.time()
+        self._workers = workers
+        self._executor = None
+
+    def executor(self):
+        """Pool de processos da geração (criado no primeiro uso); None = threads do laço."""
+        if self._workers == 0:
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self._workers, initializer=_init_worker,
+                                                 initargs=(self.simulator,))
+        return self._executor
+
+    def retire(self):
+        """Encerra o pool sem esperar: tarefas já enviadas terminam normalmente."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+class QueryServer:
+    """Servidor de consultas sobre uma rede carregada; ver o formato no início do módulo."""
+
+    def __init__(self, simulator, topology=None, loader=load_simulator, workers=None, metrics=None):
+        self.loader = loader # loader(topologia) -> simulador, usado por recarregar
+        self.metrics = metrics # instrumentacao.Metrics compartilhado por todas as gerações (ou None)
+        if metrics is not None:
+            metrics.attach(simulator)
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.generation = _Generation(1, simulator, topology, self.workers)
+        self.started_at = time.time()
+        self.requests = Counter()
+        self.errors = 0
+        self._connections = {} # writer -> tarefa que atende o cliente, encerradas por close
+        self._reload_lock = asyncio.Lock()
+        self._server = None
+
+    async def start(self, address):
+        """Abre o socket (TCP ou Unix) e começa a aceitar clientes."""
+        kind, *where = parse_address(address)
+        if kind == 'unix':
+            path = where[0]
+            if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+                os.remove(path) # Socket deixado por uma execução anterior
+            self._server = await asyncio.start_unix_server(self._client, path, limit=LINE_LIMIT)
+        else:
+            self._server = await asyncio.start_server(self._client, where[0], where[1], limit=LINE_LIMIT)
+        return self._server
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+        for writer in list(self._connections):
+            writer.close() # O laço de leitura do cliente vê o fim da conexão e termina
+        await asyncio.gather(*self._connections.values(), return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        self.generation.retire()
+
+    async def reload(self, topology=None):
+        """Carrega a rede de novo (em uma thread) e troca a geração atual de uma vez."""
+        async with self._reload_lock:
+            current = self.generation
+            topology = current.topology if topology is None else topology
+            simulator = await asyncio.get_running_loop().run_in_executor(None, self.loader, topology)
+            if self.metrics is not None:
+                self.metrics.attach(simulator)
+            self.generation = _Generation(current.number + 1, simulator, topology, self.workers)
+            current.retire()
+        return {'generation': self.generation.number, 'topology': topology}
+
+    def stats(self):
+        generation = self.generation
+        cache = generation.simulator.path_cache
+        return {
+            'generation': generation.number,
+            'topology': generation.topology,
+            'uptime': time.time() - self.started_at,
+            'loaded_at': generation.loaded_at,
+            'clients': len(self._connections),
+            'requests': dict(self.requests),
+            'errors': self.errors,
+            'path_cache': cache.stats() if cache is not None else None,
+        }
+
+    async def _offload(self, generation, function, *args):
+        executor = generation.executor()
+        loop = asyncio.get_running_loop()
+        if executor is None:
+            return await loop.run_in_executor(None, function, generation.simulator, *args)
+        return await loop.run_in_executor(executor, _in_worker, function, *args)
+
+    async def handle(self, request):
+        """Executa uma requisição (já decodificada) e retorna o resultado."""
+        if not isinstance(request, dict):
+            raise ValueError("a requisição deve ser um objeto JSON")
+        generation = self.generation # A requisição inteira usa a mesma geração, mesmo se houver recarga
+        command = request.get('command')
+        if command in BATCH_COMMANDS:
+            flow = request.get('flow')
+            return generation.simulator.resolve_path(_field(request, 'source'), _field(request, 'destination'),
+                                                     command, tuple(flow) if flow else None).to_dict()
+        if command == 'alcancabilidade':
+            return await self._offload(generation, reachability_report, request.get('sources'),
+                                       request.get('destinations'), int(request.get('limit', DEFAULT_FAILURE_LIMIT)))
+        if command == 'verificacao':
+            return await self._offload(generation, verification_report)
+        if command == 'recarregar':
+            return await self.reload(request.get('topology'))
+        if command == 'estatisticas':
+            return self.stats()
+        if command == 'metricas':
+            if self.metrics is None:
+                raise ValueError("instrumentação desativada (inicie o servidor com --metricas)")
+            return self.metrics.to_prometheus() if request.get('format') == 'prometheus' else self.metrics.to_dict()
+        raise ValueError(f"comando desconhecido '{command}'")
+
+    async def _answer(self, line, writer, slots):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id') if isinstance(request, dict) else None
+            self.requests[request.get('command') if isinstance(request, dict) else None] += 1
+            response = {'id': request_id, 'ok': True, 'result': await self.handle(request)}
+        except Exception as e: # A conexão continua atendendo as próximas requisições
+            self.errors += 1
+            response = {'id': request_id, 'ok': False, 'error': str(e) or type(e).__name__}
+        try:
+            writer.write(json.dumps(response, ensure_ascii=False, separators=(',', ':')).encode() + b'\n')
+            await writer.drain()
+        except ConnectionError:
+            pass # Cliente desconectou antes da resposta
+        finally:
+            slots.release()
+
+    async def _client(self, reader, writer):
+        self._connections[writer] = asyncio.current_task()
+        slots = asyncio.Semaphore(MAX_PENDING_PER_CLIENT)
+        pending = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError: # Linha maior que LINE_LIMIT
+                    writer.write(b'{"id":null,"ok":false,"error":"requisi\\u00e7\\u00e3o longa demais"}\n')
+                    break
+                except ConnectionError:
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await slots.acquire()
+                task = asyncio.create_task(self._answer(line, writer, slots))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            del self._connections[writer]
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def serve(address, topology=None, snapshot=None, compact=False, workers=None, metrics=False, metrics_path=None):
+    """
+    Carrega a rede e atende até SIGINT/SIGTERM; SIGHUP recarrega a topologia.
+    metrics=True ativa a instrumentação; com metrics_path, as métricas são gravadas nele ao encerrar.
+    """
+    loop = asyncio.get_running_loop()
+    loader = lambda path: load_simulator(path, snapshot, compact)
+    simulator = await loop.run_in_executor(None, loader, topology)
+    server_metrics = None
+    if metrics:
+        from instrumentacao import Metrics
+        server_metrics = Metrics()
+    server = QueryServer(simulator, topology, loader, workers, server_metrics)
+    await server.start(address)
+    print(f"Atendendo em {address}", file=sys.stderr)
+
+    stop = asyncio.Event()
+    for signal_name, callback in (('SIGINT', stop.set), ('SIGTERM', stop.set),
+                                  ('SIGHUP', lambda: loop.create_task(server.reload()))):
+        try:
+            loop.add_signal_handler(getattr(signal, signal_name), callback)
+        except (AttributeError, NotImplementedError): # Sinal inexistente (ex.: Windows)
+            pass
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+        kind, *where = parse_address(address)
+        if kind == 'unix' and os.path.exists(where[0]):
+            os.remove(where[0])
+        if server_metrics is not None and metrics_path is not None:
+            server_metrics.write(metrics_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de consultas xping/xtraceroute (JSON por linha).")
+    parser.add_argument('topologia', nargs='?', help="arquivo de topologia (padrão: rede de exemplo)")
+    parser.add_argument('--endereco', default=DEFAULT_ADDRESS,
+                        help=f"host:porta ou unix:/caminho (padrão: {DEFAULT_ADDRESS})")
+    parser.add_argument('-j', '--processos', type=int, default=None,
+                        help="processos para alcancabilidade/verificacao (0 = threads; padrão: todos os núcleos)")
+    parser.add_argument('--snapshot', metavar='ARQUIVO', help="carrega a rede do snapshot (ver snapshot.py)")
+    parser.add_argument('--compacto', action='store_true', help="guarda a rede em arrays compactos")
+    parser.add_argument('--metricas', action='store_true', help="ativa a instrumentação (comando metricas)")
+    args = parser.parse_args(argv)
+    try:
+        parse_address(args.endereco)
+    except ValueError as e:
+        parser.error(str(e))
+    asyncio.run(serve(args.endereco, args.topologia, args.snapshot, args.compacto, args.processos, args.metricas))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,159 @@
+import argparse
+import json
+import sys
 import networkx as nx
 import ipaddress # Biblioteca padrão do Python para manipulação de endereços IP
 
+from caminhos import PathCache
+from fib import CONNECTED, build_forwarding_table, flow_key, ip_to_int, select_next_hop
+from resultados import (
+    LINK_FAILURE, NO_ROUTE, OK, TTL, TTL_EXPIRED, UNKNOWN_DESTINATION, UNKNOWN_NEXT_HOP, UNKNOWN_SOURCE, PathResult
+)
+from rotas import compute_routing_tables
+from topologia import load_topology
+
+class VersionedGraph(nx.Graph):
+    """nx.Graph com um contador (version) incrementado a cada inclusão ou remoção de nós e arestas."""
+
+    def __init__(self, incoming_graph_data=None, **attr):
+        self.version = 0
+        super().__init__(incoming_graph_data, **attr)
+
+    def _changed(self):
+        self.version += 1
+
+    def add_node(self, node_for_adding, **attr):
+        self._changed()
+        super().add_node(node_for_adding, **attr)
+
+    def add_nodes_from(self, nodes_for_adding, **attr):
+        self._changed()
+        super().add_nodes_from(nodes_for_adding, **attr)
+
+    def remove_node(self, n):
+        self._changed()
+        super().remove_node(n)
+
+    def remove_nodes_from(self, nodes):
+        self._changed()
+        super().remove_nodes_from(nodes)
+
+    def add_edge(self, u_of_edge, v_of_edge, **attr):
+        self._changed()
+        super().add_edge(u_of_edge, v_of_edge, **attr)
+
+    def add_edges_from(self, ebunch_to_add, **attr):
+        self._changed()
+        super().add_edges_from(ebunch_to_add, **attr)
+
+    def remove_edge(self, u, v):
+        self._changed()
+        super().remove_edge(u, v)
+
+    def remove_edges_from(self, ebunch):
+        self._changed()
+        super().remove_edges_from(ebunch)
+
+    def clear(self):
+        self._changed()
+        super().clear()
+
+    def clear_edges(self):
+        self._changed()
+        super().clear_edges()
+
+
+class VersionedDict(dict):
+    """
+    dict que chama on_change(chave) a cada inclusão, troca ou remoção de uma
+    chave (on_change(None) em clear). Alterações dentro de um valor (ex.: append
+    na lista de rotas de um roteador) não passam por aqui.
+    """
+
+    on_change = None # Ausente enquanto o pickle restaura os itens
+
+    def __init__(self, data=(), on_change=None):
+        super().__init__(data)
+        self.on_change = on_change
+
+    def _changed(self, key):
+        if self.on_change is not None:
+            self.on_change(key)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._changed(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed(key)
+
+    def pop(self, key, *default):
+        present = key in self
+        value = super().pop(key, *default)
+        if present:
+            self._changed(key)
+        return value
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._changed(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return super().__getitem__(key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        super().clear()
+        self._changed(None)
+
+
+# Estruturas da rede versionadas automaticamente -> método do simulador chamado a cada alteração
+_VERSIONED_MAPPINGS = {
+    'routing_tables': '_routing_changed',
+    'node_interfaces_and_subnets': '_routing_changed',
+    'host_gateways': '_addressing_changed',
+    'ip_to_node_map': '_addressing_changed',
+}
+
+
 class NetworkSimulator:
     def __init__(self):
-        self.graph = nx.Graph()  # O grafo que representa a topologia da rede
+        self.forwarding_tables = {} # FIBs compiladas por roteador (geradas sob demanda a partir das duas estruturas abaixo)
+        self._tables_version = 0 # Incrementado a cada invalidate_forwarding_tables
+        self.graph = VersionedGraph()  # O grafo que representa a topologia da rede
         self.routing_tables = {} # Dicionário para armazenar as tabelas de roteamento de cada roteador
         self.ip_to_node_map = {} # Mapeia endereços IP para nós no grafo (ex: '192.168.0.1' -> 'host1')
         self.host_gateways = {} # Mapeia hosts para seus gateways padrão
         self.node_interfaces_and_subnets = {} # Mapeia roteadores para suas interfaces e as sub-redes às quais pertencem
+        self.path_cache = PathCache(self) # Caminhos já resolvidos (None desativa o cache)
+        self.metrics = None # instrumentacao.Metrics, se ativada por enable_metrics
 
-    def load_network_configuration(self):
+    def load_network_configuration(self, config_path=None, compact=False):
+        """
+        Carrega a rede. Sem argumentos, usa a topologia de exemplo abaixo;
+        com config_path, lê a topologia de um arquivo (.jsonl, .csv, .json, .yaml),
+        ver topologia.py para o formato. compact=True guarda a rede em arrays
+        (ver compacto.py), com muito menos memória em redes grandes.
+        """
+        if config_path is not None:
+            if compact:
+                from compacto import load_compact_topology
+                load_compact_topology(self, config_path)
+                return
+            load_topology(self, config_path)
+            self.invalidate_forwarding_tables()
+            return
 
         # Adicionar nós (dispositivos) ao grafo
         # Definindo o tipo para cada nó
@@ -181,18 +325,164 @@ class NetworkSimulator:
             'host8': '192.168.0.99', # Gateway e4
         }
 
+        self.invalidate_forwarding_tables()
+        if compact:
+            from compacto import compact as compact_network
+            compact_network(self)
+
+    def __setattr__(self, name, value):
+        # As quatro estruturas da rede viram VersionedDict (ou, no armazenamento
+        # compacto, recebem on_change), para que toda alteração mude topology_version
+        callback = _VERSIONED_MAPPINGS.get(name)
+        if callback is not None:
+            callback = getattr(self, callback)
+            if type(value) is dict:
+                value = VersionedDict(value, callback)
+            elif hasattr(value, 'on_change'):
+                value.on_change = callback
+            super().__setattr__(name, value)
+            self.invalidate_forwarding_tables()
+            return
+        super().__setattr__(name, value)
+
+    def _routing_changed(self, node_name):
+        """Rotas ou interfaces de node_name mudaram (None: de qualquer roteador)."""
+        self.invalidate_forwarding_tables(None if node_name is None else [node_name])
+
+    def _addressing_changed(self, key):
+        """IPs ou gateways mudaram: as FIBs continuam válidas, os caminhos em cache não."""
+        self._tables_version += 1
+
+    def invalidate_forwarding_tables(self, node_names=None):
+        """
+        Descarta as FIBs compiladas (de todos os roteadores ou só dos informados).
+        É chamada automaticamente quando uma chave de routing_tables ou de
+        node_interfaces_and_subnets é incluída, trocada ou removida (e
+        host_gateways/ip_to_node_map mudam topology_version da mesma forma).
+        Alterações dentro de um valor (ex.: routing_tables[r].append(...) ou
+        entry['next_hop'] = ...) não são detectadas: chame-a nesses casos.
+        Cada FIB é recompilada uma única vez, no primeiro uso, e os caminhos em cache são descartados.
+        """
+        self._tables_version += 1
+        if node_names is None:
+            self.forwarding_tables = {}
+        else:
+            for node_name in node_names:
+                self.forwarding_tables.pop(node_name, None)
+
+    @property
+    def topology_version(self):
+        """
+        Muda sempre que o grafo, as tabelas de roteamento, as interfaces, os
+        gateways ou o mapa de IPs mudam (ver invalidate_forwarding_tables).
+        """
+        return (self._tables_version, getattr(self.graph, 'version', None))
+
+    def get_forwarding_table(self, node_name):
+        """Retorna a FIB (trie de prefixos) do roteador, compilando-a se necessário."""
+        forwarding_table = self.forwarding_tables.get(node_name)
+        if forwarding_table is None:
+            if node_name not in self.node_interfaces_and_subnets and node_name not in self.routing_tables:
+                return None
+            forwarding_table = build_forwarding_table(
+                self.node_interfaces_and_subnets.get(node_name),
+                self.routing_tables.get(node_name)
+            )
+            if self.metrics is not None:
+                forwarding_table = self.metrics.wrap(node_name, forwarding_table)
+            self.forwarding_tables[node_name] = forwarding_table
+        return forwarding_table
+
+    def compile_forwarding_tables(self):
+        """Compila antecipadamente as FIBs de todos os roteadores."""
+        self.forwarding_tables = {}
+        for node_name in set(self.node_interfaces_and_subnets) | set(self.routing_tables):
+            self.get_forwarding_table(node_name)
+
+    def synthesize_routing_tables(self, aggregate=True, default_route=False):
+        """
+        Substitui as tabelas de roteamento dos roteadores pelas calculadas a partir
+        do grafo (caminhos mínimos + agregação de prefixos), ver rotas.py.
+        """
+        self.routing_tables = compute_routing_tables(self, aggregate=aggregate, default_route=default_route)
+        self.invalidate_forwarding_tables()
+        return self.routing_tables
+
+    def all_pairs_reachability(self, sources=None, destinations=None):
+        """
+        Alcançabilidade e número de saltos de todos os pares origem x destino
+        (por padrão, todos os hosts), calculados em lote com NumPy.
+        Retorna um alcancabilidade.ReachabilityResult.
+        """
+        from alcancabilidade import ReachabilityEngine # NumPy só é necessário para este modo
+        return ReachabilityEngine(self).all_pairs(sources, destinations)
+
+    def failure_analyzer(self, sources=None, destinations=None, recompute_routes=False):
+        """
+        Analisador de falhas "e se" sobre a rede carregada (por padrão, todos
+        os pares de hosts). Retorna um falhas.FailureAnalyzer (ValueError em redes com ECMP).
+        """
+        from falhas import FailureAnalyzer
+        return FailureAnalyzer(self, sources, destinations, recompute_routes)
+
+    def verify_forwarding(self):
+        """
+        Verificação estática das tabelas: loops, buracos negros e links
+        ausentes por faixa de endereços. Retorna [verificacao.Violation].
+        """
+        from verificacao import ForwardingVerifier
+        return ForwardingVerifier(self).verify()
+
+    def count_paths(self, source_ip, destination_ip):
+        """Número de caminhos ECMP do par por situação final ({situação: quantidade}), ver ecmp.py."""
+        from ecmp import count_paths
+        return count_paths(self, source_ip, destination_ip)
+
+    def enumerate_paths(self, source_ip, destination_ip, command='xtraceroute'):
+        """Gera um PathResult por caminho ECMP do par, ver ecmp.py."""
+        from ecmp import enumerate_paths
+        return enumerate_paths(self, source_ip, destination_ip, command)
+
+    def enable_metrics(self, metrics=None):
+        """
+        Ativa a instrumentação (buscas por roteador, prefixos casados e latências,
+        ver instrumentacao.py) e retorna o instrumentacao.Metrics que acumula as contagens.
+        """
+        from instrumentacao import Metrics
+        return (metrics or Metrics()).attach(self)
+
+    def disable_metrics(self):
+        """Desativa a instrumentação; retorna o Metrics que estava ativo (ou None)."""
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.detach(self)
+        return metrics
+
+    def save_snapshot(self, path, config_path=None):
+        """
+        Grava a rede carregada, com as FIBs compiladas, em um snapshot binário
+        (ver snapshot.py); config_path é a topologia de origem, para detectar snapshots desatualizados.
+        """
+        from snapshot import save_snapshot
+        save_snapshot(self, path, config_path)
+
+    def load_snapshot(self, path, config_path=None):
+        """Carrega a rede de um snapshot mapeado em memória (snapshot.StaleSnapshotError se config_path mudou)."""
+        from snapshot import load_snapshot
+        load_snapshot(self, path, config_path)
 
     def get_node_by_ip(self, ip_address):
         """Retorna o nome do nó dado um endereço IP."""
         return self.ip_to_node_map.get(ip_address)
 
-    def _get_next_hop(self, current_node_name, destination_ip_str):
+    def _get_next_hop(self, current_node_name, destination_ip_str, flow=None):
         """
         Simula a lógica de roteamento para encontrar o próximo salto.
         Retorna o IP do próximo salto ou None se o destino for inalcançável.
+        Em rotas ECMP, o salto é escolhido pelo hash de flow, o 5-tupla
+        (origem, destino, protocolo, porta_origem, porta_destino) ou só o seu
+        início (ver fib.flow_key); sem flow, vale o primeiro salto do grupo.
         """
-        destination_ip = ipaddress.ip_address(destination_ip_str)
-
         # Se o nó atual for um HOST, ele encaminha para seu gateway padrão
         if self.graph.nodes[current_node_name]['type'] == 'host':
             gateway_ip = self.host_gateways.get(current_node_name)
@@ -200,66 +490,58 @@ class NetworkSimulator:
                 return gateway_ip
             return None # Host sem gateway
 
-        # Para ROTEADORES: Primeiro, verifica se o destino está em uma rede diretamente conectada
-        if current_node_name in self.node_interfaces_and_subnets:
-            for interface_ip, connected_subnet in self.node_interfaces_and_subnets[current_node_name].items():
-                if destination_ip in connected_subnet:
-                    # Se o destino estiver em uma sub-rede diretamente conectada,
-                    # o próximo salto é o próprio IP de destino.
-                    # Isso simula a entrega local (ARP-like) dentro do segmento.
-                    return destination_ip_str # Entregar diretamente
-        
-        #  Se não estiver diretamente conectado, busca na tabela de roteamento
-        if current_node_name not in self.routing_tables:
+        # Para ROTEADORES: busca pelo maior prefixo na FIB compilada.
+        # Redes diretamente conectadas têm prioridade sobre a tabela de roteamento.
+        forwarding_table = self.forwarding_tables.get(current_node_name) or self.get_forwarding_table(current_node_name)
+        destination_ip = ip_to_int(destination_ip_str)
+        if forwarding_table is None or destination_ip is None:
             return None # Não tem tabela de roteamento
 
-        best_match_next_hop = None
-        longest_prefix_length = -1
-
-        for entry in self.routing_tables[current_node_name]:
-            dest_net = ipaddress.ip_network(entry['destination_network'])
-            if destination_ip in dest_net:
-                if dest_net.prefixlen > longest_prefix_length:
-                    longest_prefix_length = dest_net.prefixlen
-                    best_match_next_hop = entry['next_hop']
-        
-        if best_match_next_hop:
-            return best_match_next_hop
-        else:
-            # Se não houver correspondência específica, tenta a rota padrão (0.0.0.0/0)
-            for entry in self.routing_tables[current_node_name]:
-                if entry['destination_network'] == '0.0.0.0/0':
-                    return entry['next_hop']
-        
-        return None # Não encontrou rota
-
-    def xping(self, source_ip, destination_ip):
-        
-        print(f"\n--- Executando xping de {source_ip} para {destination_ip} ---")
+        match = forwarding_table.lookup(destination_ip, multipath=True)
+        if match is None:
+            return None # Não encontrou rota
+        if match[0] == CONNECTED:
+            # O próximo salto é o próprio IP de destino (entrega local, ARP-like)
+            return destination_ip_str
+        group = match[1]
+        if flow is None or len(group) == 1:
+            return group[0]
+        return select_next_hop(group, flow_key(*flow), current_node_name)
+
+    def resolve_path(self, source_ip, destination_ip, command='xping', flow=None):
+        """
+        Simula o pacote viajando pela rede, salto a salto, sem imprimir nada.
+        Retorna um PathResult com a situação, os nós percorridos e o motivo da falha.
+        flow = (protocolo, porta_origem, porta_destino) completa o 5-tupla que
+        escolhe os saltos ECMP (padrão: ICMP, portas 0); ver ecmp.py para todos os caminhos.
+        Usa o PathCache: depois de editar uma tabela por dentro (ex.: append em
+        routing_tables[r]), chame invalidate_forwarding_tables(r) antes de consultar.
+        """
         source_node_name = self.get_node_by_ip(source_ip)
         destination_node_name = self.get_node_by_ip(destination_ip)
 
         if not source_node_name:
-            print(f"Erro: Host de origem '{source_ip}' não encontrado na configuração da rede.")
-            return
+            return PathResult(command, source_ip, destination_ip, UNKNOWN_SOURCE,
+                              reason=f"Host de origem '{source_ip}' não encontrado na configuração da rede.")
         if not destination_node_name:
-            print(f"Erro: Host de destino '{destination_ip}' não encontrado na configuração da rede.")
-            return
+            return PathResult(command, source_ip, destination_ip, UNKNOWN_DESTINATION,
+                              reason=f"Host de destino '{destination_ip}' não encontrado na configuração da rede.")
 
-        print(f"Tentando ping de {source_node_name} para {destination_node_name}...")
+        flow = (source_ip, destination_ip, *flow) if flow else (source_ip, destination_ip)
+        if self.path_cache is not None and ip_to_int(destination_ip) is not None:
+            # Mesmo resultado do percurso abaixo, reaproveitando o caminho da classe do destino
+            return self.path_cache.resolve(command, source_ip, destination_ip, source_node_name, destination_node_name, flow)
 
-        # Simula o pacote viajando pela rede
         current_node_name = source_node_name
         path = [current_node_name]
-        ttl = 30 # Time To Live (TTL) - limite de saltos para evitar loops infinitos
+        ttl = TTL
 
         while current_node_name != destination_node_name and ttl > 0:
-            next_hop_ip = self._get_next_hop(current_node_name, destination_ip)
-            
+            next_hop_ip = self._get_next_hop(current_node_name, destination_ip, flow)
             if not next_hop_ip:
-                print(f"Destino inalcançável: Nenhuma rota encontrada de {current_node_name} para {destination_ip}.")
-                return
-            
+                return PathResult(command, source_ip, destination_ip, NO_ROUTE, path,
+                                  "Destino Inalcançável (Nenhuma rota)", TTL - ttl)
+
             # Descobre qual o nó correspondente ao next_hop_ip
             next_node_name = self.get_node_by_ip(next_hop_ip)
             if not next_node_name:
@@ -267,100 +549,168 @@ class NetworkSimulator:
                 if next_hop_ip == destination_ip:
                     next_node_name = destination_node_name # O próximo "nó" é o próprio destino final
                 else:
-                    print(f"Erro: Próximo salto '{next_hop_ip}' não mapeado para um nó conhecido.")
-                    return
-            
+                    return PathResult(command, source_ip, destination_ip, UNKNOWN_NEXT_HOP, path,
+                                      f"Próximo Salto Desconhecido ({next_hop_ip})", TTL - ttl, next_hop_ip)
+
             # Verifica se o link entre current_node_name e next_node_name existe no grafo
             # Exceção: Se o next_node_name for o próprio destino, e ele for um host,
             # não necessariamente há um 'link' no grafo para ele diretamente do roteador
             # se já estamos na sub-rede final.
             if next_node_name != destination_node_name and not self.graph.has_edge(current_node_name, next_node_name):
-                 print(f"Erro: Link físico ausente entre {current_node_name} e {next_node_name}. Roteamento incorreto ou falha de conectividade física.")
-                 return
+                return PathResult(command, source_ip, destination_ip, LINK_FAILURE, path,
+                                  f"Falha de Link para {next_node_name} (IP: {next_hop_ip})", TTL - ttl,
+                                  next_hop_ip, next_node_name)
 
             current_node_name = next_node_name
             path.append(current_node_name)
             ttl -= 1
 
         if current_node_name == destination_node_name:
+            return PathResult(command, source_ip, destination_ip, OK, path, ttl_used=TTL - ttl)
+        return PathResult(command, source_ip, destination_ip, TTL_EXPIRED, path, "TTL expirado", TTL - ttl)
+
+    def xping(self, source_ip, destination_ip):
+        """Executa o ping, imprime o resultado e o retorna como PathResult."""
+        print(f"\n--- Executando xping de {source_ip} para {destination_ip} ---")
+        result = self.resolve_path(source_ip, destination_ip, 'xping')
+
+        if result.status in (UNKNOWN_SOURCE, UNKNOWN_DESTINATION):
+            print(f"Erro: {result.reason}")
+            return result
+
+        print(f"Tentando ping de {result.hops[0]} para {self.get_node_by_ip(destination_ip)}...")
+
+        if result.status == OK:
             print(f"\nSucesso! Ping de {source_ip} para {destination_ip} bem-sucedido.")
-            print(f"Caminho percorrido: {' -> '.join(path)}")
+            print(f"Caminho percorrido: {' -> '.join(result.hops)}")
+        elif result.status == NO_ROUTE:
+            print(f"Destino inalcançável: Nenhuma rota encontrada de {result.hops[-1]} para {destination_ip}.")
+        elif result.status == UNKNOWN_NEXT_HOP:
+            print(f"Erro: Próximo salto '{result.next_hop}' não mapeado para um nó conhecido.")
+        elif result.status == LINK_FAILURE:
+            print(f"Erro: Link físico ausente entre {result.hops[-1]} e {result.next_node}. Roteamento incorreto ou falha de conectividade física.")
         else:
-            print(f"\nFalha! Destino não alcançado após {30 - ttl} saltos (TTL Expirado).")
+            print(f"\nFalha! Destino não alcançado após {result.ttl_used} saltos (TTL Expirado).")
+        return result
 
     def xtraceroute(self, source_ip, destination_ip):
-
+        """Executa o traceroute, imprime a rota e a retorna como PathResult."""
         print(f"\n--- Executando xtraceroute de {source_ip} para {destination_ip} ---")
-        source_node_name = self.get_node_by_ip(source_ip)
-        destination_node_name = self.get_node_by_ip(destination_ip)
+        result = self.resolve_path(source_ip, destination_ip, 'xtraceroute')
 
-        if not source_node_name:
-            print(f"Erro: Host de origem '{source_ip}' não encontrado na configuração da rede.")
-            return
-        if not destination_node_name:
-            print(f"Erro: Host de destino '{destination_ip}' não encontrado na configuração da rede.")
-            return
+        if result.status in (UNKNOWN_SOURCE, UNKNOWN_DESTINATION):
+            print(f"Erro: {result.reason}")
+            return result
 
-        print(f"Traçando rota de {source_node_name} para {destination_node_name}...")
+        print(f"Traçando rota de {result.hops[0]} para {self.get_node_by_ip(destination_ip)}...")
 
-        current_node_name = source_node_name
-        hops = []
-        ttl = 30 # Time To Live (TTL) para o traceroute
+        # Em um traceroute real, o IP mostrado é o da interface do roteador que respondeu.
+        # Aqui, mostramos o nome de cada nó percorrido.
+        hops = result.traceroute_hops()
+        print("Rota:")
+        for i, node in enumerate(hops):
+            print(f"  {i+1} {node}")
+        if result.status == OK:
+            print(f"Traceroute completo. Saltos: {len(hops) - 1}")
+        else:
+            print(f"Destino inalcançável ou TTL expirado após {len(hops)} saltos.")
+        return result
 
-        while current_node_name != destination_node_name and ttl > 0:
-            hops.append(current_node_name) # Adiciona o nó atual como um salto
 
-            next_hop_ip = self._get_next_hop(current_node_name, destination_ip)
-            if not next_hop_ip:
-                hops.append("Destino Inalcançável (Nenhuma rota)")
-                break
-            
-            next_node_name = self.get_node_by_ip(next_hop_ip)
-            if not next_node_name:
-                # Caso de entrega direta para um host (next_hop_ip é o destino_ip)
-                if next_hop_ip == destination_ip:
-                    next_node_name = destination_node_name
-                else:
-                    hops.append(f"Próximo Salto Desconhecido ({next_hop_ip})")
-                    break
-            
-            # Em um traceroute real, o IP mostrado é o da interface do roteador que respondeu.
-            # Aqui, mostramos o nome do nó e o IP que ele usou para chegar ao próximo salto.
-            
-            # Verifica se o link existe (simulação de falha física)
-            if next_node_name != destination_node_name and not self.graph.has_edge(current_node_name, next_node_name):
-                 hops.append(f"Falha de Link para {next_node_name} (IP: {next_hop_ip})")
-                 break
+# --- Modo em lote (não interativo) ---
+BATCH_COMMANDS = ('xping', 'xtraceroute')
 
-            current_node_name = next_node_name
-            ttl -= 1
-        
-        if current_node_name == destination_node_name:
-            hops.append(destination_node_name) # Adiciona o destino final se alcançado
-            print("Rota:")
-            for i, node in enumerate(hops):
-                print(f"  {i+1} {node}")
-            print(f"Traceroute completo. Saltos: {len(hops) - 1}")
+
+def run_batch(simulator, lines, output):
+    """
+    Executa comandos 'xping <IP> <IP>' / 'xtraceroute <IP> <IP>' (um por linha)
+    e escreve um objeto JSON por linha em output, sem acumular resultados.
+    Linhas vazias ou iniciadas por '#' são ignoradas. Retorna a quantidade de comandos.
+    """
+    count = 0
+    for line_number, line in enumerate(lines, 1):
+        command_line = line.split()
+        if not command_line or command_line[0].startswith('#'):
+            continue
+        command = command_line[0].lower()
+        if command in BATCH_COMMANDS and len(command_line) == 3:
+            record = simulator.resolve_path(command_line[1], command_line[2], command).to_dict()
         else:
-            print("Rota:")
-            for i, node in enumerate(hops):
-                print(f"  {i+1} {node}")
-            print(f"Destino inalcançável ou TTL expirado após {len(hops)} saltos.")
+            record = {'line': line_number, 'error': 'comando inválido', 'input': line.strip()}
+        output.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+        output.write('\n')
+        count += 1
+    return count
 
 
 # --- Loop Principal da Aplicação ---
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulador de rede com xping e xtraceroute.")
+    parser.add_argument('topologia', nargs='?', help="arquivo de topologia (.jsonl, .csv, .json, .yaml); padrão: rede de exemplo")
+    parser.add_argument('--lote', metavar='ARQUIVO',
+                        help="executa os comandos do arquivo ('-' para a entrada padrão) e escreve JSON Lines")
+    parser.add_argument('-o', '--saida', default='-', help="arquivo de saída do modo em lote (padrão: saída padrão)")
+    parser.add_argument('--sem-cache', action='store_true', help="não reaproveita caminhos entre consultas")
+    parser.add_argument('--compacto', action='store_true',
+                        help="guarda a rede em arrays compactos (menos memória em redes grandes)")
+    parser.add_argument('--snapshot', metavar='ARQUIVO',
+                        help="carrega a rede do snapshot (gerado a partir da topologia se ausente ou desatualizado)")
+    parser.add_argument('--estatisticas', action='store_true',
+                        help="mostra as estatísticas do cache de caminhos ao final do lote (na saída de erros)")
+    parser.add_argument('--metricas', metavar='ARQUIVO',
+                        help="grava as métricas de instrumentação ao final (.prom/.txt: Prometheus; senão JSON)")
+    parser.add_argument('--servidor', metavar='ENDERECO',
+                        help="atende consultas JSON em host:porta ou unix:/caminho (ver servidor.py)")
+    args = parser.parse_args(argv)
+
+    config_path = args.topologia
+    if args.servidor:
+        import asyncio
+        from servidor import serve
+        ignored = [flag for flag, value in (('--lote', args.lote), ('--sem-cache', args.sem_cache),
+                                            ('--estatisticas', args.estatisticas)) if value]
+        if ignored:
+            parser.error(f"--servidor não pode ser combinado com {', '.join(ignored)}")
+        asyncio.run(serve(args.servidor, config_path, args.snapshot, args.compacto,
+                          metrics=bool(args.metricas), metrics_path=args.metricas))
+        return
     simulator = NetworkSimulator()
-    simulator.load_network_configuration() # Etapa 2: Importe/defina a configuração da rede.
+    if args.snapshot:
+        from snapshot import load_cached
+        load_cached(simulator, args.snapshot, config_path)
+    else:
+        simulator.load_network_configuration(config_path, compact=args.compacto) # Etapa 2: Importe/defina a configuração da rede.
+    if args.sem_cache:
+        simulator.path_cache = None
+    metrics = simulator.enable_metrics() if args.metricas else None
+
+    if args.lote is not None:
+        commands = sys.stdin if args.lote == '-' else open(args.lote, encoding='utf-8')
+        output = sys.stdout if args.saida == '-' else open(args.saida, 'w', encoding='utf-8', buffering=1 << 20)
+        try:
+            run_batch(simulator, commands, output)
+        finally:
+            if commands is not sys.stdin:
+                commands.close()
+            if output is not sys.stdout:
+                output.close()
+        if args.estatisticas and simulator.path_cache is not None:
+            print(json.dumps(simulator.path_cache.stats()), file=sys.stderr)
+        if metrics is not None:
+            metrics.write(args.metricas)
+        return
 
     while True:
         print("\nComandos disponíveis:")
         print("1. xping <IP_ORIGEM> <IP_DESTINO>")
         print("2. xtraceroute <IP_ORIGEM> <IP_DESTINO>")
         print("3. listar_hosts (para ver os IPs disponíveis)")
-        print("4. sair")
+        print("4. alcancabilidade (testa todos os pares de hosts de uma vez)")
+        print("5. sair")
 
         command_line = input("Digite o comando: ").strip().split()
+        if not command_line:
+            continue
         command = command_line[0].lower()
 
         if command == 'xping' and len(command_line) == 3:
@@ -376,24 +726,34 @@ def main():
             for ip, node in simulator.ip_to_node_map.items():
                 if node.startswith('host'):
                     print(f"  {node}: {ip}")
-            # Exibir alguns IPs de interfaces de roteadores para testes
-            print("\nIPs de Gateways e Interfaces de Roteadores para Teste de Roteamento:")
-            print(f"  e1 (Gateway): 192.168.0.3")
-            print(f"  e2 (Gateway): 192.168.0.35")
-            print(f"  e3 (Gateway): 192.168.0.67")
-            print(f"  e4 (Gateway): 192.168.0.99")
-            print(f"  Core (link a1): 192.168.1.249")
-            print(f"  Core (link a2): 192.168.1.253")
-            print(f"  a1 (link Core): 192.168.1.250")
-            print(f"  a1 (link e1): 192.168.0.129")
-            print(f"  a1 (link e2): 192.168.0.133")
-            print(f"  a2 (link Core): 192.168.1.254")
-            print(f"  a2 (link e3): 192.168.0.137")
-            print(f"  a2 (link e4): 192.168.0.141")
-
-
+            # (os IPs abaixo só existem na topologia de exemplo)
+            if config_path is None:
+                # Exibir alguns IPs de interfaces de roteadores para testes
+                print("\nIPs de Gateways e Interfaces de Roteadores para Teste de Roteamento:")
+                print(f"  e1 (Gateway): 192.168.0.3")
+                print(f"  e2 (Gateway): 192.168.0.35")
+                print(f"  e3 (Gateway): 192.168.0.67")
+                print(f"  e4 (Gateway): 192.168.0.99")
+                print(f"  Core (link a1): 192.168.1.249")
+                print(f"  Core (link a2): 192.168.1.253")
+                print(f"  a1 (link Core): 192.168.1.250")
+                print(f"  a1 (link e1): 192.168.0.129")
+                print(f"  a1 (link e2): 192.168.0.133")
+                print(f"  a2 (link Core): 192.168.1.254")
+                print(f"  a2 (link e3): 192.168.0.137")
+                print(f"  a2 (link e4): 192.168.0.141")
+
+
+        elif command == 'alcancabilidade':
+            result = simulator.all_pairs_reachability()
+            summary = result.summary()
+            print(f"\nPares testados: {summary['pairs']}  Alcançáveis: {summary['reachable']}  Saltos médios: {summary['mean_hops']:.2f}")
+            for source_ip, destination_ip, reason in result.failing_pairs():
+                print(f"  Falha: {source_ip} -> {destination_ip} ({reason})")
         elif command == 'sair':
             print("Saindo do simulador.")
+            if metrics is not None:
+                metrics.write(args.metricas)
             break
         else:
             print("Comando inválido. Por favor, tente novamente.")
@@ -0,0 +1,339 @@
+"""
+Snapshot binário da rede carregada, para inicialização rápida.
+
+O arquivo guarda os arrays do armazenamento compacto (compacto.py: tabela de
+nós, mapas de endereços, interfaces, rotas, gateways e adjacência) e as FIBs
+de todos os roteadores, já compiladas e achatadas em colunas
+(fib.FlatForwardingTable). Ao carregar, o arquivo é mapeado em memória e os
+arrays viram memoryviews sobre as páginas do arquivo: nada é decodificado
+antes do uso e processos que abrem o mesmo snapshot compartilham as páginas.
+
+Formato (ordem de bytes nativa, registrada no cabeçalho):
+  MAGIC e '<III' com FORMAT_VERSION, tamanho e CRC32 do cabeçalho;
+  cabeçalho JSON com as seções (nome, typecode, offset, itens), os objetos
+  auxiliares, o CRC32 dos dados e a impressão digital da topologia de origem;
+  dados das seções, cada uma alinhada em 8 bytes.
+A impressão digital (tamanho, mtime e SHA-256 do arquivo de topologia)
+identifica snapshots desatualizados.
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import socket
+import struct
+import sys
+import zlib
+from array import array
+
+from compacto import ARRAY_FIELDS, OBJECT_FIELDS, CompactNetwork, InterfaceMap, RouteMap, current_network, install
+from fib import FLAT_COLUMNS, FlatForwardingTable, build_forwarding_table
+
+MAGIC = b'RCSNAP\r\n'
+FORMAT_VERSION = 1
+
+_PREFIX = struct.Struct('<III') # Versão, tamanho e CRC32 do cabeçalho
+_ALIGNMENT = 8
+_HASH_CHUNK = 1 << 20
+
+# Seções além de ARRAY_FIELDS: nomes dos nós e as FIBs achatadas
+_NAMES_SECTION = ('names', 'B')
+_FIB_SECTIONS = tuple(('fib_' + name, typecode) for name, typecode in FLAT_COLUMNS) + (
+    ('fib_nodes', 'I'), # Roteadores com FIB (ids de nós)
+    ('fib_roots', 'I'), # Raiz da trie de cada um nas colunas fib_*
+)
+
+
+class SnapshotError(ValueError):
+    """Snapshot ausente de cabeçalho válido, corrompido ou de outra versão do formato."""
+
+
+class StaleSnapshotError(SnapshotError):
+    """O arquivo de topologia mudou depois que o snapshot foi gravado."""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path):
+    """Impressão digital de um arquivo de topologia: tamanho, mtime e SHA-256."""
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': _sha256(path)}
+
+
+class _ValueDecoder:
+    """Código de próximo salto das FIBs -> valor (IPv4 em texto ou o objeto em values)."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def __call__(self, code):
+        return socket.inet_ntoa(code.to_bytes(4, 'big')) if code >= 0 else self.values[-2 - code]
+
+
+class _ValueEncoder:
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def __call__(self, value):
+        try:
+            return int.from_bytes(socket.inet_pton(socket.AF_INET, value), 'big')
+        except (OSError, TypeError):
+            pass
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = -2 - len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _flatten_forwarding_tables(network):
+    """Colunas das FIBs de todos os roteadores da rede, compiladas a partir das interfaces e rotas."""
+    interfaces, routes = InterfaceMap(network), RouteMap(network)
+    columns = tuple(array(typecode) for _, typecode in FLAT_COLUMNS)
+    fib_nodes, fib_roots = array('I'), array('I')
+    encode = _ValueEncoder()
+    for node_id in range(network.node_count):
+        name = network.node_name(node_id)
+        if name not in interfaces and name not in routes:
+            continue
+        table = build_forwarding_table(interfaces.get(name), routes.get(name))
+        fib_nodes.append(node_id)
+        fib_roots.append(table.flatten(columns, encode))
+    return columns + (fib_nodes, fib_roots), encode.values
+
+
+def save_snapshot(simulator, path, source=None):
+    """
+    Grava o estado atual do simulador (rede e FIBs compiladas) em path.
+    source é o arquivo de topologia de origem, cuja impressão digital vai no
+    cabeçalho. A gravação é atômica (arquivo temporário + os.replace).
+    """
+    network = current_network(simulator)
+    fib_columns, fib_values = _flatten_forwarding_tables(network)
+    buffers = [(name, typecode, getattr(network, name)) for name, typecode in (_NAMES_SECTION,) + ARRAY_FIELDS]
+    buffers += [(name, typecode, column) for (name, typecode), column in zip(_FIB_SECTIONS, fib_columns)]
+
+    sections = []
+    offset = 0
+    checksum = 0
+    for name, typecode, buffer in buffers:
+        view = memoryview(buffer).cast('B')
+        sections.append({'name': name, 'typecode': typecode, 'offset': offset, 'items': len(buffer)})
+        checksum = zlib.crc32(view, checksum)
+        padding = -len(view) % _ALIGNMENT
+        checksum = zlib.crc32(bytes(padding), checksum)
+        offset += len(view) + padding
+
+    header = {
+        'format': FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'sections': sections,
+        'data_size': offset,
+        'data_crc32': checksum,
+        'objects': {name: getattr(network, name) for name in OBJECT_FIELDS if name != 'names'},
+        'fib_values': fib_values,
+        'source': source_fingerprint(source) if source is not None else None,
+    }
+    try:
+        header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode()
+    except TypeError as e:
+        raise SnapshotError(f"a rede tem valores que não podem ser gravados no snapshot ({e})") from e
+
+    temporary = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(temporary, 'wb') as f:
+            f.write(MAGIC)
+            f.write(_PREFIX.pack(FORMAT_VERSION, len(header_bytes), zlib.crc32(header_bytes)))
+            f.write(header_bytes)
+            f.write(bytes(-f.tell() % _ALIGNMENT))
+            for _, _, buffer in buffers:
+                view = memoryview(buffer).cast('B')
+                f.write(view)
+                f.write(bytes(-len(view) % _ALIGNMENT))
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return header
+
+
+class Snapshot:
+    """
+    Snapshot aberto: o arquivo mapeado em memória (cópia privada: alterações
+    não voltam ao arquivo) e as seções como memoryviews.
+    """
+
+    def __init__(self, path, verify=True):
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            except ValueError as e: # Arquivo vazio
+                raise SnapshotError(f"{path}: snapshot vazio") from e
+        self.header = self._read_header()
+        if verify:
+            self.verify()
+        self._sections = {section['name']: section for section in self.header['sections']}
+
+    def __reduce__(self):
+        # Em outro processo, reabre o arquivo sem recalcular o CRC (o cabeçalho confirma que é o mesmo)
+        return (_reopen, (self.path, self.header['data_crc32']))
+
+    def _read_header(self):
+        prefix_end = len(MAGIC) + _PREFIX.size
+        if self._map[:len(MAGIC)] != MAGIC or len(self._map) < prefix_end:
+            raise SnapshotError(f"{self.path}: não é um snapshot de rede")
+        version, header_size, header_crc = _PREFIX.unpack(self._map[len(MAGIC):prefix_end])
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"{self.path}: formato {version}, esperado {FORMAT_VERSION}")
+        header_bytes = self._map[prefix_end:prefix_end + header_size]
+        if zlib.crc32(header_bytes) != header_crc:
+            raise SnapshotError(f"{self.path}: cabeçalho corrompido")
+        header = json.loads(header_bytes)
+        if header['byteorder'] != sys.byteorder:
+            raise SnapshotError(f"{self.path}: gravado em uma máquina {header['byteorder']}-endian")
+        self._data_start = prefix_end + header_size + (-(prefix_end + header_size) % _ALIGNMENT)
+        if len(self._map) != self._data_start + header['data_size']:
+            raise SnapshotError(f"{self.path}: tamanho incorreto (arquivo truncado?)")
+        return header
+
+    def verify(self):
+        """Confere o CRC32 dos dados (lê o arquivo inteiro)."""
+        data = memoryview(self._map)[self._data_start:]
+        try:
+            if zlib.crc32(data) != self.header['data_crc32']:
+                raise SnapshotError(f"{self.path}: dados corrompidos (CRC32 diferente)")
+        finally:
+            data.release()
+
+    def check_source(self, source):
+        """Levanta StaleSnapshotError se o arquivo de topologia source não é o que gerou o snapshot."""
+        fingerprint = self.header['source']
+        if fingerprint is None:
+            raise StaleSnapshotError(f"{self.path}: snapshot não foi gerado a partir de um arquivo de topologia")
+        stat = os.stat(source)
+        if stat.st_size != fingerprint['size'] or (
+                stat.st_mtime_ns != fingerprint['mtime_ns'] and _sha256(source) != fingerprint['sha256']):
+            raise StaleSnapshotError(f"{self.path}: desatualizado em relação a {source}")
+
+    def section(self, name):
+        section = self._sections[name]
+        start = self._data_start + section['offset']
+        size = section['items'] * array(section['typecode']).itemsize
+        return memoryview(self._map)[start:start + size].cast(section['typecode'])
+
+    def network(self):
+        """CompactNetwork sobre as seções do arquivo."""
+        fields = {name: self.section(name) for name, _ in (_NAMES_SECTION,) + ARRAY_FIELDS}
+        fields.update(self.header['objects'])
+        return CompactNetwork(snapshot=self, **fields)
+
+    def forwarding_tables(self, network):
+        """FIBs achatadas de todos os roteadores, por nome."""
+        columns = tuple(self.section(name) for name, _ in _FIB_SECTIONS[:len(FLAT_COLUMNS)])
+        decode = _ValueDecoder(self.header['fib_values'])
+        return {
+            network.node_name(node_id): FlatForwardingTable(_FlatColumns(columns, self), root, decode)
+            for node_id, root in zip(self.section('fib_nodes'), self.section('fib_roots'))
+        }
+
+
+class _FlatColumns(tuple):
+    """Colunas das FIBs sobre o snapshot; em outro processo, reabre o arquivo em vez de copiar."""
+
+    def __new__(cls, columns, snapshot):
+        self = super().__new__(cls, columns)
+        self.snapshot = snapshot
+        return self
+
+    def __reduce__(self):
+        return (_fib_columns, (self.snapshot,))
+
+
+def _fib_columns(snapshot):
+    return _FlatColumns(tuple(snapshot.section(name) for name, _ in _FIB_SECTIONS[:len(FLAT_COLUMNS)]), snapshot)
+
+
+def _reopen(path, data_crc32):
+    snapshot = Snapshot(path, verify=False)
+    if snapshot.header['data_crc32'] != data_crc32:
+        raise SnapshotError(f"{path}: o snapshot foi substituído enquanto estava em uso")
+    return snapshot
+
+
+def load_snapshot(simulator, path, source=None, verify=True):
+    """
+    Carrega o snapshot no simulador (armazenamento compacto + FIBs prontas).
+    Com source, levanta StaleSnapshotError se a topologia mudou desde a gravação.
+    """
+    snapshot = Snapshot(path, verify)
+    if source is not None:
+        snapshot.check_source(source)
+    network = install(simulator, snapshot.network())
+    simulator.forwarding_tables = snapshot.forwarding_tables(network)
+    return snapshot
+
+
+def load_cached(simulator, path, source=None):
+    """
+    Carrega do snapshot se ele existir, estiver íntegro e atualizado em relação
+    a source; senão carrega a topologia (no armazenamento compacto) e regrava
+    o snapshot. Retorna True se o snapshot foi usado.
+    """
+    try:
+        load_snapshot(simulator, path, source)
+        return True
+    except (OSError, SnapshotError):
+        pass
+    simulator.load_network_configuration(source, compact=True)
+    save_snapshot(simulator, path, source)
+    return False
+
+
+def main(argv=None):
+    import time
+    from simulador_rede import NetworkSimulator
+
+    parser = argparse.ArgumentParser(description="Gera e confere snapshots binários da rede.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('gerar', help="carrega a topologia e grava o snapshot")
+    build.add_argument('topologia', nargs='?', help="arquivo de topologia (padrão: rede de exemplo)")
+    build.add_argument('-o', '--saida', required=True, help="arquivo do snapshot")
+    check = subparsers.add_parser('verificar', help="confere integridade e atualização de um snapshot")
+    check.add_argument('snapshot', help="arquivo do snapshot")
+    check.add_argument('--topologia', help="arquivo de topologia que deveria ter gerado o snapshot")
+    args = parser.parse_args(argv)
+
+    simulator = NetworkSimulator()
+    started = time.perf_counter()
+    try:
+        if args.command == 'gerar':
+            simulator.load_network_configuration(args.topologia, compact=True)
+            header = save_snapshot(simulator, args.saida, args.topologia)
+            fib_count = next(section['items'] for section in header['sections'] if section['name'] == 'fib_nodes')
+            print(f"{simulator.graph.number_of_nodes()} nós, {fib_count} FIBs: "
+                  f"{os.path.getsize(args.saida) / 1e6:.1f} MB gravados em {args.saida} "
+                  f"({time.perf_counter() - started:.2f}s)")
+        else:
+            load_snapshot(simulator, args.snapshot, args.topologia)
+            print(f"{args.snapshot}: íntegro{' e atualizado' if args.topologia else ''}; "
+                  f"{simulator.graph.number_of_nodes()} nós, {len(simulator.forwarding_tables)} FIBs "
+                  f"(carregado em {(time.perf_counter() - started) * 1000:.1f} ms)")
+    except (OSError, SnapshotError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
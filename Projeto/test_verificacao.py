@@ -0,0 +1,41 @@
+from simulador_rede import NetworkSimulator
+from verificacao import BLACKHOLE, MISSING_LINK
+
+
+def _sample_network():
+    simulator = NetworkSimulator()
+    simulator.load_network_configuration()
+    return simulator
+
+
+def _host_violations(simulator, host):
+    return [violation for violation in simulator.verify_forwarding() if violation.nodes == (host,)]
+
+
+def test_host_without_link_to_gateway():
+    simulator = _sample_network()
+    simulator.graph.remove_edge('e1', 'host1')
+    assert simulator.resolve_path('192.168.0.1', '192.168.0.34').status == 'link_failure'
+    violations = _host_violations(simulator, 'host1')
+    assert violations and all(v.kind == MISSING_LINK and v.detail == '192.168.0.3' for v in violations)
+
+
+def test_host_without_gateway():
+    simulator = _sample_network()
+    del simulator.host_gateways['host2']
+    assert simulator.resolve_path('192.168.0.2', '192.168.0.34').status == 'no_route'
+    violations = _host_violations(simulator, 'host2')
+    assert violations and all(v.kind == BLACKHOLE for v in violations)
+
+
+def test_host_with_gateway_out_of_reach():
+    simulator = _sample_network()
+    simulator.host_gateways['host3'] = '192.168.0.99' # Gateway de e4, sem link com host3
+    assert simulator.resolve_path('192.168.0.33', '192.168.0.1').status == 'link_failure'
+    violations = _host_violations(simulator, 'host3')
+    assert violations and all(v.kind == MISSING_LINK and v.detail == '192.168.0.99' for v in violations)
+
+
+def test_sample_network_baseline():
+    violations = _sample_network().verify_forwarding()
+    assert [(v.kind, v.nodes) for v in violations] == [(BLACKHOLE, ('Core',))]
@@ -0,0 +1,424 @@
+"""
+Carregamento declarativo de topologias e geração de topologias sintéticas.
+
+Uma topologia é uma sequência de registros, cada um com um campo 'kind':
+  node      -> name, type ('router' ou 'host')
+  link      -> source, target e atributos opcionais (capacity, type, cost)
+  interface -> node, ip, network (IP de roteador e a sub-rede conectada)
+  address   -> ip, node (IP sem sub-rede associada, ex.: hosts)
+  route     -> node, destination, next_hop (uma lista de IPs forma um grupo ECMP;
+               no CSV, IPs separados por espaço)
+  gateway   -> host, gateway
+
+Formatos aceitos:
+  .jsonl    -> um registro JSON por linha (lido em streaming)
+  .csv      -> uma linha por registro, com cabeçalho contendo 'kind' (streaming)
+  .json     -> documento com as listas nodes/links/interfaces/addresses/routes/gateways
+  .yaml/.yml-> mesmo documento do .json (requer PyYAML)
+"""
+
+import argparse
+import csv
+import ipaddress
+import json
+import os
+import socket
+import sys
+
+# Seções de um documento JSON/YAML e o 'kind' dos registros de cada uma
+DOCUMENT_SECTIONS = (
+    ('nodes', 'node'),
+    ('links', 'link'),
+    ('interfaces', 'interface'),
+    ('addresses', 'address'),
+    ('routes', 'route'),
+    ('gateways', 'gateway'),
+)
+
+# Colunas usadas ao escrever CSV (campos vazios são ignorados na leitura)
+CSV_FIELDS = ('kind', 'name', 'type', 'source', 'target', 'capacity', 'cost',
+              'node', 'ip', 'network', 'destination', 'next_hop', 'host', 'gateway')
+
+# Atributos de link copiados para as arestas do grafo
+LINK_ATTRIBUTES = ('capacity', 'type', 'cost')
+
+# Blocos de endereços usados pelos geradores
+HOST_ADDRESS_POOL = ipaddress.ip_network('10.0.0.0/8')
+LINK_ADDRESS_POOL = ipaddress.ip_network('100.64.0.0/10')
+
+
+class TopologyError(ValueError):
+    """Erro de formato ou de conteúdo em um arquivo de topologia."""
+
+
+# --- Leitura ---
+
+def _read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise TopologyError(f"{path}:{line_number}: JSON inválido ({e.msg})") from e
+
+
+def _read_csv(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames or 'kind' not in reader.fieldnames:
+            raise TopologyError(f"{path}: o cabeçalho CSV precisa de uma coluna 'kind'")
+        for row in reader:
+            yield {key: value for key, value in row.items() if value not in (None, '')}
+
+
+def _document_records(document, path):
+    if not isinstance(document, dict):
+        raise TopologyError(f"{path}: o documento deve ser um objeto com as seções {[s for s, _ in DOCUMENT_SECTIONS]}")
+    for section, kind in DOCUMENT_SECTIONS:
+        items = document.get(section) or []
+        if kind == 'gateway' and isinstance(items, dict):
+            # Permite o formato compacto {host: gateway}, igual a host_gateways
+            items = [{'host': host, 'gateway': gateway} for host, gateway in items.items()]
+        for item in items:
+            yield dict(item, kind=kind)
+
+
+def _read_json(path):
+    with open(path, encoding='utf-8') as f:
+        document = json.load(f)
+    return _document_records(document, path)
+
+
+def _read_yaml(path):
+    try:
+        import yaml
+    except ImportError as e:
+        raise TopologyError("Leitura de YAML requer o pacote PyYAML (pip install pyyaml)") from e
+    with open(path, encoding='utf-8') as f:
+        document = yaml.safe_load(f)
+    return _document_records(document, path)
+
+
+READERS = {
+    '.jsonl': _read_jsonl,
+    '.csv': _read_csv,
+    '.json': _read_json,
+    '.yaml': _read_yaml,
+    '.yml': _read_yaml,
+}
+
+
+def read_topology(path):
+    """Retorna um iterador sobre os registros do arquivo de topologia."""
+    extension = os.path.splitext(path)[1].lower()
+    reader = READERS.get(extension)
+    if reader is None:
+        raise TopologyError(f"Formato de topologia não suportado: '{extension}' (use {', '.join(READERS)})")
+    return reader(path)
+
+
+def _parse_address(ip_str):
+    """ipaddress.ip_address mais rápido para IPv4 (o parser do ipaddress domina o tempo de carga)."""
+    try:
+        return ipaddress.IPv4Address(int.from_bytes(socket.inet_pton(socket.AF_INET, ip_str), 'big'))
+    except OSError:
+        return ipaddress.ip_address(ip_str)
+
+
+def parse_next_hop(value):
+    """Próximo salto de um registro de rota: vários IPs (lista ou texto separado por espaços) viram uma lista ECMP."""
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    if isinstance(value, str) and ' ' in value.strip():
+        return value.split()
+    return value
+
+
+def apply_records(simulator, records):
+    """
+    Aplica uma sequência de registros nas estruturas do simulador
+    (graph, ip_to_node_map, node_interfaces_and_subnets, routing_tables, host_gateways).
+    Cada registro é processado e descartado; a memória extra se limita aos
+    nomes de nós e às sub-redes distintas, compartilhados entre os registros.
+    """
+    graph = simulator.graph
+    ip_to_node_map = simulator.ip_to_node_map
+    interfaces = simulator.node_interfaces_and_subnets
+    routing_tables = simulator.routing_tables
+    host_gateways = simulator.host_gateways
+    names = {} # Internação dos nomes de nós (cada nome aparece em muitos registros)
+    networks = {} # Sub-redes já criadas (links e redes de hosts são compartilhados por várias interfaces)
+
+    def name_of(value):
+        return names.setdefault(value, value)
+
+    for count, record in enumerate(records, 1):
+        kind = record.get('kind')
+        try:
+            if kind == 'node':
+                graph.add_node(name_of(record['name']), type=record.get('type', 'router'))
+            elif kind == 'link':
+                attributes = {key: record[key] for key in LINK_ATTRIBUTES if key in record}
+                graph.add_edge(name_of(record['source']), name_of(record['target']), **attributes)
+            elif kind == 'interface':
+                node_name = name_of(record['node'])
+                ip_str = record['ip']
+                network_str = record.get('network')
+                if network_str is None:
+                    # Aceita 'ip' no formato CIDR (ex.: 10.0.0.1/24)
+                    interface = ipaddress.ip_interface(ip_str)
+                    ip_str = str(interface.ip)
+                    network_str = str(interface.network)
+                network = networks.get(network_str)
+                if network is None:
+                    network = networks[network_str] = ipaddress.ip_network(network_str)
+                ip_to_node_map[ip_str] = node_name
+                interfaces.setdefault(node_name, {})[_parse_address(ip_str)] = network
+            elif kind == 'address':
+                ip_to_node_map[record['ip']] = name_of(record['node'])
+            elif kind == 'route':
+                routing_tables.setdefault(name_of(record['node']), []).append(
+                    {'destination_network': record['destination'], 'next_hop': parse_next_hop(record['next_hop'])}
+                )
+            elif kind == 'gateway':
+                host_gateways[name_of(record['host'])] = record['gateway']
+            else:
+                raise TopologyError(f"registro {count}: tipo desconhecido '{kind}'")
+        except KeyError as e:
+            raise TopologyError(f"registro {count} ({kind}): campo obrigatório ausente {e}") from e
+        except ValueError as e:
+            if isinstance(e, TopologyError):
+                raise
+            raise TopologyError(f"registro {count} ({kind}): {e}") from e
+
+
+def load_topology(simulator, path):
+    """Carrega um arquivo de topologia no simulador."""
+    apply_records(simulator, read_topology(path))
+
+
+# --- Escrita ---
+
+def write_topology(records, path):
+    """Grava registros em .jsonl ou .csv sem materializar a topologia inteira."""
+    extension = os.path.splitext(path)[1].lower()
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if extension == '.jsonl':
+            for record in records:
+                f.write(json.dumps(record, separators=(',', ':')))
+                f.write('\n')
+                count += 1
+        elif extension == '.csv':
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            for record in records:
+                if isinstance(record.get('next_hop'), (list, tuple)):
+                    record = dict(record, next_hop=' '.join(record['next_hop']))
+                writer.writerow(record)
+                count += 1
+        else:
+            raise TopologyError(f"Escrita suportada apenas para .jsonl e .csv (recebido '{extension}')")
+    return count
+
+
+# --- Geradores de topologias sintéticas ---
+
+class _AddressAllocator:
+    """Entrega blocos consecutivos de um pool de endereços."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.next_address = int(pool.network_address)
+        self.end = int(pool.broadcast_address) + 1
+
+    def allocate(self, prefixlen):
+        size = 1 << (32 - prefixlen)
+        start = (self.next_address + size - 1) // size * size # Alinha o bloco
+        if start + size > self.end:
+            raise TopologyError(f"Pool de endereços {self.pool} esgotado")
+        self.next_address = start + size
+        return ipaddress.ip_network((start, prefixlen))
+
+
+def _host_prefixlen(hosts):
+    """Menor prefixo que acomoda os hosts, o gateway, o endereço de rede e o de broadcast."""
+    return 32 - max(2, (hosts + 2).bit_length())
+
+
+def _link(source, target, link_allocator, capacity, link_type):
+    """Registros de um link ponto a ponto /30; retorna também os IPs de cada ponta."""
+    network = link_allocator.allocate(30)
+    base = int(network.network_address)
+    source_ip = str(ipaddress.ip_address(base + 1))
+    target_ip = str(ipaddress.ip_address(base + 2))
+    records = [
+        {'kind': 'link', 'source': source, 'target': target, 'capacity': capacity, 'type': link_type},
+        {'kind': 'interface', 'node': source, 'ip': source_ip, 'network': str(network)},
+        {'kind': 'interface', 'node': target, 'ip': target_ip, 'network': str(network)},
+    ]
+    return records, source_ip, target_ip
+
+
+def _host_subnet(edge_name, first_host_number, hosts, host_allocator):
+    """Registros da sub-rede de hosts de um switch de borda (hosts .1..n, gateway .n+1)."""
+    network = host_allocator.allocate(_host_prefixlen(hosts))
+    base = int(network.network_address)
+    gateway_ip = str(ipaddress.ip_address(base + hosts + 1))
+    yield {'kind': 'interface', 'node': edge_name, 'ip': gateway_ip, 'network': str(network)}
+    for i in range(hosts):
+        host_name = f'host{first_host_number + i}'
+        yield {'kind': 'node', 'name': host_name, 'type': 'host'}
+        yield {'kind': 'link', 'source': edge_name, 'target': host_name,
+               'capacity': '1Gbps', 'type': 'par_trancado_CAT6'}
+        yield {'kind': 'address', 'ip': str(ipaddress.ip_address(base + 1 + i)), 'node': host_name}
+        yield {'kind': 'gateway', 'host': host_name, 'gateway': gateway_ip}
+    return network
+
+
+def generate_tree_topology(aggregation_count=2, edges_per_aggregation=2, hosts_per_edge=2):
+    """
+    Gera (em streaming) uma árvore Core/agregação/borda no mesmo formato da rede
+    original: a1..aN ligados ao Core, e1..eM ligados aos switches de agregação e
+    host1..hostK ligados às bordas, com rotas e gateways já preenchidos.
+    """
+    host_allocator = _AddressAllocator(HOST_ADDRESS_POOL)
+    link_allocator = _AddressAllocator(LINK_ADDRESS_POOL)
+    core_routes = []
+    host_number = 1
+    edge_number = 1
+
+    yield {'kind': 'node', 'name': 'Core', 'type': 'router'}
+    for a in range(1, aggregation_count + 1):
+        aggregation = f'a{a}'
+        yield {'kind': 'node', 'name': aggregation, 'type': 'router'}
+        records, core_ip, aggregation_ip = _link('Core', aggregation, link_allocator, '10Gbps', 'fibra_optica')
+        yield from records
+
+        for _ in range(edges_per_aggregation):
+            edge = f'e{edge_number}'
+            edge_number += 1
+            yield {'kind': 'node', 'name': edge, 'type': 'router'}
+            records, aggregation_edge_ip, edge_ip = _link(aggregation, edge, link_allocator, '1Gbps', 'par_trancado_CAT6')
+            yield from records
+            subnet = yield from _host_subnet(edge, host_number, hosts_per_edge, host_allocator)
+            host_number += hosts_per_edge
+
+            yield {'kind': 'route', 'node': edge, 'destination': '0.0.0.0/0', 'next_hop': aggregation_edge_ip}
+            yield {'kind': 'route', 'node': aggregation, 'destination': str(subnet), 'next_hop': edge_ip}
+            core_routes.append((str(subnet), aggregation_ip))
+
+        yield {'kind': 'route', 'node': aggregation, 'destination': '0.0.0.0/0', 'next_hop': core_ip}
+
+    for destination, next_hop in core_routes:
+        yield {'kind': 'route', 'node': 'Core', 'destination': destination, 'next_hop': next_hop}
+
+
+def generate_fat_tree(k, ecmp=False):
+    """
+    Gera (em streaming) uma fat-tree k-ária: k pods com k/2 switches de borda e
+    k/2 de agregação cada, (k/2)^2 switches de núcleo e k^3/4 hosts.
+    A agregação j de cada pod liga-se aos núcleos j*k/2 .. j*k/2+k/2-1.
+    Por padrão a subida é determinística, pela rota padrão (um próximo salto):
+    a borda e de um pod sobe pela agregação e do mesmo pod, e a agregação j do
+    pod p sobe pelo núcleo j*k/2 + (p mod k/2). A descida usa rotas específicas:
+    cada núcleo tem o prefixo agregado de cada pod, via a agregação à qual se
+    liga nele, e cada agregação tem a sub-rede de cada borda do pod.
+    Com ecmp=True, a rota padrão de cada borda e de cada agregação vira um
+    grupo ECMP com todos os seus uplinks (o determinístico acima primeiro), e
+    o salto passa a ser escolhido pelo hash do fluxo: (k/2)^2 caminhos entre
+    hosts de pods diferentes.
+    """
+    if k < 2 or k % 2:
+        raise TopologyError("k deve ser um inteiro par >= 2")
+    half = k // 2
+    host_allocator = _AddressAllocator(HOST_ADDRESS_POOL)
+    link_allocator = _AddressAllocator(LINK_ADDRESS_POOL)
+    host_number = 1
+
+    for c in range(half * half):
+        yield {'kind': 'node', 'name': f'core{c}', 'type': 'router'}
+
+    for p in range(k):
+        aggregations = [f'p{p}_agg{j}' for j in range(half)]
+        edges = [f'p{p}_edge{e}' for e in range(half)]
+        for name in aggregations + edges:
+            yield {'kind': 'node', 'name': name, 'type': 'router'}
+
+        # Núcleo <-> agregação: a agregação j liga-se aos núcleos j*half .. j*half+half-1
+        core_facing = {} # (núcleo, agregação) -> IP da agregação no link
+        uplinks = {aggregation: [] for aggregation in aggregations} # agregação -> IPs dos núcleos (o primeiro é o da rota padrão)
+        for j, aggregation in enumerate(aggregations):
+            for i in range(half):
+                core = f'core{j * half + i}'
+                records, core_ip, aggregation_ip = _link(core, aggregation, link_allocator, '10Gbps', 'fibra_optica')
+                yield from records
+                core_facing[core] = aggregation_ip
+                uplinks[aggregation].insert(0 if i == p % half else len(uplinks[aggregation]), core_ip)
+
+        # Borda <-> agregação (malha completa dentro do pod)
+        edge_facing = {} # (agregação, borda) -> IP da borda no link
+        for e, edge in enumerate(edges):
+            edge_uplinks = []
+            for j, aggregation in enumerate(aggregations):
+                records, aggregation_ip, edge_ip = _link(aggregation, edge, link_allocator, '1Gbps', 'par_trancado_CAT6')
+                yield from records
+                edge_facing[(aggregation, edge)] = edge_ip
+                edge_uplinks.insert(0 if j == e else len(edge_uplinks), aggregation_ip)
+            yield {'kind': 'route', 'node': edge, 'destination': '0.0.0.0/0',
+                   'next_hop': edge_uplinks if ecmp else edge_uplinks[0]}
+
+        pod_subnets = []
+        for e, edge in enumerate(edges):
+            subnet = yield from _host_subnet(edge, host_number, half, host_allocator)
+            host_number += half
+            pod_subnets.append(subnet)
+            for aggregation in aggregations:
+                yield {'kind': 'route', 'node': aggregation, 'destination': str(subnet),
+                       'next_hop': edge_facing[(aggregation, edge)]}
+
+        # Os núcleos só precisam dos prefixos agregados de cada pod
+        for prefix in ipaddress.collapse_addresses(pod_subnets):
+            for core, aggregation_ip in core_facing.items():
+                yield {'kind': 'route', 'node': core, 'destination': str(prefix), 'next_hop': aggregation_ip}
+
+        for aggregation in aggregations:
+            yield {'kind': 'route', 'node': aggregation, 'destination': '0.0.0.0/0',
+                   'next_hop': uplinks[aggregation] if ecmp else uplinks[aggregation][0]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera topologias sintéticas para o simulador de rede.")
+    subparsers = parser.add_subparsers(dest='topology', required=True)
+
+    tree = subparsers.add_parser('arvore', help="árvore Core/agregação/borda")
+    tree.add_argument('--agregacao', type=int, default=2, help="switches de agregação ligados ao Core")
+    tree.add_argument('--bordas', type=int, default=2, help="switches de borda por agregação")
+    tree.add_argument('--hosts', type=int, default=2, help="hosts por switch de borda")
+
+    fat_tree = subparsers.add_parser('fat-tree', help="fat-tree k-ária")
+    fat_tree.add_argument('-k', type=int, required=True, help="número de portas por switch (par)")
+    fat_tree.add_argument('--ecmp', action='store_true', help="rotas padrão com todos os uplinks (multipath)")
+
+    for subparser in (tree, fat_tree):
+        subparser.add_argument('-o', '--saida', required=True, help="arquivo de saída (.jsonl ou .csv)")
+
+    args = parser.parse_args(argv)
+    if args.topology == 'arvore':
+        records = generate_tree_topology(args.agregacao, args.bordas, args.hosts)
+    else:
+        records = generate_fat_tree(args.k, args.ecmp)
+    try:
+        count = write_topology(records, args.saida)
+    except TopologyError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    print(f"{count} registros gravados em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,395 @@
+"""
+Simulação de tráfego por fluxos (modelo fluido) com eventos discretos.
+
+Cada fluxo (origem, destino, tamanho, início) segue o mesmo caminho do
+xping e disputa a capacidade ('capacity') dos links que atravessa; cada
+sentido de um link é um recurso independente (full-duplex). As taxas são
+a alocação max-min justa, calculada por preenchimento progressivo.
+
+Os eventos (chegadas e términos) saem de um heap. A cada evento, só são
+recalculadas as taxas dos fluxos ligados ao que entrou ou saiu por links
+saturados: fora desse componente a alocação max-min não muda. Fluxos cuja
+taxa não mudou mantêm o evento de término já agendado; os que mudaram
+ganham um novo (o antigo é descartado ao sair do heap).
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import math
+import os
+import random
+import re
+import sys
+
+from resultados import OK
+from rotas import parse_capacity
+
+_SIZE_UNITS = {'': 1, 'k': 1e3, 'm': 1e6, 'g': 1e9, 't': 1e12}
+_SIZE_PATTERN = re.compile(r'^\s*([0-9]*\.?[0-9]+)\s*([kmgt]?)b?\s*$', re.IGNORECASE)
+
+# Eventos com diferença de tempo menor que isso são tratados juntos
+TIME_EPSILON = 1e-12
+# Fração da capacidade a partir da qual um link é considerado saturado (gargalo)
+SATURATION = 1 - 1e-9
+
+
+def parse_size(size):
+    """Converte tamanhos como '10MB', '1.5k' ou 1500 para bytes."""
+    if isinstance(size, (int, float)):
+        return float(size)
+    match = _SIZE_PATTERN.match(str(size))
+    if not match:
+        raise ValueError(f"Tamanho inválido: '{size}'")
+    return float(match.group(1)) * _SIZE_UNITS[match.group(2).lower()]
+
+
+def _flow_from_record(record):
+    return (record['source'], record['destination'], parse_size(record['size']), float(record.get('start') or 0))
+
+
+def read_flows(path):
+    """
+    Lê uma matriz de tráfego (.jsonl ou .csv) com os campos source,
+    destination, size (bytes, aceita sufixos k/M/G) e start (segundos).
+    Gera tuplas (ip_origem, ip_destino, bytes, início).
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8', newline='') as f:
+        if extension == '.csv':
+            for row in csv.DictReader(f):
+                yield _flow_from_record(row)
+        elif extension == '.jsonl':
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield _flow_from_record(json.loads(line))
+        else:
+            raise ValueError(f"Formato de fluxos não suportado: '{extension}' (use .jsonl ou .csv)")
+
+
+def generate_flows(addresses, count, arrival_rate=1000.0, mean_size=1e6, seed=0):
+    """
+    Gera count fluxos entre pares aleatórios de endereços distintos, com
+    chegadas de Poisson (arrival_rate fluxos/s) e tamanhos exponenciais
+    de média mean_size bytes.
+    """
+    rng = random.Random(seed)
+    now = 0.0
+    for _ in range(count):
+        now += rng.expovariate(arrival_rate)
+        source, destination = rng.sample(addresses, 2)
+        yield (source, destination, max(1.0, rng.expovariate(1.0 / mean_size)), now)
+
+
+class TrafficResult:
+    """Resultado de uma simulação: tempos por fluxo e uso de cada link."""
+
+    def __init__(self, flows, status, completion, link_names, capacity, carried, peak, duration):
+        self.flows = flows # (ip_origem, ip_destino, bytes, início) na ordem de chegada
+        self.status = status # OK ou o motivo pelo qual o fluxo não pôde ser roteado
+        self.completion = completion # Instante de término (nan se não terminou)
+        self.link_names = link_names # (nó, nó) de cada sentido de link
+        self.capacity = capacity # bits/s (inf se o link não tem capacidade definida)
+        self.carried = carried # bits transportados por link
+        self.peak = peak # Maior taxa agregada (bits/s) observada em cada link
+        self.duration = duration # Instante do último evento
+
+    def completion_times(self):
+        """Duração (término - início) de cada fluxo concluído."""
+        return [end - flow[3] for flow, end in zip(self.flows, self.completion) if not math.isnan(end)]
+
+    def link_utilization(self):
+        """Gera ((nó, nó), utilização média, utilização de pico) dos links com capacidade definida."""
+        for link, name in enumerate(self.link_names):
+            capacity = self.capacity[link]
+            if self.carried[link] and not math.isinf(capacity):
+                average = self.carried[link] / (capacity * self.duration) if self.duration else 0.0
+                yield name, average, self.peak[link] / capacity
+
+    def summary(self):
+        times = sorted(self.completion_times())
+        unroutable = sum(1 for status in self.status if status != OK)
+
+        def percentile(fraction):
+            return times[min(len(times) - 1, int(fraction * len(times)))] if times else 0.0
+
+        return {
+            'flows': len(self.flows),
+            'completed': len(times),
+            'unroutable': unroutable,
+            'unfinished': len(self.flows) - len(times) - unroutable,
+            'duration': self.duration,
+            'fct_mean': sum(times) / len(times) if times else 0.0,
+            'fct_p50': percentile(0.5),
+            'fct_p99': percentile(0.99),
+        }
+
+
+class FlowSimulator:
+    """Motor de eventos discretos sobre a rede carregada em um NetworkSimulator."""
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.link_id = {} # (nó, nó) -> índice do sentido do link
+        self.link_names = []
+        self.capacity = []
+        for u, v, attributes in simulator.graph.edges(data=True):
+            capacity = parse_capacity(attributes['capacity']) if 'capacity' in attributes else math.inf
+            for name in ((u, v), (v, u)):
+                self.link_id[name] = len(self.link_names)
+                self.link_names.append(name)
+                self.capacity.append(capacity)
+        self._paths = {} # (ip_origem, ip_destino) -> (situação, links com capacidade finita)
+
+    def route(self, source_ip, destination_ip):
+        """
+        Caminho de um fluxo, como no xping: (situação, tupla de links).
+        Só entram os links com capacidade finita (os demais não limitam a taxa).
+        """
+        key = (source_ip, destination_ip)
+        path = self._paths.get(key)
+        if path is None:
+            result = self.simulator.resolve_path(source_ip, destination_ip)
+            links = ()
+            if result.status == OK:
+                # O salto final pode não ter aresta no grafo (entrega direta): não há o que limitar
+                ids = (self.link_id.get(hop) for hop in zip(result.hops, result.hops[1:]))
+                links = tuple(link for link in ids if link is not None and not math.isinf(self.capacity[link]))
+            path = self._paths[key] = (result.status, links)
+        return path
+
+    def run(self, flows):
+        """
+        Simula os fluxos (ip_origem, ip_destino, bytes, início) até todos
+        terminarem. Retorna um TrafficResult.
+        """
+        flows = sorted(flows, key=lambda flow: flow[3])
+        count = len(flows)
+        capacity = self.capacity
+        self._status = [None] * count
+        self._path = [()] * count
+        self._completion = [math.nan] * count
+        self._rate = [0.0] * count
+        self._remaining = [0.0] * count # bits restantes no instante _updated
+        self._updated = [0.0] * count
+        self._version = [0] * count
+        self._link_flows = [set() for _ in capacity] # link -> fluxos ativos
+        self._load = [0.0] * len(capacity) # Taxa agregada (bits/s) em cada link
+        self._load_since = [0.0] * len(capacity)
+        self._carried = [0.0] * len(capacity)
+        self._peak = [0.0] * len(capacity)
+        self._departures = [] # heap de (instante, fluxo, versão)
+
+        now = 0.0
+        next_arrival = 0
+        while True:
+            departures = self._departures
+            while departures and departures[0][2] != self._version[departures[0][1]]:
+                heapq.heappop(departures) # Término reagendado: evento obsoleto
+            arrival_time = flows[next_arrival][3] if next_arrival < count else math.inf
+            departure_time = departures[0][0] if departures else math.inf
+            if math.isinf(arrival_time) and math.isinf(departure_time):
+                break
+            now = min(arrival_time, departure_time)
+
+            # Todos os eventos do mesmo instante são tratados com um único recálculo
+            freed_links = set()
+            new_flows = []
+            while departures and departures[0][0] <= now + TIME_EPSILON:
+                _, flow, version = heapq.heappop(departures)
+                if version == self._version[flow]:
+                    self._depart(flow, now, freed_links)
+            while next_arrival < count and flows[next_arrival][3] <= now + TIME_EPSILON:
+                if self._arrive(next_arrival, flows[next_arrival], now):
+                    new_flows.append(next_arrival)
+                next_arrival += 1
+            if freed_links or new_flows:
+                self._reallocate(freed_links, new_flows, now)
+
+        for link, load in enumerate(self._load):
+            self._carried[link] += load * (now - self._load_since[link])
+        return TrafficResult(flows, self._status, self._completion, self.link_names, capacity,
+                             self._carried, self._peak, now)
+
+    def _saturated(self, link):
+        return self._load[link] >= self.capacity[link] * SATURATION
+
+    def _add_load(self, link, delta, now):
+        """Atualiza a taxa agregada do link, acumulando os bits transportados até agora."""
+        self._carried[link] += self._load[link] * (now - self._load_since[link])
+        self._load_since[link] = now
+        self._load[link] = self._load[link] + delta if self._link_flows[link] else 0.0 # Zera o erro acumulado
+
+    def _arrive(self, flow, record, now):
+        """Registra a chegada; retorna True se o fluxo passou a disputar algum link."""
+        status, links = self.route(record[0], record[1])
+        self._status[flow] = status
+        if status != OK:
+            return False
+        if not links:
+            self._completion[flow] = now # Nenhum link limita o fluxo: termina na chegada
+            return False
+        self._path[flow] = links
+        self._remaining[flow] = record[2] * 8
+        self._updated[flow] = now
+        for link in links:
+            self._link_flows[link].add(flow)
+        return True
+
+    def _depart(self, flow, now, freed_links):
+        """Registra o término; links que estavam saturados entram em freed_links."""
+        self._completion[flow] = now
+        self._version[flow] += 1
+        rate = self._rate[flow]
+        self._rate[flow] = 0.0
+        for link in self._path[flow]:
+            if self._saturated(link):
+                freed_links.add(link)
+            self._link_flows[link].discard(flow)
+            self._add_load(link, -rate, now)
+
+    def _reallocate(self, freed_links, new_flows, now):
+        """
+        Recalcula a alocação max-min só onde ela pode mudar. Fluxos só se
+        influenciam através de links saturados (os gargalos), então o
+        componente parte dos fluxos novos e dos links liberados e cresce
+        apenas por links saturados. Links de fronteira (com fluxos de fora)
+        que saturarem com as novas taxas são incorporados e o cálculo é
+        refeito, até nenhum mudar: o resultado é o mesmo do recálculo global.
+        """
+        link_flows = self._link_flows
+        paths = self._path
+        component = set()
+        traversed = set(freed_links)
+        pending = list(freed_links)
+
+        def include(flow):
+            component.add(flow)
+            for link in paths[flow]:
+                if link not in traversed and self._saturated(link):
+                    traversed.add(link)
+                    pending.append(link)
+
+        for flow in new_flows:
+            include(flow)
+        while True:
+            while pending:
+                for flow in link_flows[pending.pop()]:
+                    if flow not in component:
+                        include(flow)
+            if not component:
+                return
+            rates, residual, members = self._max_min(component)
+            for link, flows in members.items():
+                if link not in traversed and len(flows) < len(link_flows[link]) and \
+                        residual[link] <= self.capacity[link] * (1 - SATURATION):
+                    traversed.add(link)
+                    pending.append(link)
+            if not pending:
+                break
+
+        # Só os fluxos com taxa nova são atualizados e reagendados
+        rate = self._rate
+        remaining = self._remaining
+        updated = self._updated
+        version = self._version
+        changed_links = set()
+        for flow, new_rate in rates.items():
+            old_rate = rate[flow]
+            if new_rate == old_rate:
+                continue
+            remaining[flow] = max(remaining[flow] - old_rate * (now - updated[flow]), 0.0)
+            updated[flow] = now
+            rate[flow] = new_rate
+            version[flow] += 1
+            if new_rate > 0:
+                heapq.heappush(self._departures, (now + remaining[flow] / new_rate, flow, version[flow]))
+            for link in paths[flow]:
+                self._add_load(link, new_rate - old_rate, now)
+            changed_links.update(paths[flow])
+        # O pico só é medido com todas as taxas já atualizadas (no meio da troca a soma pode passar da capacidade)
+        peak = self._peak
+        for link in changed_links:
+            if self._load[link] > peak[link]:
+                peak[link] = self._load[link]
+
+    def _max_min(self, component):
+        """
+        Preenchimento progressivo sobre os fluxos do componente, com a
+        capacidade já usada pelos fluxos de fora descontada de cada link.
+        Retorna (taxas, capacidade residual, fluxos do componente por link).
+        """
+        link_flows = self._link_flows
+        paths = self._path
+        rate = self._rate
+        members = {}
+        for flow in component:
+            for link in paths[flow]:
+                members.setdefault(link, []).append(flow)
+        residual = {}
+        unfrozen = {}
+        for link, flows in members.items():
+            outside = 0.0 if len(flows) == len(link_flows[link]) else self._load[link] - sum(rate[f] for f in flows)
+            residual[link] = self.capacity[link] - max(outside, 0.0)
+            unfrozen[link] = len(flows)
+
+        # O link com a menor fatia justa congela seus fluxos. As fatias só
+        # crescem, então entradas velhas do heap são reinseridas com o valor atual.
+        heap = [(residual[link] / unfrozen[link], link) for link in members]
+        heapq.heapify(heap)
+        rates = {}
+        while heap:
+            share, link = heapq.heappop(heap)
+            if not unfrozen[link]:
+                continue
+            current = max(residual[link], 0.0) / unfrozen[link]
+            if current > share:
+                heapq.heappush(heap, (current, link))
+                continue
+            for flow in members[link]:
+                if flow in rates:
+                    continue
+                rates[flow] = current
+                for other in paths[flow]:
+                    residual[other] -= current
+                    unfrozen[other] -= 1
+        return rates, residual, members
+
+
+def main(argv=None):
+    from simulador_rede import NetworkSimulator
+    from varredura import host_addresses
+
+    parser = argparse.ArgumentParser(description="Simulação de fluxos com capacidade de links (max-min justo).")
+    parser.add_argument('topologia', nargs='?', help="arquivo de topologia (padrão: rede de exemplo)")
+    parser.add_argument('--fluxos', help="matriz de tráfego (.jsonl ou .csv com source, destination, size, start)")
+    parser.add_argument('--aleatorio', type=int, default=1000, help="quantidade de fluxos aleatórios entre hosts")
+    parser.add_argument('--taxa', type=float, default=1000.0, help="chegadas por segundo dos fluxos aleatórios")
+    parser.add_argument('--tamanho', default='1MB', help="tamanho médio dos fluxos aleatórios")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--links', type=int, default=10, help="quantidade de links mais utilizados a listar")
+    args = parser.parse_args(argv)
+
+    simulator = NetworkSimulator()
+    simulator.load_network_configuration(args.topologia)
+    if args.fluxos:
+        flows = list(read_flows(args.fluxos))
+    else:
+        flows = list(generate_flows(host_addresses(simulator), args.aleatorio, args.taxa,
+                                    parse_size(args.tamanho), args.semente))
+
+    result = FlowSimulator(simulator).run(flows)
+    summary = result.summary()
+    print(f"Fluxos: {summary['flows']}  Concluídos: {summary['completed']}  "
+          f"Sem rota: {summary['unroutable']}  Duração: {summary['duration']:.6f}s")
+    print(f"FCT médio: {summary['fct_mean']:.6f}s  p50: {summary['fct_p50']:.6f}s  p99: {summary['fct_p99']:.6f}s")
+    busiest = sorted(result.link_utilization(), key=lambda item: item[1], reverse=True)[:args.links]
+    for (u, v), average, peak in busiest:
+        print(f"  {u} -> {v}: média {average:.1%}  pico {peak:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Varredura paralela de xtraceroute entre muitos hosts.
+
+As origens são divididas em lotes e distribuídas em um pool de processos
+(concurrent.futures). Cada processo recebe o simulador já carregado uma
+única vez, pelo initializer, e responde lotes inteiros. Os lotes são
+escritos na ordem das origens, à medida que ficam prontos, então o
+relatório é o mesmo para qualquer número de processos.
+
+Formato do relatório (uma linha por par, separada por tabulações):
+    origem  destino  ok|falha  saltos  nó1 -> nó2 -> ...
+"""
+
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from resultados import UNKNOWN_DESTINATION, UNKNOWN_SOURCE
+
+SOURCES_PER_SHARD = 16 # Origens por tarefa enviada aos processos
+
+# Estado de cada processo do pool, preenchido por _init_worker
+_worker_simulator = None
+_worker_destinations = None
+
+
+def _init_worker(simulator, destinations):
+    global _worker_simulator, _worker_destinations
+    _worker_simulator = simulator
+    _worker_destinations = destinations
+
+
+def _format_line(result):
+    if result.status in (UNKNOWN_SOURCE, UNKNOWN_DESTINATION):
+        return f"{result.source}\t{result.destination}\tfalha\t0\tIP desconhecido\n"
+    hops = result.traceroute_hops()
+    if result.reached:
+        return f"{result.source}\t{result.destination}\tok\t{len(hops) - 1}\t{' -> '.join(hops)}\n"
+    return f"{result.source}\t{result.destination}\tfalha\t{len(hops)}\t{' -> '.join(hops)}\n"
+
+
+def trace_shard(simulator, sources, destinations):
+    """Traça todas as rotas de um lote de origens; retorna (linhas, alcançados, total)."""
+    lines = []
+    reached_count = 0
+    for source_ip in sources:
+        for destination_ip in destinations:
+            result = simulator.resolve_path(source_ip, destination_ip, 'xtraceroute')
+            if result.reached:
+                reached_count += 1
+            lines.append(_format_line(result))
+    return ''.join(lines), reached_count, len(sources) * len(destinations)
+
+
+def _trace_shard_in_worker(sources):
+    return trace_shard(_worker_simulator, sources, _worker_destinations)
+
+
+def host_addresses(simulator):
+    """IPs de todos os hosts, na ordem de ip_to_node_map."""
+    nodes = simulator.graph.nodes
+    return [ip for ip, node_name in simulator.ip_to_node_map.items()
+            if node_name in nodes and nodes[node_name].get('type') == 'host']
+
+
+def sweep_traceroutes(simulator, output, sources=None, destinations=None, workers=None, shard_size=SOURCES_PER_SHARD):
+    """
+    Executa xtraceroute de cada origem para cada destino (por padrão, todos os
+    hosts) e escreve o relatório em output à medida que os lotes terminam.
+    workers=1 roda no próprio processo; None usa todos os núcleos.
+    Retorna (pares_alcançados, total_de_pares).
+    """
+    sources = host_addresses(simulator) if sources is None else list(sources)
+    destinations = list(sources) if destinations is None else list(destinations)
+    shards = [sources[i:i + shard_size] for i in range(0, len(sources), shard_size)]
+    workers = workers or os.cpu_count() or 1
+
+    reached_total = 0
+    pair_total = 0
+    if workers == 1 or len(shards) <= 1:
+        for shard in shards:
+            text, reached, total = trace_shard(simulator, shard, destinations)
+            output.write(text)
+            reached_total += reached
+            pair_total += total
+        return reached_total, pair_total
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(simulator, destinations)) as executor:
+        # Mantém poucos lotes em andamento para limitar a memória dos resultados pendentes
+        pending = deque()
+        shard_iterator = iter(shards)
+        for shard in shard_iterator:
+            pending.append(executor.submit(_trace_shard_in_worker, shard))
+            if len(pending) >= workers * 4:
+                break
+        while pending:
+            text, reached, total = pending.popleft().result()
+            output.write(text)
+            reached_total += reached
+            pair_total += total
+            shard = next(shard_iterator, None)
+            if shard is not None:
+                pending.append(executor.submit(_trace_shard_in_worker, shard))
+    return reached_total, pair_total
+
+
+def main(argv=None):
+    from simulador_rede import NetworkSimulator
+
+    parser = argparse.ArgumentParser(description="Varredura paralela de xtraceroute entre todos os hosts.")
+    parser.add_argument('topologia', nargs='?', help="arquivo de topologia (padrão: rede de exemplo)")
+    parser.add_argument('-j', '--processos', type=int, default=None, help="número de processos (padrão: todos os núcleos)")
+    parser.add_argument('-o', '--saida', default='-', help="arquivo do relatório (padrão: saída padrão)")
+    parser.add_argument('--lote', type=int, default=SOURCES_PER_SHARD, help="origens por tarefa")
+    parser.add_argument('--snapshot', metavar='ARQUIVO',
+                        help="carrega a rede do snapshot, compartilhado entre os processos "
+                             "(gerado a partir da topologia se ausente ou desatualizado)")
+    args = parser.parse_args(argv)
+
+    simulator = NetworkSimulator()
+    if args.snapshot:
+        from snapshot import load_cached
+        load_cached(simulator, args.snapshot, args.topologia)
+    else:
+        simulator.load_network_configuration(args.topologia)
+    if args.saida == '-':
+        reached, total = sweep_traceroutes(simulator, sys.stdout, workers=args.processos, shard_size=args.lote)
+    else:
+        with open(args.saida, 'w', encoding='utf-8', buffering=1 << 20) as output:
+            reached, total = sweep_traceroutes(simulator, output, workers=args.processos, shard_size=args.lote)
+    print(f"{reached} de {total} pares alcançados", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
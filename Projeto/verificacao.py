@@ -0,0 +1,294 @@
+"""
+Verificação estática do plano de dados: loops, buracos negros e links ausentes.
+
+O espaço de endereços é dividido em classes de equivalência a partir de
+todos os prefixos das FIBs (rotas e sub-redes conectadas); dentro de uma
+classe, todo nó toma a mesma decisão. Para cada classe que contém endereços
+de alguma sub-rede conectada, cada nó tem um sucessor (o próximo nó) ou,
+em rotas ECMP, um por salto do grupo; uma busca em profundidade linear no
+tamanho desse grafo de encaminhamento encontra ciclos (loops), nós sem rota
+ou com próximo salto desconhecido (buracos negros) e próximos saltos sem
+link no grafo. Como o salto de um grupo ECMP depende do fluxo, basta um
+ramo com problema para a classe ser reportada.
+Classes vizinhas com o mesmo problema são reportadas como uma faixa única.
+"""
+
+import argparse
+import ipaddress
+import sys
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+
+from fib import CONNECTED
+
+# Tipos de violação
+LOOP = 'loop'
+BLACKHOLE = 'blackhole' # Nenhuma rota para a classe
+UNKNOWN_NEXT_HOP = 'unknown_next_hop' # Próximo salto não pertence a nenhum nó
+MISSING_LINK = 'missing_link' # Próximo nó sem aresta no grafo
+
+# Decisões terminais de um nó para uma classe (valores >= 0 são índices de nós).
+# Um grupo ECMP é uma tupla de (decisão, ip do próximo salto), uma por salto distinto.
+_DELIVER, _NO_ROUTE, _UNKNOWN, _MISSING = -1, -2, -3, -4
+_TERMINAL_KINDS = {_NO_ROUTE: BLACKHOLE, _UNKNOWN: UNKNOWN_NEXT_HOP, _MISSING: MISSING_LINK}
+
+# Classes cujas decisões são montadas de uma vez (limita a memória da matriz roteador x classe)
+CLASSES_PER_CHUNK = 4096
+
+
+@dataclass(slots=True)
+class Violation:
+    """
+    Problema encontrado na faixa de endereços [first, last].
+    nodes são os nós envolvidos (o ciclo, em ordem, ou o nó que descarta);
+    detail é o próximo salto problemático, quando houver.
+    """
+    kind: str
+    first: int
+    last: int
+    nodes: tuple
+    detail: str = None
+
+    def prefixes(self):
+        """Faixa coberta, como lista de prefixos CIDR."""
+        return [str(network) for network in ipaddress.summarize_address_range(
+            ipaddress.IPv4Address(self.first), ipaddress.IPv4Address(self.last))]
+
+    def to_dict(self):
+        result = {'kind': self.kind, 'prefixes': self.prefixes(), 'nodes': list(self.nodes)}
+        if self.detail is not None:
+            result['detail'] = self.detail
+        return result
+
+
+class ForwardingVerifier:
+    """Verificador estático sobre as FIBs de um simulador já carregado."""
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        node_types = simulator.graph.nodes
+        # Roteadores primeiro: só eles (e hosts que encaminham para hosts) iniciam a busca de ciclos
+        self.routers = [n for n in node_types if node_types[n].get('type') != 'host']
+        self.hosts = [n for n in node_types if node_types[n].get('type') == 'host']
+        self.nodes = self.routers + self.hosts
+        self.node_index = {node_name: i for i, node_name in enumerate(self.nodes)}
+        self._resolved = {} # (nó, ip do próximo salto) -> índice de nó ou decisão terminal
+
+        self._entries = [self._router_entries(i, router) for i, router in enumerate(self.routers)]
+        self.boundaries, self._owned = self._classes()
+        # O encaminhamento de um host (para o gateway) não depende do destino
+        self._host_successors = [self._resolve(len(self.routers) + i, simulator.host_gateways.get(host))
+                                 for i, host in enumerate(self.hosts)]
+        self._host_starts = [len(self.routers) + i for i, successor in enumerate(self._host_successors)
+                             if successor >= len(self.routers)]
+        # Hosts sem caminho até o gateway (sem gateway, IP desconhecido ou sem link): o mesmo problema em toda classe
+        self._host_dead_ends = [(_TERMINAL_KINDS[successor], (host,), simulator.host_gateways.get(host))
+                                for host, successor in zip(self.hosts, self._host_successors) if successor < 0]
+
+    def _router_entries(self, i, router):
+        """
+        Entradas da FIB como (início, fim, decisão), na ordem em que devem ser
+        aplicadas: rotas do prefixo mais curto ao mais longo e, por último, as
+        sub-redes conectadas (que têm prioridade sobre qualquer rota).
+        """
+        forwarding_table = self.simulator.get_forwarding_table(router)
+        if forwarding_table is None:
+            return []
+        entries = list(forwarding_table.items(multipath=True))
+        default_group = next((group for _, length, kind, group in entries if length == 0 and kind != CONNECTED), (None,))
+        routes, connected = [], []
+        for start, length, kind, group in entries:
+            end = start | ((1 << (32 - length)) - 1)
+            if kind == CONNECTED:
+                connected.append((start, end, _DELIVER))
+            else:
+                # Mesmo fallback da FIB para rotas sem próximo salto: a rota padrão
+                routes.append((length, start, end, self._resolve_group(i, group if group[0] else default_group)))
+        routes.sort(key=lambda route: route[:3])
+        return [(start, end, decision) for _, start, end, decision in routes] + connected
+
+    def _resolve_group(self, i, group):
+        """Decisão do nó i para um grupo de próximos saltos (um índice/decisão terminal ou uma tupla ECMP)."""
+        hops = tuple(dict.fromkeys(group))
+        if len(hops) == 1:
+            return self._resolve(i, hops[0])
+        return tuple((self._resolve(i, hop), hop) for hop in hops)
+
+    def _classes(self):
+        """
+        Inícios das classes de equivalência e, para cada uma, se ela contém
+        endereços de alguma sub-rede conectada (o restante do espaço não é
+        atribuído a ninguém e não precisa ser alcançável).
+        """
+        boundaries = {0}
+        connected = []
+        for entries in self._entries:
+            for start, end, decision in entries:
+                boundaries.add(start)
+                if end < 0xFFFFFFFF:
+                    boundaries.add(end + 1)
+                if decision == _DELIVER:
+                    connected.append((start, end))
+        boundaries = sorted(boundaries)
+
+        # União das sub-redes conectadas em faixas disjuntas, para consulta com bisect
+        merged_starts, merged_ends = [], []
+        for start, end in sorted(connected):
+            if merged_ends and start <= merged_ends[-1] + 1:
+                merged_ends[-1] = max(merged_ends[-1], end)
+            else:
+                merged_starts.append(start)
+                merged_ends.append(end)
+        owned = []
+        for start in boundaries:
+            i = bisect_right(merged_starts, start) - 1
+            owned.append(i >= 0 and start <= merged_ends[i])
+        return boundaries, owned
+
+    def _resolve(self, i, next_hop_ip):
+        """Converte o IP de próximo salto do nó i em índice de nó ou decisão terminal."""
+        key = (i, next_hop_ip)
+        decision = self._resolved.get(key)
+        if decision is None:
+            next_node = self.simulator.get_node_by_ip(next_hop_ip) if next_hop_ip else None
+            if not next_hop_ip:
+                decision = _NO_ROUTE
+            elif next_node is None:
+                decision = _UNKNOWN
+            elif not self.simulator.graph.has_edge(self.nodes[i], next_node):
+                decision = _MISSING
+            else:
+                decision = self.node_index[next_node]
+            self._resolved[key] = decision
+        return decision
+
+    def decisions(self, first, last):
+        """
+        Decisões dos roteadores para as classes first..last-1: uma tupla por
+        classe, com o próximo nó (ou decisão terminal) de cada roteador.
+        """
+        boundaries = self.boundaries
+        columns = []
+        for entries in self._entries:
+            column = [_NO_ROUTE] * (last - first)
+            for start, end, decision in entries:
+                lo = max(bisect_left(boundaries, start, first, last), first) - first
+                hi = min(bisect_right(boundaries, end, first, last), last) - first
+                if lo < hi:
+                    column[lo:hi] = [decision] * (hi - lo)
+            columns.append(column)
+        return list(zip(*columns)) if columns else [() for _ in range(first, last)]
+
+    def _next_hop_of(self, i, address):
+        """IP de próximo salto configurado no nó i (para descrever a violação)."""
+        node_name = self.nodes[i]
+        if i >= len(self.routers):
+            return self.simulator.host_gateways.get(node_name)
+        forwarding_table = self.simulator.get_forwarding_table(node_name)
+        match = forwarding_table.lookup(address) if forwarding_table is not None else None
+        return match[1] if match is not None else None
+
+    def _branches(self, i, decision, address):
+        """(decisão, ip do próximo salto) de cada ramo da decisão do nó i."""
+        if type(decision) is tuple:
+            return decision
+        return ((decision, self._next_hop_of(i, address) if decision < 0 and decision != _DELIVER else None),)
+
+    def check_class(self, address, router_decisions):
+        """
+        Verifica uma classe com uma busca em profundidade sobre o grafo de
+        encaminhamento (cada nó é visitado uma vez). Retorna [(tipo, nós, detalhe)].
+        Hosts cujo primeiro salto (o gateway) falha são reportados em todas as
+        classes, já que qualquer pacote que eles enviem para ali.
+        """
+        router_count = len(self.routers)
+        decisions = list(router_decisions) + self._host_successors
+        successors = [[d for d, _ in decision if d >= 0] if type(decision) is tuple else
+                      ([decision] if decision >= 0 else []) for decision in decisions]
+        problems = []
+        for i in range(router_count):
+            for target, next_hop in self._branches(i, decisions[i], address):
+                if target < 0 and target != _DELIVER:
+                    problems.append((_TERMINAL_KINDS[target], (self.nodes[i],), next_hop))
+        problems.extend(self._host_dead_ends)
+
+        # Ciclos: o caminho em andamento fica em path, com um iterador de sucessores por nó
+        state = {} # nó -> 1 (no caminho atual) ou 2 (concluído)
+        for root in list(range(router_count)) + self._host_starts:
+            if root in state:
+                continue
+            state[root] = 1
+            path = [root]
+            branches = [iter(successors[root])]
+            while branches:
+                node = next(branches[-1], None)
+                if node is None:
+                    state[path.pop()] = 2
+                    branches.pop()
+                elif node not in state:
+                    state[node] = 1
+                    path.append(node)
+                    branches.append(iter(successors[node]))
+                elif state[node] == 1:
+                    cycle = path[path.index(node):]
+                    first = cycle.index(min(cycle, key=lambda n: self.nodes[n])) # Ordem canônica
+                    problems.append((LOOP, tuple(self.nodes[n] for n in cycle[first:] + cycle[:first]), None))
+        return list(dict.fromkeys(problems)) # Ramos ECMP podem levar ao mesmo problema
+
+    def verify(self):
+        """
+        Verifica todas as classes que contêm endereços de sub-redes conectadas.
+        Retorna a lista de Violation, com classes vizinhas iguais unidas em faixas.
+        """
+        violations = []
+        open_violations = {} # (tipo, nós, detalhe) -> Violation que termina na classe anterior
+        boundaries = self.boundaries
+        for first in range(0, len(boundaries), CLASSES_PER_CHUNK):
+            last_class = min(first + CLASSES_PER_CHUNK, len(boundaries))
+            chunk = self.decisions(first, last_class)
+            for class_index in range(first, last_class):
+                if not self._owned[class_index]:
+                    open_violations = {}
+                    continue
+                start = boundaries[class_index]
+                last = boundaries[class_index + 1] - 1 if class_index + 1 < len(boundaries) else 0xFFFFFFFF
+                current = {}
+                for key in self.check_class(start, chunk[class_index - first]):
+                    violation = open_violations.get(key)
+                    if violation is None:
+                        violation = Violation(key[0], start, last, key[1], key[2])
+                        violations.append(violation)
+                    else:
+                        violation.last = last
+                    current[key] = violation
+                open_violations = current
+        return violations
+
+
+def main(argv=None):
+    import json
+    from simulador_rede import NetworkSimulator
+
+    parser = argparse.ArgumentParser(description="Verifica loops, buracos negros e links ausentes nas tabelas.")
+    parser.add_argument('topologia', nargs='?', help="arquivo de topologia (padrão: rede de exemplo)")
+    parser.add_argument('--json', action='store_true', help="uma violação JSON por linha")
+    args = parser.parse_args(argv)
+
+    simulator = NetworkSimulator()
+    simulator.load_network_configuration(args.topologia)
+    verifier = ForwardingVerifier(simulator)
+    violations = verifier.verify()
+    for violation in violations:
+        if args.json:
+            print(json.dumps(violation.to_dict(), ensure_ascii=False))
+            continue
+        nodes = ' -> '.join(violation.nodes + violation.nodes[:1]) if violation.kind == LOOP else violation.nodes[0]
+        detail = f" (próximo salto {violation.detail})" if violation.detail else ""
+        print(f"{violation.kind}: {', '.join(violation.prefixes())} em {nodes}{detail}")
+    if not args.json:
+        print(f"{len(violations)} violações em {sum(verifier._owned)} classes verificadas.")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())